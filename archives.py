@@ -0,0 +1,558 @@
+"""
+Zip archives without an unpacking step.
+
+The launcher can unpack a zip while it downloads: ZipStreamExtractor takes the archive's
+bytes in order and writes each member as soon as its data has arrived, so nothing is left
+to do once the download ends. The game can instead leave archives packed: AssetFS serves
+files from a directory overlaid with zips mapped into memory, and members stored without
+compression (the usual choice for PNGs, which are compressed already) are read straight
+from the mapping without copying.
+
+    python archives.py extract bundle.zip out/
+    python archives.py bench [bundle.zip]
+"""
+import argparse
+import io
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import zipfile
+import zlib
+
+_LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+LOCAL_SIGNATURE = b'PK\x03\x04'
+CENTRAL_SIGNATURES = (b'PK\x01\x02', b'PK\x05\x06', b'PK\x06\x06')  # the member list; no more data after it
+DESCRIPTOR_SIGNATURE = b'PK\x07\x08'
+_FLAG_DESCRIPTOR = 0x08  # sizes and CRC follow the data instead of being in the header
+_FLAG_UTF8 = 0x800
+_ZIP64_EXTRA = 0x0001
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def _safe_member_path(directory, name):
+    """
+    Where member `name` goes under `directory`; refuses names that would land outside it.
+    """
+    parts = name.replace('\\', '/').split('/')
+    if name.startswith(('/', '\\')) or '..' in parts or ':' in parts[0]:
+        raise ArchiveError(f"Archive member escapes the target directory: {name}")
+    return os.path.join(directory, *[part for part in parts if part])
+
+
+# === Streaming extraction ===
+class ZipStreamExtractor:
+    """
+    Unpacks a zip into `directory` from its bytes in order, fed by feed() as they arrive.
+    Members are written to a temp name and renamed once their CRC checks out; close()
+    raises ArchiveError unless the whole archive was seen.
+
+    Reads local headers only, like `unzip` on a pipe, so it handles everything zipfile
+    writes (stored or deflated, with or without data descriptors, zip64) but not stored
+    members of unknown size, which only streaming writers produce.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.extracted = []  # member paths written, in archive order
+        self.reset()
+
+    def reset(self):
+        """
+        Starts over, e.g. when a download restarts from the beginning.
+        """
+        if getattr(self, '_out', None):
+            self._out.close()
+            os.remove(self._out.name)
+        self._buffer = bytearray()
+        self._member = None  # header fields of the member being read
+        self._out = None
+        self._done = False
+        self.extracted = []
+
+    def feed(self, data):
+        if self._done:
+            return
+        self._buffer += data
+        while self._step():
+            pass
+
+    def close(self):
+        if self._member is not None or not self._done:
+            self.reset()
+            raise ArchiveError("Archive ended before its member list")
+        return self.extracted
+
+    def _step(self):
+        """
+        Consumes as much of the buffer as the current state allows; False when it needs more.
+        """
+        if self._member is None:
+            return self._read_header()
+        if self._member['descriptor_pending']:
+            return self._read_descriptor()
+        return self._read_data()
+
+    def _read_header(self):
+        if len(self._buffer) < 4:
+            return False
+        signature = bytes(self._buffer[:4])
+        if signature in CENTRAL_SIGNATURES:
+            self._done = True
+            self._buffer = bytearray()
+            return False
+        if signature != LOCAL_SIGNATURE:
+            raise ArchiveError("Not a zip archive, or damaged")
+        if len(self._buffer) < _LOCAL_HEADER.size:
+            return False
+        (_, _, flags, method, _, _, crc, compressed, size, name_length,
+         extra_length) = _LOCAL_HEADER.unpack_from(self._buffer)
+        end = _LOCAL_HEADER.size + name_length + extra_length
+        if len(self._buffer) < end:
+            return False
+        raw_name = bytes(self._buffer[_LOCAL_HEADER.size:_LOCAL_HEADER.size + name_length])
+        name = raw_name.decode('utf-8' if flags & _FLAG_UTF8 else 'cp437')
+        extra = bytes(self._buffer[_LOCAL_HEADER.size + name_length:end])
+        zip64 = False
+        if compressed == 0xFFFFFFFF or size == 0xFFFFFFFF:
+            size, compressed = self._zip64_sizes(extra, size, compressed)
+            zip64 = True
+        del self._buffer[:end]
+
+        descriptor = bool(flags & _FLAG_DESCRIPTOR)
+        if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise ArchiveError(f"Unsupported compression method {method} for {name}")
+        if method == zipfile.ZIP_STORED and descriptor and compressed == 0 and not name.endswith('/'):
+            raise ArchiveError(f"Stored member of unknown size: {name}")
+        self._member = {
+            'name': name, 'method': method, 'crc': crc, 'remaining': compressed, 'descriptor': descriptor,
+            'zip64': zip64, 'descriptor_pending': False, 'running_crc': 0,
+            'inflater': zlib.decompressobj(-15) if method == zipfile.ZIP_DEFLATED else None,
+        }
+        path = _safe_member_path(self.directory, name)
+        if name.endswith('/'):
+            os.makedirs(path, exist_ok=True)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._out = open(f'{path}.unzipping', 'wb')
+        self._member['path'] = path
+        return True
+
+    @staticmethod
+    def _zip64_sizes(extra, size, compressed):
+        pos = 0
+        while pos + 4 <= len(extra):
+            tag, length = struct.unpack_from('<HH', extra, pos)
+            if tag == _ZIP64_EXTRA:
+                values = list(struct.unpack_from(f'<{length // 8}Q', extra, pos + 4))
+                if size == 0xFFFFFFFF:
+                    size = values.pop(0)
+                if compressed == 0xFFFFFFFF:
+                    compressed = values.pop(0)
+                return size, compressed
+            pos += 4 + length
+        raise ArchiveError("Zip64 sizes missing")
+
+    def _read_data(self):
+        member = self._member
+        if member['inflater'] is None:
+            # Stored: the header says how many bytes are the member's
+            count = min(member['remaining'], len(self._buffer))
+            chunk = bytes(self._buffer[:count])
+            del self._buffer[:count]
+            member['remaining'] -= count
+            self._write(chunk)
+            if member['remaining']:
+                return False
+        else:
+            # Deflated: the stream knows where it ends, which also covers data descriptors
+            inflater = member['inflater']
+            chunk = inflater.decompress(bytes(self._buffer))
+            self._buffer = bytearray(inflater.unused_data)
+            self._write(chunk)
+            if not inflater.eof:
+                return False
+        if member['descriptor']:
+            member['descriptor_pending'] = True
+            return True
+        return self._finish(member['crc'])
+
+    def _read_descriptor(self):
+        size_bytes = 8 if self._member['zip64'] else 4
+        if len(self._buffer) < 4:
+            return False
+        start = 4 if self._buffer[:4] == DESCRIPTOR_SIGNATURE else 0
+        end = start + 4 + 2 * size_bytes
+        if len(self._buffer) < end:
+            return False
+        crc = struct.unpack_from('<I', self._buffer, start)[0]
+        del self._buffer[:end]
+        return self._finish(crc)
+
+    def _write(self, chunk):
+        if chunk:
+            self._member['running_crc'] = zlib.crc32(chunk, self._member['running_crc'])
+            self._out.write(chunk)
+
+    def _finish(self, crc):
+        member, self._member = self._member, None
+        if self._out is None:
+            return True  # a directory
+        out, self._out = self._out, None
+        out.close()
+        if member['running_crc'] != crc:
+            os.remove(out.name)
+            raise ArchiveError(f"CRC mismatch in {member['name']}")
+        os.replace(out.name, member['path'])
+        self.extracted.append(member['path'])
+        return True
+
+
+def extract_missing(archive_path, directory):
+    """
+    Unpacks the members of a local zip that are missing from `directory` or have the wrong
+    size, e.g. after files were deleted by hand; returns the paths written.
+    """
+    written = []
+    with zipfile.ZipFile(archive_path) as archive:
+        for info in archive.infolist():
+            path = _safe_member_path(directory, info.filename)
+            if info.is_dir():
+                os.makedirs(path, exist_ok=True)
+                continue
+            if os.path.isfile(path) and os.path.getsize(path) == info.file_size:
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with archive.open(info) as source, open(f'{path}.unzipping', 'wb') as out:
+                shutil.copyfileobj(source, out, 1024 * 1024)
+            os.replace(f'{path}.unzipping', path)
+            written.append(path)
+    return written
+
+
+# === Reading archives in place ===
+class _ViewReader(io.RawIOBase):
+    """
+    A read-only file over a memoryview, so decoders can read members without a copy.
+    """
+    def __init__(self, view):
+        self._view = view
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = max(0, min(len(buffer), len(self._view) - self._pos))
+        buffer[:count] = self._view[self._pos:self._pos + count]
+        self._pos += count
+        return count
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        self._view = memoryview(b'')
+        super().close()
+
+
+class ZipArchive:
+    """
+    A zip mapped into memory. read() returns stored members as views into the mapping and
+    decompresses deflated ones; members are trusted as-is (the launcher checks the whole
+    archive's SHA-256), so CRCs aren't checked.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            with zipfile.ZipFile(self._file) as archive:
+                self.members = {info.filename: info for info in archive.infolist() if not info.is_dir()}
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            self._file.close()
+            raise ArchiveError(f"Can't open {path}: {e}")
+        self._offsets = {}
+
+    def __contains__(self, name):
+        return name in self.members
+
+    def _data_offset(self, info):
+        offset = self._offsets.get(info.filename)
+        if offset is None:
+            signature, name_length, extra_length = struct.unpack_from('<4s22xHH', self._map, info.header_offset)
+            if signature != LOCAL_SIGNATURE:
+                raise ArchiveError(f"Damaged archive {self.path}")
+            offset = self._offsets[info.filename] = info.header_offset + _LOCAL_HEADER.size + name_length + extra_length
+        return offset
+
+    def read(self, name):
+        """
+        The member's bytes: a memoryview into the mapping for stored members, else bytes.
+        Views must be released before close().
+        """
+        try:
+            info = self.members[name]
+        except KeyError:
+            raise FileNotFoundError(f"{name} not in {self.path}") from None
+        start = self._data_offset(info)
+        data = memoryview(self._map)[start:start + info.compress_size]
+        if info.compress_type == zipfile.ZIP_STORED:
+            return data
+        if info.compress_type == zipfile.ZIP_DEFLATED:
+            with data:
+                return zlib.decompress(data, -15, info.file_size)
+        with zipfile.ZipFile(self.path) as archive:
+            return archive.read(name)
+
+    def open(self, name):
+        return io.BufferedReader(_ViewReader(memoryview(self.read(name))))
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class AssetFS:
+    """
+    Game files by path relative to `root` (e.g. 'assets/grass.png'), looked up on disk first
+    so loose files override packed ones, then in the mounted zips. A zip's members appear
+    under the directory the zip sits in unless mounted at another prefix, so
+    assets/textures.zip holding grass.png serves 'assets/grass.png'. Absolute paths under
+    `root` work too.
+    """
+    def __init__(self, root, archives=()):
+        self.root = os.path.abspath(root)
+        self._mounts = []  # (prefix, ZipArchive), searched in order
+        self._textures = {}
+        for path in archives:
+            self.mount(path)
+
+    def mount(self, path, prefix=None):
+        if prefix is None:
+            directory = os.path.relpath(os.path.dirname(os.path.abspath(path)), self.root)
+            prefix = '' if directory == '.' else directory.replace(os.sep, '/') + '/'
+        self._mounts.append((prefix, ZipArchive(path)))
+
+    def _relative(self, name):
+        if os.path.isabs(name):
+            name = os.path.relpath(name, self.root)
+        return name.replace(os.sep, '/')
+
+    def _find(self, name):
+        """
+        (path on disk, None) or (None, (archive, member)) for `name`, or (None, None).
+        """
+        name = self._relative(name)
+        path = os.path.join(self.root, *name.split('/'))
+        if os.path.isfile(path):
+            return path, None
+        for prefix, archive in self._mounts:
+            if name.startswith(prefix) and name[len(prefix):] in archive:
+                return None, (archive, name[len(prefix):])
+        return None, None
+
+    def exists(self, name):
+        path, member = self._find(name)
+        return path is not None or member is not None
+
+    def read(self, name):
+        path, member = self._find(name)
+        if path is not None:
+            with open(path, 'rb') as f:
+                return f.read()
+        if member is None:
+            raise FileNotFoundError(name)
+        archive, member = member
+        return archive.read(member)
+
+    def open(self, name):
+        path, member = self._find(name)
+        if path is not None:
+            return open(path, 'rb')
+        if member is None:
+            raise FileNotFoundError(name)
+        archive, member = member
+        return archive.open(member)
+
+    def stamp(self, name):
+        """
+        Changes whenever the file's contents may have, for cache keys; None if it's missing.
+        """
+        path, member = self._find(name)
+        if path is not None:
+            stat = os.stat(path)
+            return [stat.st_size, stat.st_mtime_ns]
+        if member is None:
+            return None
+        archive, member = member
+        info = archive.members[member]
+        return [info.file_size, info.CRC]
+
+    def load_texture(self, name, filtering='default'):
+        """
+        An ursina Texture for `name`, cached. Loose files go through Panda3D's loader as
+        usual; packed ones are decoded from the archive without being written out.
+        """
+        texture = self._textures.get(name)
+        if texture is None:
+            from ursina import Texture
+
+            path, member = self._find(name)
+            if path is not None:
+                texture = Texture(path, filtering=filtering)
+            elif member is not None:
+                from PIL import Image
+
+                with self.open(name) as f:
+                    image = Image.open(f)
+                    image.load()
+                texture = Texture(image, filtering=filtering)
+            else:
+                raise FileNotFoundError(name)
+            self._textures[name] = texture
+        return texture
+
+    def close(self):
+        for _, archive in self._mounts:
+            archive.close()
+        self._mounts = []
+
+
+# === Benchmarks ===
+def _tree_usage(directory):
+    """
+    (files, bytes on disk) under `directory`, counting whole filesystem blocks.
+    """
+    files = size = 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            stat = os.stat(os.path.join(root, name))
+            files += 1
+            size += getattr(stat, 'st_blocks', 0) * 512 or stat.st_size
+    return files, size
+
+
+def _synthetic_bundle(path, count=2000, seed=1):
+    """
+    A bundle of `count` small incompressible textures, stored as PNGs would be.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED) as archive:
+        for i in range(count):
+            size = int(rng.integers(1024, 16384))
+            archive.writestr(f'textures/tile_{i:05}.png', rng.integers(0, 256, size, dtype='uint8').tobytes())
+
+
+def bench(archive_path=None, block_size=64 * 1024):
+    """
+    Installing a bundle by unpacking it after the download, by unpacking while it streams
+    in, and by mounting it, plus reading every member back through AssetFS. The download
+    is replayed from disk, so the times are the launcher's own work on top of the network.
+    """
+    work = tempfile.mkdtemp(prefix='archives-bench-')
+    try:
+        if archive_path is None:
+            archive_path = os.path.join(work, 'bundle.zip')
+            _synthetic_bundle(archive_path)
+
+        def download(dest, extractor=None):
+            with open(archive_path, 'rb') as source, open(dest, 'wb') as out:
+                while True:
+                    block = source.read(block_size)
+                    if not block:
+                        break
+                    out.write(block)
+                    if extractor:
+                        extractor.feed(block)
+            if extractor:
+                extractor.close()
+
+        results = {}
+        for mode in ('extract_after', 'extract_streaming', 'mount'):
+            directory = os.path.join(work, mode)
+            os.makedirs(directory)
+            dest = os.path.join(directory, 'bundle.zip')
+            start = time.perf_counter()
+            if mode == 'extract_after':
+                download(dest)
+                with zipfile.ZipFile(dest) as archive:
+                    archive.extractall(directory)
+                os.remove(dest)
+            elif mode == 'extract_streaming':
+                download(dest, ZipStreamExtractor(directory))
+                os.remove(dest)
+            else:
+                download(dest)
+            installed = time.perf_counter() - start
+            files, size = _tree_usage(directory)
+
+            assets = AssetFS(directory, [dest] if mode == 'mount' else ())
+            with zipfile.ZipFile(archive_path) as archive:
+                names = [info.filename for info in archive.infolist() if not info.is_dir()]
+            start = time.perf_counter()
+            read = 0
+            for name in names:
+                data = assets.read(name)
+                read += len(data)
+                if isinstance(data, memoryview):
+                    data.release()
+            loaded = time.perf_counter() - start
+            assets.close()
+            results[mode] = {
+                'install_seconds': installed,
+                'files': files,
+                'disk_bytes': size,
+                'read_all_seconds': loaded,
+                'bytes_read': read,
+            }
+        return results
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    extract = commands.add_parser('extract', help='unpack an archive the way the launcher streams it')
+    extract.add_argument('archive')
+    extract.add_argument('directory')
+    benchmark = commands.add_parser('bench')
+    benchmark.add_argument('archive', nargs='?', help='default: a synthetic bundle of 2000 textures')
+    args = parser.parse_args()
+
+    if args.command == 'extract':
+        extractor = ZipStreamExtractor(args.directory)
+        try:
+            with open(args.archive, 'rb') as f:
+                while True:
+                    block = f.read(64 * 1024)
+                    if not block:
+                        break
+                    extractor.feed(block)
+            for path in extractor.close():
+                print(path)
+        except ArchiveError as e:
+            sys.exit(str(e))
+    else:
+        print(json.dumps(bench(args.archive), indent=2))
+
+
+if __name__ == '__main__':
+    main()
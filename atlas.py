@@ -0,0 +1,164 @@
+import hashlib
+import json
+import logging
+import os
+from math import ceil, sqrt
+
+import numpy as np
+
+from archives import AssetFS
+
+log = logging.getLogger(__name__)
+
+# Bump whenever the packing or cache layout changes
+ATLAS_VERSION = 1
+
+# UV units reserved per tile. Chunk meshes store UVs as tile * TILE_STRIDE + local UV so
+# merged quads can repeat their texture; must exceed the longest quad side in blocks.
+TILE_STRIDE = 256
+
+# Both stages must declare the same GLSL version; nothing here needs more than 1.30 (OpenGL 3.0)
+ATLAS_VERTEX_SHADER = '''#version 130
+
+uniform mat4 p3d_ModelViewProjectionMatrix;
+in vec4 p3d_Vertex;
+in vec2 p3d_MultiTexCoord0;
+in vec4 p3d_Color;
+out vec2 texcoords;
+out vec4 vertex_color;
+
+void main() {
+    gl_Position = p3d_ModelViewProjectionMatrix * p3d_Vertex;
+    texcoords = p3d_MultiTexCoord0;
+    vertex_color = p3d_Color;
+}
+'''
+
+ATLAS_FRAGMENT_SHADER = '''#version 130
+
+uniform sampler2D p3d_Texture0;
+uniform vec4 p3d_ColorScale;
+uniform vec2 atlas_grid;
+uniform float tile_stride;
+uniform float tile_inset;
+uniform float daylight;
+in vec2 texcoords;
+in vec4 vertex_color;
+out vec4 fragColor;
+
+void main() {
+    // Repeat the block's own tile across a merged quad without bleeding into neighbours
+    vec2 tile = floor(texcoords / tile_stride);
+    vec2 local = clamp(fract(texcoords), tile_inset, 1.0 - tile_inset);
+    // Vertex colour carries (sky light, block light) in 0-1; sky light dims with the time of day
+    float level = max(vertex_color.r * daylight, vertex_color.g);
+    float brightness = pow(0.8, (1.0 - level) * 15.0);
+    fragColor = texture(p3d_Texture0, (tile + local) / atlas_grid) * p3d_ColorScale * vec4(vec3(brightness), vertex_color.a);
+}
+'''
+
+
+class TextureAtlas:
+    """
+    All block textures packed into one square-ish grid image, so every chunk can be drawn
+    with a single texture and shader. `tiles` maps block id -> (column, row) of its tile in
+    UV space (row 0 at the bottom of the image).
+    """
+    def __init__(self, image_path, tile_size, columns, rows, tiles):
+        self.image_path = image_path
+        self.tile_size = tile_size
+        self.columns = columns
+        self.rows = rows
+        self.tiles = tiles
+        # Lookup table block id -> tile, for the mesher
+        self.tile_lut = np.zeros((max(tiles, default=0) + 1, 2), dtype=np.float32)
+        for block, tile in tiles.items():
+            self.tile_lut[block] = tile
+
+    def uv_rect(self, block):
+        """
+        (u0, v0, u1, v1) of a block's tile within the atlas image.
+        """
+        column, row = self.tiles[block]
+        return (column / self.columns, row / self.rows, (column + 1) / self.columns, (row + 1) / self.rows)
+
+    @property
+    def shader_inputs(self):
+        return {
+            'atlas_grid': (self.columns, self.rows),
+            'tile_stride': float(TILE_STRIDE),
+            'tile_inset': 0.5 / self.tile_size,
+        }
+
+    @staticmethod
+    def _cache_key(sources, assets):
+        entries = [[block, path, assets.stamp(path)] for block, path in sorted(sources.items())]
+        return hashlib.sha1(json.dumps([ATLAS_VERSION, entries]).encode()).hexdigest()
+
+    @classmethod
+    def load_or_build(cls, textures, asset_dir, cache_dir, assets=None):
+        """
+        Returns the atlas for `textures` (block id -> texture name in `asset_dir`), reusing
+        the packed image in `cache_dir` unless a source texture changed since it was built.
+        Textures are read through `assets` (an archives.AssetFS) when given, so they may
+        come from mounted zips.
+        """
+        assets = assets or AssetFS(asset_dir)
+        sources = {block: os.path.join(asset_dir, f'{name}.png') for block, name in textures.items()}
+        key = cls._cache_key(sources, assets)
+        image_path = os.path.join(cache_dir, 'atlas.png')
+        meta_path = os.path.join(cache_dir, 'atlas.json')
+
+        if os.path.exists(meta_path) and os.path.exists(image_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get('key') == key:
+                tiles = {int(block): tuple(tile) for block, tile in meta['tiles'].items()}
+                return cls(image_path, meta['tile_size'], meta['columns'], meta['rows'], tiles)
+
+        atlas = cls.build(sources, image_path, assets)
+        with open(meta_path, 'w') as f:
+            json.dump({
+                'key': key,
+                'tile_size': atlas.tile_size,
+                'columns': atlas.columns,
+                'rows': atlas.rows,
+                'tiles': {str(block): list(tile) for block, tile in atlas.tiles.items()},
+            }, f, indent=2)
+        return atlas
+
+    @classmethod
+    def build(cls, sources, image_path, assets=None):
+        """
+        Packs the source images (block id -> file) into a grid of equal tiles at the largest
+        source resolution. Missing files get a flat grey placeholder tile.
+        """
+        from PIL import Image
+
+        images = {}
+        for block, path in sources.items():
+            if assets.exists(path) if assets else os.path.exists(path):
+                with assets.open(path) if assets else open(path, 'rb') as f:
+                    images[block] = Image.open(f).convert('RGBA')
+            else:
+                log.warning("Missing block texture %s, using a placeholder", path)
+                images[block] = None
+        tile_size = max((max(image.size) for image in images.values() if image), default=16)
+
+        columns = max(1, ceil(sqrt(len(images))))
+        rows = max(1, ceil(len(images) / columns))
+        sheet = Image.new('RGBA', (columns * tile_size, rows * tile_size), (0, 0, 0, 0))
+        tiles = {}
+        for i, block in enumerate(sorted(images)):
+            column, row_from_top = i % columns, i // columns
+            image = images[block]
+            if image is None:
+                image = Image.new('RGBA', (tile_size, tile_size), (128, 128, 128, 255))
+            elif image.size != (tile_size, tile_size):
+                image = image.resize((tile_size, tile_size), Image.NEAREST)
+            sheet.paste(image, (column * tile_size, row_from_top * tile_size))
+            tiles[block] = (column, rows - 1 - row_from_top)
+
+        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+        sheet.save(image_path)
+        return cls(image_path, tile_size, columns, rows, tiles)
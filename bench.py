@@ -0,0 +1,286 @@
+"""
+Headless benchmarks for the client's hot paths.
+
+    python bench.py                          # print results as JSON
+    python bench.py -o bench.json            # write them to a file
+    python bench.py --compare old.json       # also flag regressions against an earlier run
+
+Every benchmark reports its throughput plus the peak Python/numpy memory it allocated
+(tracemalloc), so runs from different releases can be diffed directly.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from editing import WorldEditor
+from headless import HeadlessSession
+from lighting import chunk_light
+from mesher import build_chunk_mesh, build_lod_mesh
+from picking import raycast_voxels
+from terrain import TerrainGenerator, GENERATOR_VERSION
+from world import World, CHUNK_SIZE, CHUNK_HEIGHT, AIR, BLOCK
+
+# Metric name -> True if bigger is better, for --compare
+HIGHER_IS_BETTER = {
+    'chunks_per_second': True,
+    'batched_chunks_per_second': True,
+    'ms_per_chunk': False,
+    'lod_ms_per_chunk': False,
+    'quads_per_chunk': False,
+    'rays_per_second': True,
+    'loads_per_second': True,
+    'unloads_per_second': True,
+    'playable_ms': False,
+    'blocks_per_second': True,
+    'full_view_ms': False,
+    'peak_memory_bytes': False,
+}
+
+
+def measure(fn):
+    """
+    Runs fn() once for its timings, then again under tracemalloc (which slows allocation
+    heavily, so it can't share the timed run) to add its peak allocation to the metrics.
+    """
+    result = fn()
+    tracemalloc.start()
+    try:
+        fn()
+        result['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result
+
+
+def bench_generate(seed, seconds):
+    generator = TerrainGenerator(seed=seed)
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        generator.generate(count % 64, count // 64)
+        count += 1
+    rate = count / (time.perf_counter() - start)
+
+    batch = [(x, z) for x in range(16) for z in range(16)]
+    batched = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        generator.generate_many([(x + batched, z) for x, z in batch])
+        batched += len(batch)
+    return {
+        'chunks_per_second': rate,
+        'batched_chunks_per_second': batched / (time.perf_counter() - start),
+    }
+
+
+def _loaded_world(seed, radius):
+    world = World()
+    generator = TerrainGenerator(seed=seed)
+    for chunk in generator.generate_many([(x, z) for x in range(-radius, radius + 1)
+                                          for z in range(-radius, radius + 1)]):
+        world.add_chunk(chunk)
+    return world, generator
+
+
+def bench_mesh(seed, seconds):
+    world, _ = _loaded_world(seed, 4)
+    for chunk in world.chunks.values():
+        chunk_light(chunk)
+    inputs = [(world.padded_chunk(x, z), world.padded_light(x, z)) for x in range(-3, 4) for z in range(-3, 4)]
+
+    def per_chunk(build):
+        count = 0
+        quads = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            quads += build(*inputs[count % len(inputs)]).quad_count
+            count += 1
+        return (time.perf_counter() - start) * 1000 / count, quads / count
+
+    ms, quads = per_chunk(lambda padded, light: build_chunk_mesh(padded, light=light))
+    lod_ms, _ = per_chunk(lambda padded, light: build_lod_mesh(padded))
+    return {'ms_per_chunk': ms, 'lod_ms_per_chunk': lod_ms, 'quads_per_chunk': quads}
+
+
+def bench_raycast(seed, seconds):
+    world, generator = _loaded_world(seed, 4)
+    rng = random.Random(seed)
+    rays = []
+    for _ in range(1000):
+        x, z = rng.uniform(-24, 24), rng.uniform(-24, 24)
+        y = generator.height_at(round(x), round(z)) + 1.1
+        rays.append(((x, y, z), (rng.uniform(-1, 1), rng.uniform(-1, 0.2), rng.uniform(-1, 1))))
+
+    count = 0
+    hits = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        origin, direction = rays[count % len(rays)]
+        hits += raycast_voxels(world, origin, direction, distance=5) is not None
+        count += 1
+    return {'rays_per_second': count / (time.perf_counter() - start), 'hit_ratio': hits / count}
+
+
+def walk_path(steps, step_length):
+    """
+    Scripted walk: a straight run, a right-angle turn, then a run back past the start.
+    """
+    path = []
+    x = z = 0.0
+    for i in range(steps):
+        if i < steps // 3:
+            x += step_length
+        elif i < 2 * steps // 3:
+            z += step_length
+        else:
+            x -= step_length * 1.5
+        path.append((x, z))
+    return path
+
+
+def bench_streaming(seed, render_distance, steps):
+    session = HeadlessSession(seed=seed, render_distance=render_distance,
+                              max_chunks=(2 * (render_distance + 1) + 1) ** 2)
+    try:
+        session.move_to(0, 0)
+        session.loads = session.unloads = 0
+        start = time.perf_counter()
+        for x, z in walk_path(steps, CHUNK_SIZE / 2):
+            session.move_to(x, z, velocity=(1, 0))
+        elapsed = time.perf_counter() - start
+        return {
+            'steps': steps,
+            'loads': session.loads,
+            'unloads': session.unloads,
+            'resident_chunks': len(session.world.chunks),
+            'loads_per_second': session.loads / elapsed,
+            'unloads_per_second': session.unloads / elapsed,
+        }
+    finally:
+        session.close()
+
+
+def bench_bulk_edit(seed, render_distance):
+    """
+    Fills, clears and undoes a box reaching over most of the loaded area, including
+    relighting; reports edited blocks per second.
+    """
+    session = HeadlessSession(seed=seed, render_distance=render_distance)
+    try:
+        session.move_to(0, 0)
+        editor = WorldEditor(session.world)
+        half = CHUNK_SIZE * (render_distance - 2)
+        corners = (-half, 0, -half), (half - 1, CHUNK_HEIGHT - 1, half - 1)
+        volume = (2 * half) ** 2 * CHUNK_HEIGHT
+        start = time.perf_counter()
+        remeshed = len(editor.fill(*corners, BLOCK))
+        editor.fill(*corners, AIR)
+        editor.undo()
+        elapsed = time.perf_counter() - start
+        return {
+            'blocks_per_operation': volume,
+            'chunks_remeshed': remeshed,
+            'blocks_per_second': 3 * volume / elapsed,
+        }
+    finally:
+        session.close()
+
+
+def bench_startup(seed, render_distance):
+    """
+    Time from picking a spawn point until the player can stand there (only the chunk
+    under them loaded), and until the whole view has loaded behind them.
+    """
+    session = HeadlessSession(seed=seed, render_distance=render_distance)
+    try:
+        x = z = CHUNK_SIZE * render_distance // 2
+        start = time.perf_counter()
+        session.spawn(x, z)
+        playable = time.perf_counter() - start
+        session.streamer.flush()
+        full_view = time.perf_counter() - start
+        return {
+            'resident_chunks': len(session.world.chunks),
+            'playable_ms': playable * 1000,
+            'full_view_ms': full_view * 1000,
+        }
+    finally:
+        session.close()
+
+
+def run(seed=1, seconds=1.0, render_distance=6, steps=60):
+    results = {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'chunk_size': [CHUNK_SIZE, CHUNK_HEIGHT, CHUNK_SIZE],
+            'generator_version': GENERATOR_VERSION,
+            'seed': seed,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'benchmarks': {},
+    }
+    benchmarks = results['benchmarks']
+    benchmarks['generate'] = measure(lambda: bench_generate(seed, seconds))
+    benchmarks['mesh'] = measure(lambda: bench_mesh(seed, seconds))
+    benchmarks['raycast'] = measure(lambda: bench_raycast(seed, seconds))
+    benchmarks['streaming'] = measure(lambda: bench_streaming(seed, render_distance, steps))
+    benchmarks['bulk_edit'] = measure(lambda: bench_bulk_edit(seed, render_distance))
+    benchmarks['startup'] = measure(lambda: bench_startup(seed, render_distance))
+    return results
+
+
+def compare(current, baseline, tolerance):
+    """
+    Lists metrics that got worse than `baseline` by more than `tolerance` (a fraction).
+    """
+    regressions = []
+    for name, metrics in current['benchmarks'].items():
+        for metric, value in metrics.items():
+            old = baseline.get('benchmarks', {}).get(name, {}).get(metric)
+            if metric not in HIGHER_IS_BETTER or not old:
+                continue
+            change = (value - old) / old
+            worse = -change if HIGHER_IS_BETTER[metric] else change
+            if worse > tolerance:
+                regressions.append(f"{name}.{metric}: {old:.4g} -> {value:.4g} ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-o', '--output', help='write the JSON results to this file')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--seconds', type=float, default=1.0, help='time per throughput benchmark')
+    parser.add_argument('--render-distance', type=int, default=6)
+    parser.add_argument('--steps', type=int, default=60, help='steps in the scripted walk')
+    parser.add_argument('--compare', help='earlier results to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed slowdown before flagging')
+    args = parser.parse_args()
+
+    results = run(args.seed, args.seconds, args.render_distance, args.steps)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+import hashlib
+import os
+import shutil
+import struct
+import threading
+
+import numpy as np
+
+from mesher import ChunkMesh, MESH_VERSION
+from region import encode_chunk, decode_chunk
+from terrain import GENERATOR_VERSION
+
+# Mesh entry: vertex count, index count, lod step, has colours, bounds (min xyz, max xyz),
+# then the raw float32 vertices, uvs, optional colours and uint32 indices
+_MESH_HEADER = struct.Struct('<IIHH6f')
+
+
+class ChunkCache:
+    """
+    Disk cache of generated (never edited) chunks and of built chunk meshes, so revisiting
+    an area or restarting the client reads buffers back instead of recomputing them.
+
+    Chunks are keyed by generator version, seed and coord; meshes by a hash of everything
+    the mesher reads (the padded blocks and light, the level of detail, the atlas tiles),
+    so a cached mesh is only reused for exactly the same input. Entries from older
+    generator or mesher versions live in their own directories and are deleted on open.
+    Once the cache grows past `max_bytes`, the least recently used entries are evicted.
+
+    With `seed` None (a world owned by a server) only meshes are cached.
+
+    Safe to use from the streamer's worker threads.
+    """
+    def __init__(self, directory, seed, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._chunk_dir = os.path.join(directory, 'chunks', f'g{GENERATOR_VERSION}', f's{seed}') if seed is not None else None
+        self._mesh_dir = os.path.join(directory, 'meshes', f'm{MESH_VERSION}')
+        self._purge_stale(os.path.join(directory, 'chunks'), f'g{GENERATOR_VERSION}')
+        self._purge_stale(os.path.join(directory, 'meshes'), f'm{MESH_VERSION}')
+        for folder in (self._chunk_dir, self._mesh_dir):
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries = {}  # path -> size, least recently used first
+        self._bytes = 0
+        scanned = []
+        for folder in (os.path.join(directory, 'chunks'), self._mesh_dir):
+            for root, _, files in os.walk(folder):
+                for name in files:
+                    if name.endswith('.tmp'):
+                        continue
+                    stat = os.stat(os.path.join(root, name))
+                    scanned.append((stat.st_mtime, os.path.join(root, name), stat.st_size))
+        for _, path, size in sorted(scanned):
+            self._entries[path] = size
+            self._bytes += size
+
+    @staticmethod
+    def _purge_stale(folder, current):
+        if not os.path.isdir(folder):
+            return
+        for name in os.listdir(folder):
+            if name != current:
+                shutil.rmtree(os.path.join(folder, name), ignore_errors=True)
+
+    def _read(self, path):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            if path in self._entries:
+                self._entries[path] = self._entries.pop(path)  # now most recently used
+        try:
+            os.utime(path)  # so the order survives a restart
+        except FileNotFoundError:
+            pass  # evicted meanwhile
+        return data
+
+    def _write(self, path, data):
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self._bytes += len(data) - self._entries.pop(path, 0)
+            self._entries[path] = len(data)
+            evict = []
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                old = next(iter(self._entries))
+                self._bytes -= self._entries.pop(old)
+                evict.append(old)
+        for old in evict:
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass
+
+    def _chunk_path(self, cx, cz):
+        return os.path.join(self._chunk_dir, f'{cx}.{cz}.chunk')
+
+    def load_chunk(self, cx, cz):
+        """
+        The generated chunk at (cx, cz), or None if it isn't cached.
+        """
+        if self._chunk_dir is None:
+            return None
+        payload = self._read(self._chunk_path(cx, cz))
+        if payload is None:
+            return None
+        return decode_chunk(cx, cz, payload)
+
+    def save_chunk(self, chunk):
+        if chunk.modified or self._chunk_dir is None:
+            return  # edited chunks belong in the region files, not here
+        self._write(self._chunk_path(chunk.cx, chunk.cz), encode_chunk(chunk.palette, chunk.data))
+
+    @staticmethod
+    def mesh_key(padded, light, lod_step, tiles):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.ascontiguousarray(padded).tobytes())
+        if light is not None:
+            digest.update(np.ascontiguousarray(light).tobytes())
+        digest.update(str(lod_step).encode())
+        if tiles is not None:
+            digest.update(np.ascontiguousarray(tiles).tobytes())
+        return digest.hexdigest()
+
+    def load_mesh(self, key):
+        data = self._read(os.path.join(self._mesh_dir, f'{key}.mesh'))
+        if data is None:
+            return None
+        count, indices, lod_step, has_colors, *bounds = _MESH_HEADER.unpack_from(data)
+        offset = _MESH_HEADER.size
+
+        def take(dtype, n):
+            nonlocal offset
+            array = np.frombuffer(data, dtype=dtype, count=n, offset=offset)
+            offset += array.nbytes
+            return array
+
+        vertices = take('<f4', count * 3)
+        uvs = take('<f4', count * 2)
+        colors = take('<f4', count * 4) if has_colors else None
+        triangles = take('<u4', indices)
+        bounds = (tuple(bounds[:3]), tuple(bounds[3:])) if count else None
+        return ChunkMesh(vertices, uvs, triangles, bounds, lod_step, colors)
+
+    def save_mesh(self, key, mesh):
+        count = len(mesh.vertices) // 3
+        bounds = mesh.bounds[0] + mesh.bounds[1] if mesh.bounds else (0.0,) * 6
+        parts = [_MESH_HEADER.pack(count, len(mesh.triangles), mesh.lod_step, mesh.colors is not None, *bounds),
+                 mesh.vertices.astype('<f4').tobytes(), mesh.uvs.astype('<f4').tobytes()]
+        if mesh.colors is not None:
+            parts.append(mesh.colors.astype('<f4').tobytes())
+        parts.append(mesh.triangles.astype('<u4').tobytes())
+        self._write(os.path.join(self._mesh_dir, f'{key}.mesh'), b''.join(parts))
+
+    @property
+    def nbytes(self):
+        return self._bytes
@@ -1,22 +1,128 @@
-from ursina import *
+import atexit
+import time
+LAUNCH_TIME = time.perf_counter()  # before the engine import, which dominates cold start
+
+from ursina import (Ursina, Entity, Button, Text, Texture, Shader, Mesh, Vec2, Vec3, application,
+                    camera, clamp, color, destroy, held_keys, mouse, scene, window)
 from ursina.prefabs.first_person_controller import FirstPersonController
-from math import sin
+from math import sin, sqrt
+import os
+import sys
+from archives import AssetFS
+from atlas import TextureAtlas, ATLAS_VERTEX_SHADER, ATLAS_FRAGMENT_SHADER
+from chunk_cache import ChunkCache
+from culling import Frustum
+from editing import WorldEditor
+from lighting import relight_block
+from physics import move_box, box_overlaps_cell
+from pipeline import ChunkPipeline
+from profiler import Profiler
+from picking import raycast_voxels
+from region import RegionStore
+from render_distance import RenderDistanceController
+from terrain import TerrainGenerator
+from world import World, CHUNK_SIZE, AIR, BLOCK, BLOCK_TEXTURES
 
 app = Ursina()
 
 # === Constants ===
-CHUNK_SIZE = 8
-RENDER_DISTANCE = 2
+WORLD_SEED = 1
+# `python client.py --connect host[:port]` plays on a server instead of a local world
+SERVER_ADDRESS = sys.argv[sys.argv.index('--connect') + 1] if '--connect' in sys.argv else None
+RENDER_DISTANCE = 6      # starting render distance, adapted at runtime to hold TARGET_FPS
+MIN_RENDER_DISTANCE = 2
+MAX_RENDER_DISTANCE = 12
+TARGET_FPS = 60
+UNLOAD_MARGIN = 1        # extra chunks kept past RENDER_DISTANCE before unloading
+MAX_LOADED_CHUNKS = 256  # LRU cap on resident chunks
+LOD_DISTANCE = 3         # chunks further away than this are drawn from a downsampled heightmap
+LOD_STEP = 2             # columns per side merged into one low-detail cell
+WORKER_THREADS = 2       # background chunk generation/meshing threads
+FRAME_BUDGET_MS = 4      # main thread time per frame spent attaching finished chunks
+GAME_DIR = os.path.dirname(os.path.abspath(__file__))
+# Saves and settings outlive a version; the launcher points this at the directory all
+# installed versions share
+DATA_DIR = os.environ.get('TURBOCRAFT_DATA_DIR', GAME_DIR)
+ASSET_DIR = os.path.join(GAME_DIR, 'assets')
+CACHE_DIR = os.path.join(GAME_DIR, 'cache')
+WORLD_DIR = os.path.join(DATA_DIR, 'saves', 'world')
+TRACE_DIR = os.path.join(DATA_DIR, 'traces')
+SETTINGS_PATH = os.path.join(DATA_DIR, 'settings.json')  # optional overrides, see render_distance.py
+AUTOSAVE_SECONDS = 30
+CHUNK_CACHE_MB = 256     # disk cache of generated chunks and built meshes
+GRAVITY = 25             # blocks/s^2
+TERMINAL_VELOCITY = 50   # blocks/s
+PLAYER_HEIGHT = 1.8
+PLAYER_HALF_WIDTH = 0.3
+PROFILER_KEY = 'f3'          # toggles the frame-time overlay (profiling is off while it's hidden)
+TRACE_KEY = 'f4'             # starts/stops a trace capture written to TRACE_DIR
+PROFILER_REFRESH = 0.25      # seconds between overlay text updates
+MESSAGE_SECONDS = 3          # how long on-screen messages stay up
+# Bulk editing (local worlds only): mark two corners on the targeted blocks, then act on the box
+CORNER_KEYS = ('1', '2')
+FILL_KEY = 'f'               # fill the box with BLOCK
+CLEAR_KEY = 'x'              # fill the box with AIR
+COPY_KEY = 'c'
+PASTE_KEY = 'v'              # paste the copy against the targeted face
+UNDO_KEY = 'z'
+REDO_KEY = 'y'
+BULK_EDIT_REACH = 32         # blocks; how far away corners can be marked
+BULK_REMESH = 16             # more dirty chunks than this are rebuilt on the workers, not in one frame
+SPAWN_X = CHUNK_SIZE * RENDER_DISTANCE // 2
+SPAWN_Z = CHUNK_SIZE * RENDER_DISTANCE // 2
 
 # === Assets ===
-block_texture = load_texture('assets/block_1.png')
+# Loose files first, then the zips in assets/ read in place without unpacking, so
+# assets.load_texture('assets/...') finds a texture either way
+asset_archives = []
+if os.path.isdir(ASSET_DIR):
+    asset_archives = sorted(os.path.join(ASSET_DIR, name) for name in os.listdir(ASSET_DIR) if name.endswith('.zip'))
+assets = AssetFS(GAME_DIR, asset_archives)
+# Every block texture lives in one atlas, so all chunks share one texture and shader
+atlas = TextureAtlas.load_or_build(BLOCK_TEXTURES, ASSET_DIR, CACHE_DIR, assets)
+atlas_texture = Texture(atlas.image_path)
+atlas_shader = Shader(name='atlas_shader', language=Shader.GLSL, vertex=ATLAS_VERTEX_SHADER, fragment=ATLAS_FRAGMENT_SHADER,
+                      default_input=atlas.shader_inputs)
+# Sky light brightness for the time of day, shared by every chunk through the scene root
+scene.set_shader_input('daylight', 1.0)
 
 # === State ===
-blocks = {}
-chunks_loaded = set()
+world = World()
+remote = None  # server connection; the server owns the world when set
+store = None   # local world files otherwise
+terrain = None
+if SERVER_ADDRESS:
+    # Only multiplayer needs the networking modules
+    from protocol import DEFAULT_PORT
+    from remote import RemoteWorld
+    host, _, port = SERVER_ADDRESS.partition(':')
+    remote = RemoteWorld(host, int(port) if port else DEFAULT_PORT)
+else:
+    store = RegionStore(WORLD_DIR)
+    if 'seed' not in store.meta:
+        store.meta['seed'] = WORLD_SEED
+        store.save_meta()
+    terrain = TerrainGenerator(seed=store.meta['seed'])
+chunk_cache = ChunkCache(os.path.join(CACHE_DIR, 'world'), store.meta['seed'] if store else None,
+                         CHUNK_CACHE_MB * 1024 * 1024)
+pending_remote_edits = []  # server edits to chunks that are still loading
+editor = WorldEditor(world)
+selection = [None, None]   # bulk edit corners, world block positions
+last_autosave = time.time()
+world_saved = False  # set once the world is flushed on exit, so it only happens once
+chunk_entities = {}  # (cx, cz) -> one combined mesh Entity per chunk
+chunk_bounds = {}    # (cx, cz) -> world space (min, max) corners of the chunk's mesh
 player = None
+last_player_xz = None
 player_enabled = False
 paused = False
+profiler = Profiler(frame_scopes=('update', 'input'))
+render_distance = RenderDistanceController.from_settings(
+    SETTINGS_PATH, RENDER_DISTANCE,
+    min_distance=MIN_RENDER_DISTANCE, max_distance=MAX_RENDER_DISTANCE, target_fps=TARGET_FPS)
+last_profiler_refresh = 0
+startup_times = {}  # milestone -> seconds since LAUNCH_TIME
+play_time = None     # perf_counter() when Play was clicked
 
 # === Main Menu UI ===
 menu_bg = Entity(model='quad', scale=20, texture='white_cube', color=color.azure)
@@ -30,71 +136,265 @@ play_btn = Button(
     pressed_color=color.green
 )
 
+# The pause menu, profiler overlay and message line are built the first time they're shown
+pause_bg = resume_btn = quit_btn = None
+profiler_text = None
+message_text = None
+message_until = None  # time.time() the message is hidden at; None keeps it up
+
 # === Pause Menu UI ===
-pause_bg = Entity(model='quad', scale=20, texture='white_cube',
-                  color=color.rgba(0,0,0,150), enabled=False)
-resume_btn = Button(text='Resume', scale=(0.2,0.1), y=0.1, enabled=False)
-quit_btn   = Button(text='Quit',   scale=(0.2,0.1), y=-0.1, enabled=False)
-
-# === Chunk Generation ===
-def generate_chunk(cx, cz):
-    for x in range(CHUNK_SIZE):
-        for z in range(CHUNK_SIZE):
-            wx = cx * CHUNK_SIZE + x
-            wz = cz * CHUNK_SIZE + z
-            pos = (wx, 0, wz)
-            if pos not in blocks:
-                b = Entity(
-                    model='cube',
-                    position=pos,
-                    texture=block_texture,
-                    collider='box'
-                )
-                blocks[pos] = b
+def build_pause_menu():
+    global pause_bg, resume_btn, quit_btn
+    pause_bg = Entity(model='quad', scale=20, texture='white_cube',
+                      color=color.rgba(0,0,0,150), enabled=False)
+    resume_btn = Button(text='Resume', scale=(0.2,0.1), y=0.1, enabled=False)
+    quit_btn   = Button(text='Quit',   scale=(0.2,0.1), y=-0.1, enabled=False)
+    resume_btn.on_click = lambda: toggle_pause(False)
+    quit_btn.on_click   = quit_game
+
+# === Profiler Overlay ===
+def build_profiler_overlay():
+    global profiler_text
+    profiler_text = Text(text='', origin=(-0.5, 0.5), position=window.top_left + Vec2(0.01, -0.01),
+                         scale=0.75, background=True, enabled=False)
+
+# === On-screen Messages ===
+def show_message(text, seconds=MESSAGE_SECONDS):
+    global message_text, message_until
+    if message_text is None:
+        message_text = Text(text='', origin=(0, 0), y=-0.3, background=True)
+    message_text.text = text
+    message_text.enabled = True
+    message_until = time.time() + seconds if seconds is not None else None
+
+def hide_expired_message():
+    if message_text is not None and message_text.enabled and message_until is not None and time.time() > message_until:
+        message_text.enabled = False
+
+# === Startup Timing ===
+# Milestones are shown on the profiler overlay
+def mark_startup(name, since=LAUNCH_TIME):
+    startup_times[name] = time.perf_counter() - since
+
+# === Block Edits ===
+def edit_block(x, y, z, block):
+    # Local edits go through the editor so they can be undone; on a server they apply at
+    # once and are sent on for everyone else
+    if not remote:
+        remesh = editor.set_block(x, y, z, block)
+        pipeline.mark_dirty(remesh)
+        return bool(remesh)
+    if not world.set_block(x, y, z, block):
+        return False
+    mark_block_edited(x, y, z)
+    remote.set_block(x, y, z, block)
+    return True
+
+def apply_remote_edits():
+    # Edits from the server, including corrections of our own rejected ones
+    global pending_remote_edits
+    edits, pending_remote_edits = pending_remote_edits + remote.poll_edits(), []
+    for x, y, z, block in edits:
+        if world.get_block(x, y, z) == block:
+            continue
+        if world.set_block(x, y, z, block):
+            mark_block_edited(x, y, z)
+        elif streamer.is_loading(*world.chunk_coords(x, z)):
+            pending_remote_edits.append((x, y, z, block))
+
+def mark_block_edited(x, y, z):
+    # Queue the edited chunk, its neighbour when the block is on a border, and every chunk
+    # whose light changed for remeshing
+    with profiler.scope('relight'):
+        relit = relight_block(world, x, y, z)
+    pipeline.mark_dirty(relit.union(world.chunks_showing(x, z)))
+
+def attach_chunk_mesh(cx, cz, mesh):
+    unload_chunk_entity(cx, cz)
+    if mesh.empty:
+        return
+    origin = (cx * CHUNK_SIZE, 0, cz * CHUNK_SIZE)
+    chunk_entities[(cx, cz)] = Entity(
+        model=Mesh(vertices=mesh.vertices, triangles=mesh.triangles, uvs=mesh.uvs, colors=mesh.colors),
+        position=origin,
+        texture=atlas_texture,
+        shader=atlas_shader
+    )
+    lo, hi = mesh.bounds
+    chunk_bounds[(cx, cz)] = (tuple(l + o for l, o in zip(lo, origin)), tuple(h + o for h, o in zip(hi, origin)))
+
+def on_chunk_unloaded(cx, cz):
+    unload_chunk_entity(cx, cz)
+    if remote:
+        remote.release(cx, cz)
+
+def unload_chunk_entity(cx, cz):
+    entity = chunk_entities.pop((cx, cz), None)
+    chunk_bounds.pop((cx, cz), None)
+    if entity:
+        destroy(entity)
+
+def cull_chunks():
+    # Hide chunks whose bounding box is outside the camera frustum
+    frustum = Frustum(camera.world_position, camera.forward, camera.right, camera.up,
+                      camera.fov, camera.aspect_ratio, camera.clip_plane_near, camera.clip_plane_far)
+    for coord, entity in chunk_entities.items():
+        visible = frustum.intersects_box(*chunk_bounds[coord])
+        if entity.visible != visible:
+            entity.visible = visible
+
+def load_chunk(cx, cz):
+    if remote:
+        with profiler.scope('fetch_chunk'):
+            return remote.fetch_chunk(cx, cz)
+    # Edited chunks come from disk; everything else from the cache or the seed
+    with profiler.scope('load_chunk'):
+        chunk = store.load(cx, cz) or chunk_cache.load_chunk(cx, cz)
+    if chunk:
+        return chunk
+    with profiler.scope('generate_chunk'):
+        chunk = terrain.generate(cx, cz)
+    chunk_cache.save_chunk(chunk)
+    return chunk
+
+def persist_chunk(chunk):
+    # On a server the edits already live there; the chunk is fetched again when needed
+    if store:
+        store.save_async([chunk])
+
+def on_disconnected(error):
+    # Nothing more can load, so stop the game where it is and leave only Quit
+    global paused
+    show_message(f"{error}. Progress is kept on the server.", seconds=None)
+    paused = True
+    play_btn.enabled = False
+    toggle_pause(True)
+    resume_btn.enabled = False
+
+pipeline = ChunkPipeline(
+    world, load_chunk, atlas.tile_lut,
+    load_radius=render_distance.distance,
+    unload_margin=UNLOAD_MARGIN,
+    max_chunks=max(MAX_LOADED_CHUNKS, (2 * (render_distance.distance + UNLOAD_MARGIN) + 1) ** 2),
+    lod_distance=LOD_DISTANCE,
+    lod_step=LOD_STEP,
+    workers=WORKER_THREADS,
+    frame_budget=FRAME_BUDGET_MS / 1000,
+    bulk_remesh=BULK_REMESH,
+    chunk_cache=chunk_cache,
+    profiler=profiler,
+    persist=persist_chunk,
+    on_mesh=attach_chunk_mesh,
+    on_unload=on_chunk_unloaded,
+    on_disconnect=on_disconnected
+)
+streamer = pipeline.streamer
 
 def update_chunks():
     if not player_enabled or paused: 
         return
+    global last_player_xz
     px, _, pz = player.position
     cx = int(px // CHUNK_SIZE)
     cz = int(pz // CHUNK_SIZE)
-    for x in range(cx - RENDER_DISTANCE, cx + RENDER_DISTANCE + 1):
-        for z in range(cz - RENDER_DISTANCE, cz + RENDER_DISTANCE + 1):
-            if (x, z) not in chunks_loaded:
-                generate_chunk(x, z)
-                chunks_loaded.add((x, z))
+    # Horizontal velocity steers prefetching towards where the player is heading
+    velocity = (0, 0)
+    if last_player_xz and time.dt > 0:
+        velocity = ((px - last_player_xz[0]) / time.dt, (pz - last_player_xz[1]) / time.dt)
+    last_player_xz = (px, pz)
+    if remote and (cx, cz) != streamer.center:
+        remote.move_to(cx, cz, streamer.load_radius + UNLOAD_MARGIN)
+    with profiler.scope('stream'):
+        streamer.update(cx, cz, velocity)
+        pipeline.update_lods()
+    with profiler.scope('integrate'):
+        streamer.integrate()
+    with profiler.scope('cull'):
+        cull_chunks()
+
+def adapt_render_distance():
+    # Trade view distance for frame rate; the streamer re-plans as soon as it changes
+    distance = render_distance.update(time.dt, streamer.pending_count)
+    if distance == streamer.load_radius:
+        return
+    streamer.max_chunks = max(MAX_LOADED_CHUNKS, (2 * (distance + UNLOAD_MARGIN) + 1) ** 2)
+    streamer.set_load_radius(distance)
+    if remote:
+        remote.move_to(*streamer.center, distance + UNLOAD_MARGIN)
 
 # === Input Handling ===
 def input(key):
+    with profiler.scope('input'):
+        handle_input(key)
+
+def handle_input(key):
     global paused
-    if key == 'escape' and player_enabled:
+    if key == PROFILER_KEY:
+        toggle_profiler()
+    if key == TRACE_KEY:
+        toggle_trace()
+    if key == 'escape' and player_enabled and not streamer.disconnected:
         paused = not paused
         toggle_pause(paused)
     if not player_enabled or paused:
         return
 
-    hit = raycast(camera.world_position, camera.forward, distance=5, ignore=[player], traverse_target=scene)
+    if key in (UNDO_KEY, REDO_KEY, FILL_KEY, CLEAR_KEY, COPY_KEY, PASTE_KEY) + CORNER_KEYS:
+        if not remote:
+            handle_bulk_edit(key)
+        return
+    if key not in ('left mouse down', 'right mouse down'):
+        return
 
-    if hit.hit:
-        block_pos = hit.entity.position
+    hit = raycast_voxels(world, camera.world_position, camera.forward, distance=5)
 
+    if hit:
         if key == 'left mouse down':
-            destroy(hit.entity)
-            blocks.pop(tuple(block_pos), None)
+            edit_block(*hit.position, AIR)
 
         elif key == 'right mouse down':
-            place_pos = block_pos + hit.normal
-            place_pos = Vec3(round(place_pos.x), round(place_pos.y), round(place_pos.z))
+            place_pos = hit.adjacent
+            if world.is_solid(*place_pos) or box_overlaps_cell(player.position, player.half_width, PLAYER_HEIGHT, place_pos):
+                return
+            edit_block(*place_pos, BLOCK)
+
+def handle_bulk_edit(key):
+    if key == UNDO_KEY:
+        pipeline.mark_dirty(editor.undo())
+        return
+    if key == REDO_KEY:
+        pipeline.mark_dirty(editor.redo())
+        return
 
-            if tuple(place_pos) not in blocks:
-                b = Entity(model='cube', position=place_pos, texture=block_texture, collider='box')
-                blocks[tuple(place_pos)] = b
+    hit = raycast_voxels(world, camera.world_position, camera.forward, distance=BULK_EDIT_REACH)
+    if key in CORNER_KEYS:
+        if hit:
+            selection[CORNER_KEYS.index(key)] = tuple(hit.position)
+        return
+    if key == PASTE_KEY:
+        if hit:
+            pipeline.mark_dirty(editor.paste(*hit.adjacent))
+        return
+    if None in selection:
+        show_message("Mark both corners first")
+        return
+    with profiler.scope('bulk_edit'):
+        if key == FILL_KEY:
+            pipeline.mark_dirty(editor.fill(*selection, BLOCK))
+        elif key == CLEAR_KEY:
+            pipeline.mark_dirty(editor.fill(*selection, AIR))
+        elif key == COPY_KEY:
+            editor.copy(*selection)
 
 # === Pause Handling ===
 def toggle_pause(state):
+    if pause_bg is None:
+        build_pause_menu()
     pause_bg.enabled = state
     resume_btn.enabled = state
     quit_btn.enabled = state
+    if player is None:
+        return
     if state:
         mouse.locked = False
         player.disable()
@@ -102,57 +402,192 @@ def toggle_pause(state):
         mouse.locked = True
         player.enable()
 
+# === Profiling ===
+def toggle_profiler():
+    if profiler_text is None:
+        build_profiler_overlay()
+    profiler.enabled = not profiler.enabled
+    profiler_text.enabled = profiler.enabled
+    if not profiler.enabled:
+        profiler.reset()
+
+def toggle_trace():
+    if profiler.tracing:
+        path = os.path.join(TRACE_DIR, time.strftime('trace-%Y%m%d-%H%M%S.json'))
+        count = profiler.stop_trace(path)
+        profiler.enabled = profiler_text is not None and profiler_text.enabled
+        show_message(f"Wrote {count} trace events to {path}")
+    else:
+        # Tracing needs the scopes switched on, but not the overlay
+        profiler.enabled = True
+        profiler.start_trace()
+
+def refresh_profiler_overlay():
+    global last_profiler_refresh
+    if profiler_text is None or not profiler_text.enabled or time.time() - last_profiler_refresh < PROFILER_REFRESH:
+        return
+    last_profiler_refresh = time.time()
+    slow = render_distance.recent_frame_time()
+    header = (f"render distance {render_distance.distance}"
+              f"{' (fixed)' if render_distance.fixed is not None else ''}, target {render_distance.target_fps} fps")
+    if slow is not None:
+        header += f", p{render_distance.percentile} frame {slow * 1000:.1f} ms"
+    startup = ', '.join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in startup_times.items())
+    lines = [header, f"startup: {startup}"] if startup else [header]
+    profiler_text.text = '\n'.join(lines + profiler.summary())
+
+# === Player ===
+class VoxelPlayer(FirstPersonController):
+    # First person controller that collides with the block grid instead of scene colliders
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.half_width = PLAYER_HALF_WIDTH
+        self.velocity_y = 0
+        self.jump_height = 1.25
+
+    def update(self):
+        self.rotation_y += mouse.velocity[0] * self.mouse_sensitivity[1]
+        self.camera_pivot.rotation_x -= mouse.velocity[1] * self.mouse_sensitivity[0]
+        self.camera_pivot.rotation_x = clamp(self.camera_pivot.rotation_x, -90, 90)
+
+        self.direction = Vec3(
+            self.forward * (held_keys['w'] - held_keys['s'])
+            + self.right * (held_keys['d'] - held_keys['a'])
+            ).normalized()
+        move = self.direction * time.dt * self.speed
+
+        if self.gravity:
+            self.velocity_y = max(self.velocity_y - GRAVITY * self.gravity * time.dt, -TERMINAL_VELOCITY)
+        else:
+            self.velocity_y = 0
+
+        position, blocked = move_box(world, self.position, self.half_width, PLAYER_HEIGHT,
+                                     (move.x, self.velocity_y * time.dt, move.z))
+        self.position = position
+        if blocked[1]:
+            if self.velocity_y < 0 and not self.grounded:
+                self.land()
+            self.grounded = self.velocity_y < 0
+            self.velocity_y = 0
+        else:
+            self.grounded = False
+
+    def jump(self):
+        if not self.grounded:
+            return
+        self.grounded = False
+        self.velocity_y = sqrt(2 * GRAVITY * self.jump_height)
+
 # === Player Spawn ===
-def spawn_player_after_chunks(x, y, z):
+def spawn_player(x, y, z):
+    # Only called once the chunk under the player is resident, so gravity can start at once
     global player, player_enabled
-    player = FirstPersonController()
-    player.gravity = 0  # gravity off initially
+    player = VoxelPlayer()
     player.position = (x, y+2, z)
     player_enabled = True
     mouse.locked = True
-    invoke(enable_gravity_for_player, delay=0.2)
 
-def enable_gravity_for_player():
-    if player:
-        player.gravity = 1
+def plan_spawn_area():
+    # Queue the chunks around the spawn point nearest first; prefetch() starts on them
+    # while the menu is still up
+    cx, cz = world.chunk_coords(SPAWN_X, SPAWN_Z)
+    if remote:
+        remote.move_to(cx, cz, streamer.load_radius + UNLOAD_MARGIN)
+    streamer.update(cx, cz)
 
 # === Start Game ===
 def start_game():
-    global player_enabled
+    global play_time
+    play_time = time.perf_counter()
     menu_bg.enabled = False
     play_btn.enabled = False
 
-    # Generate all chunks
-    for cx in range(-RENDER_DISTANCE, RENDER_DISTANCE+1):
-        for cz in range(-RENDER_DISTANCE, RENDER_DISTANCE+1):
-            generate_chunk(cx, cz)
-            chunks_loaded.add((cx, cz))
+    # Wait only for the ground under the player; the rest streams in once they're playing
+    with profiler.scope('spawn_chunk'):
+        streamer.flush([world.chunk_coords(SPAWN_X, SPAWN_Z)])
+    spawn_chunk = world.chunk_coords(SPAWN_X, SPAWN_Z)
+    if spawn_chunk not in world:
+        # Disconnected (already reported), or its build kept failing: back to the menu to retry
+        if not streamer.disconnected:
+            show_message("The spawn area could not be loaded")
+            streamer.failed.discard(spawn_chunk)
+            menu_bg.enabled = True
+            play_btn.enabled = True
+        return
+
+    # Solid spawn block. It is put back on every start, so it goes straight into the chunk
+    # like terrain: not an edit to undo, save or send to the server
+    spawn_y = max(world.top_block(SPAWN_X, SPAWN_Z), 0)  # top block of the column
+    if not world.is_solid(SPAWN_X, spawn_y, SPAWN_Z):
+        chunk = world.chunks[spawn_chunk]
+        chunk.set(SPAWN_X % CHUNK_SIZE, spawn_y, SPAWN_Z % CHUNK_SIZE, BLOCK)
+        chunk.version += 1
+        mark_block_edited(SPAWN_X, spawn_y, SPAWN_Z)
+
+    spawn_player(SPAWN_X, spawn_y, SPAWN_Z)
+    mark_startup('playable', since=play_time)
+
+# === Saving ===
+def autosave():
+    global last_autosave
+    last_autosave = time.time()
+    if store:
+        store.save_async(world.chunks.values())
+
+def save_world():
+    # Runs once on the way out, whether from the quit key, closing the window or a crash
+    global world_saved
+    if world_saved:
+        return
+    world_saved = True
+    streamer.shutdown()
+    if store:
+        store.save(world.chunks.values())
+        store.close()
+    if remote:
+        remote.close()
 
-    # Solid spawn block
-    spawn_x = CHUNK_SIZE * RENDER_DISTANCE // 2
-    spawn_z = CHUNK_SIZE * RENDER_DISTANCE // 2
-    spawn_y = 0
-    spawn_pos = (spawn_x, spawn_y, spawn_z)
-    if spawn_pos not in blocks:
-        b = Entity(model='cube', position=spawn_pos, texture=block_texture, collider='box')
-        blocks[spawn_pos] = b
+atexit.register(save_world)
 
-    # Spawn player after a short delay
-    invoke(spawn_player_after_chunks, spawn_x, spawn_y, spawn_z, delay=0.3)
+def quit_game():
+    save_world()
+    application.quit()
 
 # === Main Update Loop ===
 def update():
-    if player_enabled and not paused:
-        update_chunks()
+    if 'first frame' not in startup_times:
+        mark_startup('first frame')
+    profiler.begin_frame()
+    with profiler.scope('update'):
+        if player_enabled and not paused:
+            with profiler.scope('update_chunks'):
+                update_chunks()
+            adapt_render_distance()
+        elif not player_enabled:
+            streamer.prefetch()
+        if play_time is not None and 'full view' not in startup_times and not streamer.pending_count:
+            mark_startup('full view', since=play_time)
+        if remote:
+            if not remote.connected and not streamer.disconnected:
+                streamer.disconnect(ConnectionError("Disconnected from the server"))
+            with profiler.scope('remote_edits'):
+                apply_remote_edits()
+        with profiler.scope('remesh'):
+            pipeline.remesh_dirty()
+        if time.time() - last_autosave > AUTOSAVE_SECONDS:
+            with profiler.scope('autosave'):
+                autosave()
 
-    # Day-night cycle
-    cycle_speed = 0.2
-    intensity = sin(time.time() * cycle_speed) * 0.5 + 0.5
-    window.color = color.rgb(150*intensity+50, 150*intensity+50, 255*intensity)
+        # Day-night cycle
+        cycle_speed = 0.2
+        intensity = sin(time.time() * cycle_speed) * 0.5 + 0.5
+        window.color = color.rgb(150*intensity+50, 150*intensity+50, 255*intensity)
+        scene.set_shader_input('daylight', 0.25 + 0.75 * intensity)
+    refresh_profiler_overlay()
+    hide_expired_message()
 
 # === Button Actions ===
 play_btn.on_click   = start_game
-resume_btn.on_click = lambda: toggle_pause(False)
-quit_btn.on_click   = application.quit
 
+plan_spawn_area()
 app.run()
@@ -0,0 +1,52 @@
+from math import radians, sqrt, tan
+
+
+def _normalize(v):
+    length = sqrt(v[0] * v[0] + v[1] * v[1] + v[2] * v[2])
+    return (v[0] / length, v[1] / length, v[2] / length)
+
+
+def _cross(a, b):
+    return (a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0])
+
+
+def _dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+class Frustum:
+    """
+    The camera's view volume as six inward-facing planes, for testing chunk bounding boxes.
+    `fov` is the horizontal field of view in degrees, as ursina's camera.fov.
+    """
+    def __init__(self, position, forward, right, up, fov, aspect_ratio, near, far):
+        forward = _normalize(forward)
+        right = _normalize(right)
+        up = _normalize(up)
+        tan_h = tan(radians(fov) / 2)
+        tan_v = tan_h / aspect_ratio
+
+        self.planes = []
+        # Side planes pass through the eye; orient each normal so the view axis is inside
+        for side, slope, axis in ((right, tan_h, up), (right, -tan_h, up), (up, tan_v, right), (up, -tan_v, right)):
+            direction = tuple(forward[i] + side[i] * slope for i in range(3))
+            normal = _normalize(_cross(axis, direction))
+            if _dot(normal, forward) < 0:
+                normal = tuple(-n for n in normal)
+            self.planes.append((normal, -_dot(normal, position)))
+        self.planes.append((forward, -(_dot(forward, position) + near)))
+        back = tuple(-f for f in forward)
+        self.planes.append((back, _dot(forward, position) + far))
+
+    def intersects_box(self, lo, hi):
+        """
+        False only if the box [lo, hi] is completely outside one of the planes.
+        """
+        for normal, d in self.planes:
+            # The corner furthest along the plane normal
+            px = hi[0] if normal[0] > 0 else lo[0]
+            py = hi[1] if normal[1] > 0 else lo[1]
+            pz = hi[2] if normal[2] > 0 else lo[2]
+            if normal[0] * px + normal[1] * py + normal[2] * pz + d < 0:
+                return False
+        return True
@@ -0,0 +1,337 @@
+"""
+Binary deltas between two versions of a file, rsync style: the new file is described as
+copies of blocks of the old file plus literal bytes, then zlib compressed. A patch only
+applies to the exact old file it was made from and is checked against the new file's
+SHA-256, so a bad patch can never produce a wrong file.
+
+    python delta.py make old new -o new.patch
+    python delta.py apply old new.patch -o new
+    python delta.py release old_release/ new_release/ manifest.json --base-url URL
+    python delta.py bench [old new]
+
+`release` writes a patch for every file of the new release that changed since the old
+one and lists them in the new release's manifest (see manifest.py), so the launcher
+can fetch those instead of whole files.
+"""
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+
+MAGIC = b'TCDELTA1'
+DEFAULT_BLOCK = 1024
+# Header: magic, old size, new size, old SHA-256, new SHA-256
+_HEADER = struct.Struct('<8sQQ32s32s')
+_COPY = struct.Struct('<BQI')  # op, offset in the old file, length
+_LITERAL = struct.Struct('<BI')  # op, length; the bytes follow
+COPY, LITERAL = 0, 1
+_MOD = 1 << 16
+
+
+class PatchError(Exception):
+    pass
+
+
+def _block_hashes(data, block):
+    """
+    rsync's weak checksum of each aligned `block` of `data` (a trailing partial block is
+    left out): (sum of bytes) | (position weighted sum) << 16, both mod 2**16.
+    """
+    count = len(data) // block
+    x = np.frombuffer(data, dtype=np.uint8, count=count * block).reshape(count, block).astype(np.int64)
+    a = x.sum(axis=1)
+    b = (x * np.arange(block, 0, -1, dtype=np.int64)).sum(axis=1)
+    return (a % _MOD) | ((b % _MOD) << 16)
+
+
+def _rolling_matches(data, block, wanted, segment=1 << 22):
+    """
+    Offsets of every `block` sized window of `data` whose weak checksum is in `wanted`,
+    with those checksums. The rolling checksum of all windows is derived from running
+    sums, a segment at a time to bound memory; uint64 wraparound keeps the low 16 bits exact.
+    """
+    positions, hashes = [], []
+    windows = len(data) - block + 1
+    for start in range(0, windows, segment):
+        end = min(start + segment, windows)
+        x = np.frombuffer(data, dtype=np.uint8, count=end - start + block - 1, offset=start).astype(np.uint64)
+        zero = np.zeros(1, dtype=np.uint64)
+        c1 = np.concatenate((zero, np.cumsum(x, dtype=np.uint64)))
+        c2 = np.concatenate((zero, np.cumsum(x * np.arange(len(x), dtype=np.uint64), dtype=np.uint64)))
+        i = np.arange(end - start, dtype=np.uint64)
+        a = c1[i + block] - c1[i]
+        # sum over k of (block - k) * x[i + k], from the running sums
+        b = (i + np.uint64(block)) * a - (c2[i + block] - c2[i])
+        weak = ((a % _MOD) | ((b % _MOD) << 16)).astype(np.int64)
+        hit = np.nonzero(np.isin(weak, wanted))[0]
+        positions.append(hit + start)
+        hashes.append(weak[hit])
+    if not positions:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(positions), np.concatenate(hashes)
+
+
+def _strong(data):
+    return hashlib.blake2b(data, digest_size=8).digest()
+
+
+def make_patch(old, new, block=DEFAULT_BLOCK, level=9):
+    """
+    A patch turning `old` into `new` (both bytes).
+    """
+    ops = []
+
+    def literal(start, end):
+        if end > start:
+            ops.append(_LITERAL.pack(LITERAL, end - start) + new[start:end])
+
+    i = 0  # new file bytes before this are covered by ops
+    if len(old) >= block and len(new) >= block:
+        # Index the old file's aligned blocks by weak checksum, then look for them at
+        # every offset of the new file
+        old_weak = _block_hashes(old, block)
+        index = {}  # weak -> strong -> first old offset with those checksums
+        for n, weak in enumerate(old_weak.tolist()):
+            index.setdefault(weak, {}).setdefault(_strong(old[n * block:(n + 1) * block]), n * block)
+        candidates, weaks = _rolling_matches(new, block, old_weak)
+
+        pending = None  # [old offset, length] of a copy that may still grow
+        k = 0
+        while k < len(candidates):
+            j = int(candidates[k])
+            strong = _strong(new[j:j + block])
+            follow = pending[0] + pending[1] if pending and j == i else None
+            if follow is not None and follow + block <= len(old) and _strong(old[follow:follow + block]) == strong:
+                match = follow  # prefer the old block right after the last copy, so it can grow
+            else:
+                match = index[int(weaks[k])].get(strong)
+            if match is None:
+                k += 1
+                continue
+            if match == follow:
+                pending[1] += block
+            else:
+                if pending:
+                    ops.append(_COPY.pack(COPY, *pending))
+                literal(i, j)
+                pending = [match, block]
+            i = j + block
+            k = int(np.searchsorted(candidates, i))
+        if pending:
+            ops.append(_COPY.pack(COPY, *pending))
+    literal(i, len(new))
+
+    header = _HEADER.pack(MAGIC, len(old), len(new), hashlib.sha256(old).digest(), hashlib.sha256(new).digest())
+    return header + zlib.compress(b''.join(ops), level)
+
+
+def apply_patch(old, patch):
+    """
+    Rebuilds the new file from `old` and `patch`. Raises PatchError if the patch is
+    damaged, was made for another old file, or doesn't reproduce the new file exactly.
+    """
+    try:
+        magic, old_size, new_size, old_digest, new_digest = _HEADER.unpack_from(patch)
+    except struct.error:
+        raise PatchError("Truncated patch header")
+    if magic != MAGIC:
+        raise PatchError("Not a patch file")
+    if len(old) != old_size or hashlib.sha256(old).digest() != old_digest:
+        raise PatchError("Patch was made for a different version of the file")
+    try:
+        ops = zlib.decompress(patch[_HEADER.size:])
+    except zlib.error as e:
+        raise PatchError(f"Damaged patch: {e}")
+
+    out = bytearray()
+    view = memoryview(ops)
+    pos = 0
+    try:
+        while pos < len(ops):
+            if ops[pos] == COPY:
+                _, offset, length = _COPY.unpack_from(ops, pos)
+                pos += _COPY.size
+                if offset + length > old_size:
+                    raise PatchError("Copy past the end of the old file")
+                out += old[offset:offset + length]
+            elif ops[pos] == LITERAL:
+                _, length = _LITERAL.unpack_from(ops, pos)
+                pos += _LITERAL.size
+                out += view[pos:pos + length]
+                pos += length
+            else:
+                raise PatchError(f"Unknown patch op {ops[pos]}")
+    except struct.error:
+        raise PatchError("Truncated patch")
+    if len(out) != new_size or hashlib.sha256(out).digest() != new_digest:
+        raise PatchError("Patched file doesn't match the new version")
+    return bytes(out)
+
+
+def apply_patch_file(old_path, patch_path, new_path):
+    """
+    Patches old_path into new_path, writing through a temp file so new_path only ever
+    holds a verified result; new_path may be old_path.
+    """
+    with open(old_path, 'rb') as f:
+        old = f.read()
+    with open(patch_path, 'rb') as f:
+        new = apply_patch(old, f.read())
+    tmp = f'{new_path}.patching'
+    with open(tmp, 'wb') as f:
+        f.write(new)
+    os.replace(tmp, new_path)
+
+
+# === Release patches ===
+def _default_patch_dir(new_dir):
+    return os.path.normpath(os.path.abspath(new_dir)) + '-patches'
+
+
+def build_release_patches(old_dir, new_dir, manifest_path, base_url, patch_dir=None, block=DEFAULT_BLOCK):
+    """
+    Writes patches from every file of `old_dir` to its changed counterpart in `new_dir`
+    and adds them to the `patches` of the new release's manifest. Patches no smaller than
+    a third of the file aren't worth it and are skipped. Returns the patch paths written.
+
+    Patches go to `patch_dir`, by default NEW_DIR-patches next to `new_dir` rather than
+    inside it, so a later `manifest.py build` of the release doesn't list them as files.
+    """
+    from manifest import Manifest, file_sha256, local_path
+
+    manifest = Manifest.load(manifest_path)
+    patch_dir = patch_dir or _default_patch_dir(new_dir)
+    written = []
+    for entry in manifest.entries:
+        old_path = local_path(old_dir, entry.path)
+        new_path = local_path(new_dir, entry.path)
+        if not os.path.isfile(old_path) or not os.path.isfile(new_path):
+            continue
+        old_digest = file_sha256(old_path)
+        if old_digest == entry.sha256 or entry.patch_from(old_digest):
+            continue
+        with open(old_path, 'rb') as f:
+            old = f.read()
+        with open(new_path, 'rb') as f:
+            patch = make_patch(old, f.read(), block)
+        if len(patch) * 3 > os.path.getsize(new_path):
+            continue
+        name = f'{entry.path}.{old_digest[:16]}.patch'
+        out = local_path(patch_dir, name)
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        with open(out, 'wb') as f:
+            f.write(patch)
+        entry.patches.append({'from': old_digest, 'url': base_url.rstrip('/') + '/' + name,
+                              'size': len(patch), 'sha256': hashlib.sha256(patch).hexdigest()})
+        written.append(out)
+    manifest.save(manifest_path)
+    return written
+
+
+# === Benchmarks ===
+def _mutate(data, rng, fraction):
+    """
+    A new version of `data` with about `fraction` of it rewritten: scattered edits that
+    replace, insert and delete runs of bytes, like source changes or patched assets.
+    """
+    out = bytearray(data)
+    for _ in range(max(1, int(len(data) * fraction / 256))):
+        pos = int(rng.integers(0, max(1, len(out))))
+        kind = rng.integers(0, 3)
+        run = rng.integers(1, 512).item()
+        if kind == 0:
+            out[pos:pos + run] = rng.integers(0, 256, run, dtype=np.uint8).tobytes()
+        elif kind == 1:
+            out[pos:pos] = rng.integers(0, 256, run, dtype=np.uint8).tobytes()
+        else:
+            del out[pos:pos + run]
+    return bytes(out)
+
+
+def _bench_pair(old, new, block):
+    start = time.perf_counter()
+    patch = make_patch(old, new, block)
+    made = time.perf_counter() - start
+    start = time.perf_counter()
+    assert apply_patch(old, patch) == new
+    applied = time.perf_counter() - start
+    return {
+        'old_bytes': len(old),
+        'new_bytes': len(new),
+        'patch_bytes': len(patch),
+        'patch_ratio': len(patch) / max(1, len(new)),
+        'full_download_ratio': len(zlib.compress(new, 9)) / max(1, len(new)),
+        'make_seconds': made,
+        'apply_seconds': applied,
+    }
+
+
+def bench(old_path=None, new_path=None, block=DEFAULT_BLOCK, size=8 * 1024 * 1024, seed=1):
+    """
+    Patch size and timings for a real pair of files, or for synthetic data with 0.1%,
+    1% and 10% of it changed.
+    """
+    if old_path:
+        with open(old_path, 'rb') as f:
+            old = f.read()
+        with open(new_path, 'rb') as f:
+            new = f.read()
+        return {'files': _bench_pair(old, new, block)}
+    rng = np.random.default_rng(seed)
+    # Half random, half repetitive, so neither compression nor matching has it too easy
+    old = rng.integers(0, 256, size // 2, dtype=np.uint8).tobytes() + bytes(range(256)) * (size // 512)
+    return {f'changed_{fraction:g}': _bench_pair(old, _mutate(old, rng, fraction), block)
+            for fraction in (0.001, 0.01, 0.1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--block', type=int, default=DEFAULT_BLOCK, help='match granularity in bytes')
+    commands = parser.add_subparsers(dest='command', required=True)
+    make = commands.add_parser('make')
+    make.add_argument('old')
+    make.add_argument('new')
+    make.add_argument('-o', '--output', required=True)
+    apply = commands.add_parser('apply')
+    apply.add_argument('old')
+    apply.add_argument('patch')
+    apply.add_argument('-o', '--output', required=True)
+    release = commands.add_parser('release')
+    release.add_argument('old_dir')
+    release.add_argument('new_dir')
+    release.add_argument('manifest', help="the new release's manifest, updated in place")
+    release.add_argument('--base-url', required=True, help='URL the patch directory is served under')
+    release.add_argument('--patch-dir', help='default: NEW_DIR-patches, next to NEW_DIR')
+    benchmark = commands.add_parser('bench')
+    benchmark.add_argument('old', nargs='?')
+    benchmark.add_argument('new', nargs='?')
+    args = parser.parse_args()
+
+    if args.command == 'make':
+        with open(args.old, 'rb') as f:
+            old = f.read()
+        with open(args.new, 'rb') as f:
+            patch = make_patch(old, f.read(), args.block)
+        with open(args.output, 'wb') as f:
+            f.write(patch)
+    elif args.command == 'apply':
+        try:
+            apply_patch_file(args.old, args.patch, args.output)
+        except PatchError as e:
+            sys.exit(f"Patch failed: {e}")
+    elif args.command == 'release':
+        for path in build_release_patches(args.old_dir, args.new_dir, args.manifest, args.base_url,
+                                          args.patch_dir, args.block):
+            print(path)
+    else:
+        print(json.dumps(bench(args.old, args.new, args.block), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,347 @@
+import http.client
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+
+PART_SUFFIX = ".part"  # data received so far, renamed into place once complete
+META_SUFFIX = ".part.json"  # validators of the partial file, so a resume can't mix versions
+REDIRECTS = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+
+
+class DownloadError(Exception):
+    """
+    One or more downloads failed; `failures` maps each failed path to its error.
+    """
+    def __init__(self, failures):
+        self.failures = failures
+        details = "; ".join(f"{os.path.basename(path)}: {error}" for path, error in failures.items())
+        super().__init__(f"{len(failures)} download(s) failed: {details}")
+
+
+class HTTPStatusError(Exception):
+    """
+    The server answered with an error status. Only 5xx ones are worth retrying.
+    """
+    def __init__(self, status, reason, url):
+        self.status = status
+        super().__init__(f"HTTP {status} {reason} for {url}")
+
+
+class ConnectionPool:
+    """
+    Idle keep-alive HTTP(S) connections per host, shared between download threads.
+    """
+    def __init__(self, timeout=30, max_idle_per_host=4):
+        self.timeout = timeout
+        self.max_idle_per_host = max_idle_per_host
+        self.opened = 0  # connections created, for telling whether reuse works
+        self._idle = {}  # (scheme, host, port) -> queue of connections
+        self._lock = threading.Lock()
+
+    def _queue(self, key):
+        with self._lock:
+            return self._idle.setdefault(key, queue.LifoQueue())
+
+    def get(self, scheme, netloc, fresh=False):
+        """
+        Returns (pool key, connection, whether it was reused from the pool).
+        """
+        key = (scheme, netloc)
+        if not fresh:
+            try:
+                return key, self._queue(key).get_nowait(), True
+            except queue.Empty:
+                pass
+        with self._lock:
+            self.opened += 1
+        if scheme == "https":
+            return key, http.client.HTTPSConnection(netloc, timeout=self.timeout), False
+        return key, http.client.HTTPConnection(netloc, timeout=self.timeout), False
+
+    def put(self, key, connection):
+        idle = self._queue(key)
+        if idle.qsize() >= self.max_idle_per_host:
+            connection.close()
+        else:
+            idle.put(connection)
+
+    def close(self):
+        with self._lock:
+            queues, self._idle = list(self._idle.values()), {}
+        for idle in queues:
+            while not idle.empty():
+                idle.get_nowait().close()
+
+
+class _Transfer:
+    """
+    Byte counts of one file for the aggregated progress.
+    """
+    def __init__(self, url, path, consumer=None):
+        self.url = url
+        self.path = path
+        self.consumer = consumer
+        self.total = None  # unknown until the server answers
+        self.done = 0
+        self.finished = False
+
+
+class DownloadEngine:
+    """
+    Fetches many files at once over pooled keep-alive connections.
+
+    Each file is written to `<path>.part` and renamed over `path` only once it is complete,
+    so an interrupted download never looks finished. A later run (or a retry after a
+    dropped connection) resumes the partial file with an HTTP Range request, guarded by
+    If-Range so a file that changed on the server is fetched again from the start.
+
+    `progress(done_bytes, total_bytes, files_done, files)` is called from the worker
+    threads at most every `progress_interval` seconds and once at the end; total_bytes
+    only counts files whose size is known so far.
+
+    `consumers` may map paths to objects that see a file's bytes in order while it
+    downloads (such as archives.ZipStreamExtractor): reset() whenever the file starts over,
+    feed(block) for every block including the partial file a resume starts from, and
+    close() once it is complete, which may raise to fail the download.
+    """
+    def __init__(self, workers=4, timeout=30, retries=3, block_size=64 * 1024, progress_interval=0.1):
+        self.workers = workers
+        self.retries = retries
+        self.block_size = block_size
+        self.progress_interval = progress_interval
+        self.pool = ConnectionPool(timeout=timeout, max_idle_per_host=workers)
+        self._lock = threading.Lock()
+        self._transfers = []
+        self._progress = None
+        self._last_report = 0.0
+
+    def fetch(self, downloads, progress=None, consumers=None):
+        """
+        Downloads every (url, path) pair, creating parent directories as needed. Returns
+        the paths once all are in place; raises DownloadError listing the files that
+        failed after their retries (the others are still kept).
+        """
+        consumers = consumers or {}
+        self._transfers = [_Transfer(url, path, consumers.get(path)) for url, path in downloads]
+        self._progress = progress
+        failures = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="download") as executor:
+            futures = [(transfer, executor.submit(self._fetch_with_retries, transfer)) for transfer in self._transfers]
+            for transfer, future in futures:
+                error = future.exception()
+                if error is not None:
+                    failures[transfer.path] = error
+        self._report(force=True)
+        if failures:
+            raise DownloadError(failures)
+        return [transfer.path for transfer in self._transfers]
+
+    def close(self):
+        self.pool.close()
+
+    # === One file ===
+    def _fetch_with_retries(self, transfer):
+        os.makedirs(os.path.dirname(os.path.abspath(transfer.path)), exist_ok=True)
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    return self._fetch(transfer)
+                except (OSError, http.client.HTTPException, HTTPStatusError) as e:
+                    if attempt == self.retries or (isinstance(e, HTTPStatusError) and e.status < 500):
+                        raise
+                    time.sleep(0.5 * 2 ** attempt)  # the partial file is kept, so the retry resumes
+        except BaseException as e:
+            if transfer.consumer:
+                transfer.consumer.reset()
+                if not isinstance(e, (OSError, http.client.HTTPException, HTTPStatusError)):
+                    # The consumer rejected the data itself, so resuming it would fail again
+                    for suffix in (PART_SUFFIX, META_SUFFIX):
+                        try:
+                            os.remove(transfer.path + suffix)
+                        except FileNotFoundError:
+                            pass
+            raise
+
+    def _fetch(self, transfer):
+        part = transfer.path + PART_SUFFIX
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        validator = self._load_validator(transfer.path) if offset else None
+        headers = {"Accept-Encoding": "identity"}
+        if offset and validator:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = validator
+        elif offset:
+            offset = 0  # no way to tell whether the partial file is still current
+
+        key, connection, response = self._request(transfer.url, headers)
+        try:
+            if response.status == 416:
+                # The partial file already holds everything
+                response.read()
+                total = _content_range_total(response.getheader("Content-Range"))
+                if total is None or total != offset:
+                    os.remove(part)  # not a prefix of the current file; start over on retry
+                    raise http.client.HTTPException(f"Range not satisfiable for {transfer.url}")
+                self._set_total(transfer, total, offset)
+                self._start_consumer(transfer, part, offset)
+                self._complete(transfer)
+                self.pool.put(key, connection)
+                return transfer.path
+            if response.status == 206:
+                start = _content_range_start(response.getheader("Content-Range"))
+                if start != offset:
+                    raise http.client.HTTPException(f"Server resumed {transfer.url} at the wrong offset")
+                total = _content_range_total(response.getheader("Content-Range"))
+                mode = "ab"
+            elif response.status == 200:
+                offset = 0  # new file, or the server ignored the range
+                length = response.getheader("Content-Length")
+                total = int(length) if length is not None else None
+                mode = "wb"
+                self._save_validator(transfer.path, response)
+            else:
+                response.read()
+                raise HTTPStatusError(response.status, response.reason, transfer.url)
+
+            self._set_total(transfer, total, offset)
+            self._start_consumer(transfer, part, offset)
+            received = offset
+            with open(part, mode) as f:
+                while True:
+                    block = response.read(self.block_size)
+                    if not block:
+                        break
+                    f.write(block)
+                    if transfer.consumer:
+                        transfer.consumer.feed(block)
+                    received += len(block)
+                    self._advance(transfer, len(block))
+            if total is not None and received != total:
+                raise http.client.IncompleteRead(b"", total - received)
+        except BaseException:
+            connection.close()
+            raise
+        self.pool.put(key, connection)
+        self._complete(transfer)
+        return transfer.path
+
+    def _request(self, url, headers):
+        """
+        Sends a GET, following redirects; returns (pool key, connection, response).
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            target = parts.path or "/"
+            if parts.query:
+                target += "?" + parts.query
+            key, connection, reused = self.pool.get(parts.scheme, parts.netloc)
+            try:
+                connection.request("GET", target, headers=headers)
+                response = connection.getresponse()
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                if not reused:
+                    raise
+                # The server closed the idle connection meanwhile; try once more on a new one
+                key, connection, _ = self.pool.get(parts.scheme, parts.netloc, fresh=True)
+                try:
+                    connection.request("GET", target, headers=headers)
+                    response = connection.getresponse()
+                except BaseException:
+                    connection.close()
+                    raise
+            if response.status not in REDIRECTS:
+                return key, connection, response
+            response.read()
+            self.pool.put(key, connection)
+            url = urljoin(url, response.getheader("Location"))
+        raise http.client.HTTPException(f"Too many redirects for {url}")
+
+    def _start_consumer(self, transfer, part, offset):
+        if transfer.consumer is None:
+            return
+        transfer.consumer.reset()
+        if offset:
+            # Catch up on what earlier attempts already wrote
+            with open(part, "rb") as f:
+                while True:
+                    block = f.read(self.block_size)
+                    if not block:
+                        break
+                    transfer.consumer.feed(block)
+
+    def _complete(self, transfer):
+        if transfer.consumer:
+            transfer.consumer.close()
+        os.replace(transfer.path + PART_SUFFIX, transfer.path)
+        try:
+            os.remove(transfer.path + META_SUFFIX)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            transfer.finished = True
+        self._report()
+
+    @staticmethod
+    def _load_validator(path):
+        try:
+            with open(path + META_SUFFIX) as f:
+                return json.load(f).get("validator")
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _save_validator(path, response):
+        # A strong ETag identifies the exact bytes; Last-Modified is the fallback If-Range accepts
+        etag = response.getheader("ETag")
+        validator = etag if etag and not etag.startswith("W/") else response.getheader("Last-Modified")
+        if validator:
+            with open(path + META_SUFFIX, "w") as f:
+                json.dump({"validator": validator}, f)
+
+    # === Progress ===
+    def _set_total(self, transfer, total, offset):
+        with self._lock:
+            transfer.total = total
+            transfer.done = offset
+        self._report()
+
+    def _advance(self, transfer, count):
+        with self._lock:
+            transfer.done += count
+        self._report()
+
+    def _report(self, force=False):
+        if self._progress is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_report < self.progress_interval:
+                return
+            self._last_report = now
+            done = sum(t.done for t in self._transfers)
+            total = sum(t.total if t.total is not None else t.done for t in self._transfers)
+            finished = sum(t.finished for t in self._transfers)
+        self._progress(done, total, finished, len(self._transfers))
+
+
+def _content_range_start(header):
+    # "bytes 100-199/200"
+    try:
+        return int(header.split()[1].split("-")[0])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def _content_range_total(header):
+    # "bytes 100-199/200" or "bytes */200"; None if absent or "*"
+    try:
+        total = header.rsplit("/", 1)[1]
+    except (AttributeError, IndexError):
+        return None
+    return int(total) if total.isdigit() else None
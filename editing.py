@@ -0,0 +1,156 @@
+from collections import deque
+
+import numpy as np
+
+from lighting import relight_block, relight_chunks
+from world import CHUNK_SIZE, AIR
+
+
+def _box(corner, other):
+    """
+    Half-open (x0, y0, z0), (x1, y1, z1) bounds of the box spanned by two block positions,
+    both included, in any order.
+    """
+    lo = tuple(min(a, b) for a, b in zip(corner, other))
+    hi = tuple(max(a, b) + 1 for a, b in zip(corner, other))
+    return lo, hi
+
+
+class WorldEditor:
+    """
+    Block edits with undo: single blocks, and box fills, replaces and copy/paste that
+    work on whole chunk slices at once.
+
+    Every operation returns the coords of the loaded chunks whose meshes need rebuilding,
+    each listed once however many of its blocks changed. Small edits relight cell by cell;
+    larger ones relight the chunks around them from scratch, which is cheaper past a few
+    dozen cells.
+
+    Undo and redo replay the blocks saved before and after each operation, kept until
+    `max_steps` operations or `max_bytes` of them are stored. Only loaded chunks are
+    edited; cells in unloaded chunks are skipped, and read as AIR when copied.
+    """
+    # Edits of up to this many cells are relit incrementally, block by block
+    SMALL_EDIT = 64
+
+    def __init__(self, world, max_steps=100, max_bytes=64 * 1024 * 1024):
+        self.world = world
+        self.max_steps = max_steps
+        self.max_bytes = max_bytes
+        self.clipboard = None  # block id array from the last copy()
+        self._undo = deque()  # (origin, blocks before, blocks after), oldest first
+        self._redo = []
+        self._bytes = 0
+
+    # === Operations ===
+    def set_block(self, x, y, z, block):
+        before = self.world.get_region(x, y, z, x + 1, y + 1, z + 1)
+        return self._edit((x, y, z), before, np.full_like(before, block))
+
+    def fill(self, corner, other, block):
+        """
+        Sets every block in the box between two corners (both included) to `block`.
+        """
+        (x0, y0, z0), (x1, y1, z1) = _box(corner, other)
+        before = self.world.get_region(x0, y0, z0, x1, y1, z1)
+        return self._edit((x0, y0, z0), before, np.full_like(before, block))
+
+    def replace(self, corner, other, old, new):
+        """
+        Turns every `old` block in the box between two corners into `new`.
+        """
+        (x0, y0, z0), (x1, y1, z1) = _box(corner, other)
+        before = self.world.get_region(x0, y0, z0, x1, y1, z1)
+        after = before.copy()
+        after[before == old] = new
+        return self._edit((x0, y0, z0), before, after)
+
+    def copy(self, corner, other):
+        """
+        Copies the box between two corners to the clipboard and returns it.
+        """
+        (x0, y0, z0), (x1, y1, z1) = _box(corner, other)
+        self.clipboard = self.world.get_region(x0, y0, z0, x1, y1, z1)
+        return self.clipboard
+
+    def paste(self, x, y, z, blocks=None, include_air=False):
+        """
+        Pastes `blocks` (default: the clipboard) with its lowest corner at (x, y, z).
+        Air in the pasted region keeps what is already there unless `include_air`.
+        """
+        blocks = self.clipboard if blocks is None else np.asarray(blocks)
+        if blocks is None:
+            return set()
+        sx, sy, sz = blocks.shape
+        before = self.world.get_region(x, y, z, x + sx, y + sy, z + sz)
+        after = blocks.astype(before.dtype) if include_air else np.where(blocks != AIR, blocks, before).astype(before.dtype)
+        return self._edit((x, y, z), before, after)
+
+    # === History ===
+    def undo(self):
+        """
+        Reverts the last operation; returns the chunks to remesh (empty if there was none).
+        """
+        if not self._undo:
+            return set()
+        step = self._undo.pop()
+        self._bytes -= step[1].nbytes + step[2].nbytes
+        self._redo.append(step)
+        origin, before, after = step
+        return self._apply(origin, after, before)
+
+    def redo(self):
+        if not self._redo:
+            return set()
+        step = self._redo.pop()
+        self._remember(step)
+        origin, before, after = step
+        return self._apply(origin, before, after)
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def _remember(self, step):
+        self._undo.append(step)
+        self._bytes += step[1].nbytes + step[2].nbytes
+        while len(self._undo) > 1 and (len(self._undo) > self.max_steps or self._bytes > self.max_bytes):
+            _, before, after = self._undo.popleft()
+            self._bytes -= before.nbytes + after.nbytes
+
+    # === Applying ===
+    def _edit(self, origin, before, after):
+        if np.array_equal(before, after):
+            return set()
+        self._redo.clear()
+        self._remember((origin, before, after))
+        return self._apply(origin, before, after)
+
+    def _apply(self, origin, before, after):
+        x0, y0, z0 = origin
+        changed = before != after
+        count = int(np.count_nonzero(changed))
+        if count <= self.SMALL_EDIT:
+            remesh = set()
+            for dx, dy, dz in zip(*np.nonzero(changed)):
+                x, y, z = x0 + int(dx), y0 + int(dy), z0 + int(dz)
+                if self.world.set_block(x, y, z, int(after[dx, dy, dz])):
+                    remesh.update(relight_block(self.world, x, y, z))
+                    remesh.update(self.world.chunks_showing(x, z))
+            return remesh
+
+        edited = self.world.set_region(x0, y0, z0, after, mask=changed)
+        remesh = set(edited) | relight_chunks(self.world, edited)
+        # Chunks beside the box draw its outermost columns against their own faces
+        x1, z1 = x0 + after.shape[0] - 1, z0 + after.shape[2] - 1
+        for cx, cz in edited:
+            bx, bz = cx * CHUNK_SIZE, cz * CHUNK_SIZE
+            for (dx, dz), border in (((-1, 0), x0 <= bx <= x1), ((1, 0), x0 <= bx + CHUNK_SIZE - 1 <= x1),
+                                     ((0, -1), z0 <= bz <= z1), ((0, 1), z0 <= bz + CHUNK_SIZE - 1 <= z1)):
+                if border and (cx + dx, cz + dz) in self.world:
+                    remesh.add((cx + dx, cz + dz))
+        return remesh
@@ -0,0 +1,76 @@
+from picking import raycast_voxels
+from pipeline import ChunkPipeline
+from terrain import TerrainGenerator
+from world import World, CHUNK_SIZE
+
+
+class HeadlessSession:
+    """
+    The client's world pipeline (terrain, streaming, meshing, picking) without a window.
+
+    Runs the same ChunkPipeline as client.py, but keeps finished meshes in a dict instead
+    of creating entities, so world logic can be driven from scripts, benchmarks and
+    servers without calling app.run().
+    """
+    def __init__(self, seed=1, render_distance=6, unload_margin=1, max_chunks=256,
+                 lod_distance=3, lod_step=2, workers=2, tiles=None):
+        self.world = World()
+        self.terrain = TerrainGenerator(seed=seed)
+        self.meshes = {}  # (cx, cz) -> ChunkMesh
+        self.loads = 0
+        self.unloads = 0
+        self.pipeline = ChunkPipeline(
+            self.world, self.terrain.generate, tiles,
+            load_radius=render_distance,
+            unload_margin=unload_margin,
+            max_chunks=max_chunks,
+            lod_distance=lod_distance,
+            lod_step=lod_step,
+            workers=workers,
+            on_mesh=self._on_mesh,
+            on_unload=self._on_unload
+        )
+        self.streamer = self.pipeline.streamer
+
+    def _on_mesh(self, cx, cz, mesh):
+        if (cx, cz) not in self.meshes:
+            self.loads += 1
+        self.meshes[(cx, cz)] = mesh
+
+    def _on_unload(self, cx, cz):
+        self.meshes.pop((cx, cz), None)
+        self.unloads += 1
+
+    def move_to(self, x, z, velocity=(0, 0), wait=True):
+        """
+        Moves the virtual player to world (x, z). With `wait`, blocks until every chunk the
+        move requested is loaded; otherwise attaches only what one frame's budget allows.
+        """
+        self.streamer.update(int(x // CHUNK_SIZE), int(z // CHUNK_SIZE), velocity)
+        self.pipeline.update_lods()
+        if wait:
+            self.streamer.flush()
+            self.pipeline.remesh_dirty(background=False)
+        else:
+            self.streamer.integrate()
+            self.pipeline.remesh_dirty()
+
+    def spawn(self, x, z):
+        """
+        Loads only the chunk under world (x, z), as the client does before letting the
+        player in, and returns the top solid y there. The rest of the view keeps loading
+        through move_to(..., wait=False) or streamer.flush().
+        """
+        cx, cz = self.world.chunk_coords(x, z)
+        self.streamer.update(cx, cz)
+        self.streamer.flush([(cx, cz)])
+        return self.world.top_block(x, z)
+
+    def pick(self, origin, direction, distance=5):
+        return raycast_voxels(self.world, origin, direction, distance)
+
+    def surface_y(self, x, z):
+        return self.terrain.height_at(x, z)
+
+    def close(self):
+        self.streamer.shutdown()
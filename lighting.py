@@ -0,0 +1,273 @@
+from collections import deque
+
+import numpy as np
+
+from world import CHUNK_SIZE, CHUNK_HEIGHT, AIR, BLOCK_EMISSION
+
+# === Constants ===
+MAX_LIGHT = 15
+# Both channels share one uint8 per cell: sky light in the high nibble, block light in the low
+SKY = 4
+BLOCK_LIGHT = 0
+
+_NEIGHBOURS = ((1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1))
+
+
+def _emission_array(blocks):
+    emission = np.zeros(blocks.shape, dtype=np.int16)
+    for block, level in BLOCK_EMISSION.items():
+        emission[blocks == block] = level
+    return emission
+
+
+def _spread(levels, transparent):
+    """
+    Relaxes light across the transparent cells of one chunk: every cell ends up at the
+    brightest neighbour minus one, as a breadth-first flood would leave it.
+    """
+    for _ in range(MAX_LIGHT):
+        spread = levels.copy()
+        for axis in range(3):
+            lo = [slice(None)] * 3
+            hi = [slice(None)] * 3
+            lo[axis] = slice(None, -1)
+            hi[axis] = slice(1, None)
+            lo, hi = tuple(lo), tuple(hi)
+            np.maximum(spread[hi], levels[lo] - 1, out=spread[hi])
+            np.maximum(spread[lo], levels[hi] - 1, out=spread[lo])
+        spread = np.where(transparent, spread, levels)
+        if np.array_equal(spread, levels):
+            break
+        levels = spread
+    return levels
+
+
+def initial_light(blocks):
+    """
+    Light for a freshly loaded chunk on its own, ignoring its neighbours: full sky light
+    down every open column, block light around emitters, both spread through the chunk.
+    Vectorised and side-effect free, so it can run on a worker thread.
+    """
+    transparent = blocks == AIR
+    # Open to the sky if nothing solid is at or above the cell
+    covered = np.logical_or.accumulate(~transparent[:, ::-1, :], axis=1)[:, ::-1, :]
+    sky = _spread(np.where(covered, 0, MAX_LIGHT).astype(np.int16), transparent)
+    block = _spread(_emission_array(blocks), transparent)
+    return ((sky << SKY) | block).astype(np.uint8)
+
+
+def chunk_light(chunk):
+    """
+    The chunk's light array, computed on first use.
+    """
+    if chunk.light is None:
+        chunk.light = initial_light(chunk.blocks)
+    return chunk.light
+
+
+class _LightAccess:
+    """
+    Reads and writes one light channel by world coordinate, remembering which columns
+    changed so the chunks showing them can be remeshed.
+    """
+    def __init__(self, world, channel):
+        self.world = world
+        self.channel = channel
+        self.mask = MAX_LIGHT << channel
+        self.changed = set()  # (x, z) columns
+
+    def cell(self, x, y, z):
+        """
+        (light array, lx, lz) for a loaded cell, or None.
+        """
+        if not 0 <= y < CHUNK_HEIGHT:
+            return None
+        chunk = self.world.chunks.get((x // CHUNK_SIZE, z // CHUNK_SIZE))
+        if chunk is None:
+            return None
+        return chunk_light(chunk), x % CHUNK_SIZE, z % CHUNK_SIZE
+
+    def get(self, x, y, z):
+        cell = self.cell(x, y, z)
+        if cell is None:
+            return MAX_LIGHT if self.channel == SKY and y >= CHUNK_HEIGHT else 0
+        light, lx, lz = cell
+        return (int(light[lx, y, lz]) & self.mask) >> self.channel
+
+    def set(self, x, y, z, level):
+        light, lx, lz = self.cell(x, y, z)
+        light[lx, y, lz] = (int(light[lx, y, lz]) & ~self.mask & 0xFF) | (level << self.channel)
+        self.changed.add((x, z))
+
+    def passes(self, dy, level):
+        """
+        The level that light at `level` has after one step along dy.
+        Full sky light falls straight down without fading.
+        """
+        if self.channel == SKY and dy == -1 and level == MAX_LIGHT:
+            return MAX_LIGHT
+        return level - 1
+
+    def flood(self, queue):
+        """
+        Breadth-first add pass: spreads light outwards from every cell in `queue`.
+        """
+        world = self.world
+        while queue:
+            x, y, z = queue.popleft()
+            level = self.get(x, y, z)
+            if level <= 1:
+                continue
+            for dx, dy, dz in _NEIGHBOURS:
+                nx, ny, nz = x + dx, y + dy, z + dz
+                if self.cell(nx, ny, nz) is None or world.get_block(nx, ny, nz) != AIR:
+                    continue
+                target = self.passes(dy, level)
+                if self.get(nx, ny, nz) < target:
+                    self.set(nx, ny, nz, target)
+                    queue.append((nx, ny, nz))
+
+    def unflood(self, x, y, z):
+        """
+        Breadth-first remove pass: darkens everything that was lit through (x, y, z) and
+        returns the brighter cells on the edge of the dark region, to flood back in from.
+        """
+        removal = deque([(x, y, z, self.get(x, y, z))])
+        self.set(x, y, z, 0)
+        refill = deque()
+        while removal:
+            x, y, z, level = removal.popleft()
+            for dx, dy, dz in _NEIGHBOURS:
+                nx, ny, nz = x + dx, y + dy, z + dz
+                if self.cell(nx, ny, nz) is None:
+                    continue
+                neighbour = self.get(nx, ny, nz)
+                if neighbour == 0:
+                    continue
+                if neighbour < level or self.passes(dy, level) == neighbour == MAX_LIGHT:
+                    self.set(nx, ny, nz, 0)
+                    removal.append((nx, ny, nz, neighbour))
+                else:
+                    refill.append((nx, ny, nz))
+        return refill
+
+
+def _touched_chunks(world, accesses):
+    coords = set()
+    for access in accesses:
+        for x, z in access.changed:
+            coords.update(world.chunks_showing(x, z))
+    return coords
+
+
+def relight_block(world, x, y, z):
+    """
+    Updates both light channels after the block at (x, y, z) changed, touching only the
+    cells whose light actually changes. Returns the coords of the loaded chunks whose
+    meshes need rebuilding for it.
+    """
+    block = world.get_block(x, y, z)
+    emission = BLOCK_EMISSION.get(block, 0)
+    accesses = [_LightAccess(world, SKY), _LightAccess(world, BLOCK_LIGHT)]
+    if accesses[0].cell(x, y, z) is None:
+        return set()
+    for access in accesses:
+        channel = access.channel
+        queue = deque()
+        if access.get(x, y, z):
+            queue.extend(access.unflood(x, y, z))
+        if channel == BLOCK_LIGHT and emission:
+            access.set(x, y, z, emission)
+            queue.append((x, y, z))
+        if block == AIR:
+            # Let the surrounding light back into the opened cell
+            if channel == SKY and y == CHUNK_HEIGHT - 1:
+                access.set(x, y, z, MAX_LIGHT)
+                queue.append((x, y, z))
+            for dx, dy, dz in _NEIGHBOURS:
+                if access.cell(x + dx, y + dy, z + dz) is not None:
+                    queue.append((x + dx, y + dy, z + dz))
+        access.flood(queue)
+    return _touched_chunks(world, accesses)
+
+
+def join_chunk(world, cx, cz):
+    """
+    Exchanges light across the borders of a chunk that just became resident and its
+    loaded neighbours, since each was lit without the other. Only border cells brighter
+    than their neighbour across the border seed the flood, so chunks that already agree
+    cost a few array comparisons. Returns the coords of chunks whose light changed.
+    """
+    chunk = world.get_chunk(cx, cz)
+    if chunk is None:
+        return set()
+    accesses = [_LightAccess(world, SKY), _LightAccess(world, BLOCK_LIGHT)]
+    queues = [deque(), deque()]
+    x0, z0 = cx * CHUNK_SIZE, cz * CHUNK_SIZE
+    last = CHUNK_SIZE - 1
+    for dx, dz in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+        other = world.get_chunk(cx + dx, cz + dz)
+        if other is None:
+            continue
+        # Border planes facing each other: (x or z index in this chunk, in the other)
+        mine_at, theirs_at = (last, 0) if dx + dz > 0 else (0, last)
+        for source, target, source_at, target_at, offset in ((chunk, other, mine_at, theirs_at, (0, 0)),
+                                                               (other, chunk, theirs_at, mine_at, (dx, dz))):
+            # Planes are indexed [i, y], i running along the border
+            if dx:
+                source_plane = chunk_light(source)[source_at, :, :].T
+                target_plane = chunk_light(target)[target_at, :, :].T
+                open_target = (target[target_at, :, :] == AIR).T
+            else:
+                source_plane = chunk_light(source)[:, :, source_at]
+                target_plane = chunk_light(target)[:, :, target_at]
+                open_target = target[:, :, target_at] == AIR
+            for channel, queue in zip((SKY, BLOCK_LIGHT), queues):
+                mask = MAX_LIGHT << channel
+                src = (source_plane.astype(np.int16) & mask) >> channel
+                dst = (target_plane.astype(np.int16) & mask) >> channel
+                for i, y in zip(*np.nonzero(open_target & (src - 1 > dst))):
+                    lx, lz = (source_at, i) if dx else (i, source_at)
+                    queue.append((x0 + offset[0] * CHUNK_SIZE + lx, int(y), z0 + offset[1] * CHUNK_SIZE + lz))
+    for access, queue in zip(accesses, queues):
+        access.flood(queue)
+    return _touched_chunks(world, accesses)
+
+
+def relight_chunks(world, coords):
+    """
+    Relights many chunks at once after a bulk edit, where flooding cell by cell would
+    take far longer. Light travels at most MAX_LIGHT blocks, so the edited chunks and
+    every loaded chunk that close to them are lit from scratch and then joined with their
+    neighbours. Returns the coords of the loaded chunks whose meshes need rebuilding for it.
+    """
+    reach = -(-MAX_LIGHT // CHUNK_SIZE)
+    previous = {}  # coord -> light before relighting
+    for cx, cz in coords:
+        for nx in range(cx - reach, cx + reach + 1):
+            for nz in range(cz - reach, cz + reach + 1):
+                chunk = world.get_chunk(nx, nz)
+                if chunk is None or (nx, nz) in previous:
+                    continue
+                previous[(nx, nz)] = chunk.light
+                chunk.light = initial_light(chunk.blocks)
+    for coord in previous:
+        join_chunk(world, *coord)
+
+    touched = set()
+    last = CHUNK_SIZE - 1
+    for (cx, cz), old in previous.items():
+        new = world.get_chunk(cx, cz).light
+        if old is None:
+            touched.add((cx, cz))
+            continue
+        diff = old != new
+        if not diff.any():
+            continue
+        touched.add((cx, cz))
+        # Neighbours draw this chunk's border cells too
+        for (dx, dz), plane in (((-1, 0), diff[0]), ((1, 0), diff[last]),
+                                ((0, -1), diff[:, :, 0]), ((0, 1), diff[:, :, last])):
+            if plane.any() and (cx + dx, cz + dz) in world:
+                touched.add((cx + dx, cz + dz))
+    return touched
@@ -0,0 +1,172 @@
+"""
+Load test for server.py: N simulated headless clients walk around and edit blocks.
+
+    python loadtest.py --clients 16 --seconds 20            # against an in-process server
+    python loadtest.py --connect 127.0.0.1:25565 --clients 8
+
+Prints JSON with the server's tick times (in-process only) and the bandwidth of each
+client. Simulated clients decode every chunk they get but don't mesh, so one process can
+drive many of them.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import numpy as np
+
+import protocol
+from region import decode_chunk
+from server import WorldServer
+from world import World, CHUNK_SIZE, AIR, BLOCK
+
+
+class SimulatedClient:
+    """
+    A player without a window: walks a random path, keeps the chunks the server sends,
+    releases those it leaves behind and breaks or places a block now and then.
+    """
+    def __init__(self, index, radius, speed, edit_rate, seed):
+        self.index = index
+        self.radius = radius
+        self.speed = speed  # blocks per second
+        self.edit_rate = edit_rate  # edits per second
+        self.rng = random.Random(seed)
+        self.world = World()
+        self.chunks_received = 0
+        self.edits_received = 0
+        self.edits_sent = 0
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self._writer = None
+
+    def _send(self, data):
+        self._writer.write(data)
+        self.bytes_sent += len(data)
+
+    async def _read(self, reader):
+        while True:
+            kind, body = await protocol.read_frame(reader)
+            self.bytes_received += len(body) + 5
+            if kind == protocol.CHUNK:
+                self.world.add_chunk(decode_chunk(*protocol.parse_chunk(body)))
+                self.chunks_received += 1
+            elif kind == protocol.DELTAS:
+                for x, y, z, block in protocol.parse_deltas(body):
+                    self.world.set_block(x, y, z, block)
+                    self.edits_received += 1
+
+    async def run(self, host, port, seconds):
+        reader, self._writer = await asyncio.open_connection(host, port)
+        self._send(protocol.hello())
+        kind, _ = await protocol.read_frame(reader)
+        if kind != protocol.WELCOME:
+            raise protocol.ProtocolError("Expected WELCOME")
+        receiving = asyncio.create_task(self._read(reader))
+
+        x = z = 0.0
+        heading = self.rng.uniform(0, 2 * np.pi)
+        center = None
+        step = 0.05
+        end = time.perf_counter() + seconds
+        try:
+            while time.perf_counter() < end:
+                await asyncio.sleep(step)
+                heading += self.rng.uniform(-0.3, 0.3)
+                x += np.cos(heading) * self.speed * step
+                z += np.sin(heading) * self.speed * step
+                cx, cz = int(x // CHUNK_SIZE), int(z // CHUNK_SIZE)
+                if (cx, cz) != center:
+                    center = (cx, cz)
+                    self._send(protocol.position(cx, cz, self.radius))
+                    for coord in list(self.world.chunks):
+                        if max(abs(coord[0] - cx), abs(coord[1] - cz)) > self.radius + 1:
+                            self.world.remove_chunk(*coord)
+                            self._send(protocol.coord_message(protocol.RELEASE, *coord))
+                if self.world.chunks and self.rng.random() < self.edit_rate * step:
+                    self._edit(int(x), int(z))
+        finally:
+            receiving.cancel()
+            self._writer.close()
+
+    def _edit(self, x, z):
+        if (x // CHUNK_SIZE, z // CHUNK_SIZE) not in self.world:
+            return
+        top = self.world.top_block(x, z)
+        if top < 0:
+            return
+        if self.rng.random() < 0.5:
+            self._send(protocol.edit(x, top, z, AIR))
+        else:
+            self._send(protocol.edit(x, top + 1, z, BLOCK))
+        self.edits_sent += 1
+
+    def report(self, seconds):
+        return {
+            'chunks_received': self.chunks_received,
+            'edits_sent': self.edits_sent,
+            'edits_received': self.edits_received,
+            'down_bytes_per_second': self.bytes_received / seconds,
+            'up_bytes_per_second': self.bytes_sent / seconds,
+        }
+
+
+def _summary(values):
+    values = np.asarray(values, dtype=np.float64)
+    return {'mean': float(values.mean()), 'max': float(values.max()), 'min': float(values.min())}
+
+
+async def run(args):
+    server = None
+    if args.connect:
+        host, _, port = args.connect.partition(':')
+        port = int(port or protocol.DEFAULT_PORT)
+    else:
+        server = WorldServer(seed=args.seed, tick_rate=args.tick_rate, max_radius=args.radius)
+        host, port = '127.0.0.1', await server.start('127.0.0.1', 0)
+
+    clients = [SimulatedClient(i, args.radius, args.speed, args.edit_rate, args.seed * 1000 + i)
+               for i in range(args.clients)]
+    start = time.perf_counter()
+    await asyncio.gather(*(client.run(host, port, args.seconds) for client in clients))
+    elapsed = time.perf_counter() - start
+
+    per_client = [client.report(elapsed) for client in clients]
+    results = {
+        'clients': args.clients,
+        'seconds': elapsed,
+        'radius': args.radius,
+        'bandwidth': {
+            'down_bytes_per_second': _summary([c['down_bytes_per_second'] for c in per_client]),
+            'up_bytes_per_second': _summary([c['up_bytes_per_second'] for c in per_client]),
+        },
+        'per_client': per_client,
+    }
+    if server:
+        p50, p95, p99 = server.tick_percentiles()
+        results['server'] = {
+            'tick_rate': args.tick_rate,
+            'tick_ms': {'p50': p50, 'p95': p95, 'p99': p99, 'max': max(server.tick_times) * 1000},
+            'resident_chunks': len(server.world.chunks),
+        }
+        await server.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--connect', help='host:port of a running server (default: start one in-process)')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--radius', type=int, default=4, help='view radius of each client, in chunks')
+    parser.add_argument('--speed', type=float, default=6.0, help='walking speed in blocks per second')
+    parser.add_argument('--edit-rate', type=float, default=2.0, help='edits per second per client')
+    parser.add_argument('--tick-rate', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
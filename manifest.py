@@ -0,0 +1,323 @@
+"""
+Release manifests: the size and SHA-256 of every file of a game version, so the launcher
+can tell exactly which local files are missing, stale or corrupt.
+
+    python manifest.py release
+    python manifest.py build release/ --base-url https://example.com/v1.2/ -o manifest.json
+    python manifest.py verify manifest.json ~/TurboCraft
+
+`release` rewrites the manifest.json of this repository, which is what the launcher
+fetches: run it whenever a file in RELEASE_FILES or version.txt changes. The version
+defaults to the newest entry of version.txt.
+"""
+import argparse
+import hashlib
+import json
+import ntpath
+import os
+import posixpath
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST_FORMAT = 1
+HASH_BLOCK = 1024 * 1024
+GAME_DIR = os.path.dirname(os.path.abspath(__file__))
+VERSION_FILE = os.path.join(GAME_DIR, 'version.txt')
+RELEASE_BASE_URL = 'https://github.com/sigmaplayz/file/raw/main/'
+# The files of a release: install path -> path in this repository, which is also its
+# path under RELEASE_BASE_URL
+RELEASE_FILES = {
+    'client.py': 'client.py',
+    **{name: name for name in ('archives.py', 'atlas.py', 'chunk_cache.py', 'culling.py', 'editing.py', 'lighting.py',
+                               'mesher.py', 'physics.py', 'picking.py', 'pipeline.py', 'profiler.py', 'protocol.py',
+                               'region.py', 'remote.py', 'render_distance.py', 'streaming.py', 'terrain.py',
+                               'world.py')},
+    'assets/bg.jpg': 'bg.jpg',
+    'assets/block_1.png': 'block_1.png',
+    'assets/signa.zip': 'signa.zip',
+}
+
+
+def check_path(path):
+    """
+    Raises ValueError unless `path` is a plain relative path with forward slashes that
+    can't leave the directory it is joined to, read either as a POSIX or a Windows path:
+    no backslashes, drive letters, UNC or rooted paths, and no `.`, `..` or empty parts.
+    """
+    bad = (not isinstance(path, str) or not path or '\\' in path or ':' in path or '\0' in path
+           or posixpath.isabs(path) or ntpath.isabs(path) or ntpath.splitdrive(path)[0]
+           or posixpath.normpath(path) != path or '..' in path.split('/'))
+    if bad:
+        raise ValueError(f"Manifest path escapes the install directory: {path!r}")
+
+
+def local_path(root, path):
+    """
+    Where the manifest `path` lives under `root`. Raises ValueError if it is malformed
+    or resolves outside `root`, e.g. through a symlinked directory.
+    """
+    check_path(path)
+    full = os.path.join(root, *path.split('/'))
+    real_root = os.path.realpath(root)
+    if os.path.commonpath([real_root, os.path.realpath(full)]) != real_root:
+        raise ValueError(f"Manifest path escapes the install directory: {path!r}")
+    return full
+
+
+class ManifestEntry:
+    """
+    One file of a release. `sha256` and `size` may be None for files that are only
+    required to exist. `patches` lists binary deltas to this file from earlier versions
+    of it (see delta.py), as dicts of `from` (the old file's SHA-256), `url`, `size` and
+    `sha256` (of the patch). `extract` marks zip bundles the launcher may unpack next to
+    themselves instead of leaving them for the game to read in place (see archives.py).
+    """
+    def __init__(self, path, url, size=None, sha256=None, patches=None, extract=False):
+        self.path = path  # relative, with forward slashes
+        self.url = url
+        self.size = size
+        self.sha256 = sha256
+        self.patches = patches or []
+        self.extract = extract
+
+    def patch_from(self, digest):
+        """
+        The patch that turns the version of the file with SHA-256 `digest` into this one, or None.
+        """
+        return next((patch for patch in self.patches if patch['from'] == digest), None)
+
+    def to_json(self):
+        data = {'path': self.path, 'url': self.url, 'size': self.size, 'sha256': self.sha256}
+        if self.patches:
+            data['patches'] = self.patches
+        if self.extract:
+            data['extract'] = True
+        return data
+
+
+class Manifest:
+    def __init__(self, version, entries):
+        self.version = version
+        self.entries = entries
+
+    @classmethod
+    def from_json(cls, data):
+        if data.get('format') != MANIFEST_FORMAT:
+            raise ValueError(f"Unsupported manifest format {data.get('format')}")
+        entries = []
+        for item in data['files']:
+            path = item['path']
+            check_path(path)
+            entries.append(ManifestEntry(path, item['url'], item.get('size'), item.get('sha256'), item.get('patches'),
+                                         item.get('extract', False)))
+        return cls(data.get('version'), entries)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_json(json.load(f))
+
+    def to_json(self):
+        return {'format': MANIFEST_FORMAT, 'version': self.version, 'files': [e.to_json() for e in self.entries]}
+
+    def save(self, path):
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.to_json(), f, indent=2)
+        os.replace(tmp, path)
+
+    @classmethod
+    def build(cls, directory, base_url, version, workers=4):
+        """
+        A manifest for every file under `directory`, each served at base_url + its path;
+        zips are marked as bundles to extract.
+        """
+        paths = []
+        for root, _, files in os.walk(directory):
+            for name in files:
+                paths.append(os.path.relpath(os.path.join(root, name), directory).replace(os.sep, '/'))
+        return cls._from_files(directory, {path: path for path in paths}, base_url, version, workers)
+
+    @classmethod
+    def release(cls, version=None, base_url=RELEASE_BASE_URL, source=GAME_DIR, workers=4):
+        """
+        The manifest of the release published from this repository: RELEASE_FILES, each
+        served at base_url + its path in the repository.
+        """
+        return cls._from_files(source, RELEASE_FILES, base_url, version or release_version(), workers)
+
+    @classmethod
+    def _from_files(cls, directory, files, base_url, version, workers):
+        """
+        A manifest of `files`, install path -> path under both `directory` and `base_url`,
+        sorted by install path.
+        """
+        paths = sorted(files)
+        sources = [os.path.join(directory, *files[path].split('/')) for path in paths]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            digests = list(executor.map(file_sha256, sources))
+        entries = [ManifestEntry(path, base_url.rstrip('/') + '/' + files[path], os.path.getsize(source), digest,
+                                 extract=path.endswith('.zip'))
+                   for path, source, digest in zip(paths, sources, digests)]
+        return cls(version, entries)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(HASH_BLOCK)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_versions(path=VERSION_FILE):
+    """
+    The entries of version.txt, oldest first, as dicts of their `key: value` lines;
+    each entry starts at a `version:` line.
+    """
+    versions = []
+    with open(path) as f:
+        for line in f:
+            key, sep, value = line.partition(':')
+            if not sep:
+                continue
+            key, value = key.strip(), value.strip()
+            if key == 'version':
+                versions.append({})
+            if versions:
+                versions[-1][key] = value
+    return versions
+
+
+def release_version(path=VERSION_FILE):
+    """
+    The newest version in version.txt, without its leading "v" (e.g. "1.2").
+    """
+    version = read_versions(path)[-1]['version']
+    return version[1:] if version.startswith('v') else version
+
+
+class HashCache:
+    """
+    SHA-256 of local files, remembered by size and modification time so files that
+    haven't changed since the last launch aren't read again. Safe to use from threads.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.hashed = 0  # files actually read since opening
+        self._entries = {}  # absolute path -> [size, mtime_ns, sha256]
+        self._lock = threading.Lock()
+        self._changed = False
+        try:
+            with open(path) as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def sha256(self, path):
+        """
+        The file's digest, or None if it doesn't exist.
+        """
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = [stat.st_size, stat.st_mtime_ns]
+        with self._lock:
+            cached = self._entries.get(path)
+        if cached is not None and cached[:2] == key:
+            return cached[2]
+        digest = file_sha256(path)
+        with self._lock:
+            self._entries[path] = key + [digest]
+            self._changed = True
+            self.hashed += 1
+        return digest
+
+    def remember(self, path, digest):
+        """
+        Records the digest of a file known by other means, e.g. a fresh link to a checked file.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            self._entries[path] = [stat.st_size, stat.st_mtime_ns, digest]
+            self._changed = True
+
+    def forget(self, path):
+        with self._lock:
+            if self._entries.pop(os.path.abspath(path), None) is not None:
+                self._changed = True
+
+    def save(self):
+        with self._lock:
+            if not self._changed:
+                return
+            entries = {path: entry for path, entry in self._entries.items() if os.path.exists(path)}
+            self._changed = False
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp, self.path)
+
+
+def entry_ok(entry, root, cache):
+    """
+    Whether the local copy of `entry` under `root` is present and matches the manifest.
+    """
+    path = local_path(root, entry.path)
+    if not os.path.isfile(path):
+        return False
+    if entry.size is not None and os.path.getsize(path) != entry.size:
+        return False  # cheaper than hashing and catches truncated files
+    return entry.sha256 is None or cache.sha256(path) == entry.sha256
+
+
+def verify(manifest, root, cache, workers=4):
+    """
+    The manifest entries whose local files under `root` are missing or don't match,
+    hashing files in parallel. Unchanged files are answered from `cache`.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda entry: entry_ok(entry, root, cache), manifest.entries))
+    return [entry for entry, ok in zip(manifest.entries, results) if not ok]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='write a manifest for a release directory')
+    build.add_argument('directory')
+    build.add_argument('--base-url', required=True, help='URL the files are served under')
+    build.add_argument('--version', help='default: newest entry of version.txt')
+    build.add_argument('-o', '--output', default='manifest.json')
+    release = commands.add_parser('release', help="rewrite this repository's manifest.json")
+    release.add_argument('--base-url', default=RELEASE_BASE_URL)
+    release.add_argument('--version', help='default: newest entry of version.txt')
+    release.add_argument('-o', '--output', default=os.path.join(GAME_DIR, 'manifest.json'))
+    check = commands.add_parser('verify', help='list the files of an install that need fetching')
+    check.add_argument('manifest')
+    check.add_argument('root')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        Manifest.build(args.directory, args.base_url, args.version or release_version()).save(args.output)
+        return
+    if args.command == 'release':
+        Manifest.release(args.version, args.base_url).save(args.output)
+        return
+    cache = HashCache(os.path.join(args.root, '.hashcache.json'))
+    stale = verify(Manifest.load(args.manifest), args.root, cache)
+    cache.save()
+    for entry in stale:
+        print(entry.path)
+    sys.exit(1 if stale else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+import numpy as np
+
+from atlas import TILE_STRIDE
+from world import AIR
+
+# === Constants ===
+# Bump whenever the mesh output changes, so cached meshes are rebuilt
+MESH_VERSION = 2
+
+# Each face is (axis, direction): the face belongs to the solid cell and looks
+# towards the neighbour at +direction along the axis.
+FACES = ((0, 1), (0, -1), (1, 1), (1, -1), (2, 1), (2, -1))
+
+# Sign of (e_a x e_b) along the face axis, where a < b are the other two axes.
+_CROSS_SIGN = (1, -1, 1)
+
+
+class ChunkMesh:
+    """
+    Flat vertex, UV and index buffers for one chunk, ready to hand to ursina's Mesh.
+    `colors` holds (sky light, block light, 0, 1) per vertex in 0-1 for the atlas shader,
+    or is None for meshes built without light. `bounds` is the chunk-local (min, max)
+    corner of the vertices, `lod_step` the number of blocks per cell (1 for full detail).
+    """
+    def __init__(self, vertices, uvs, triangles, bounds=None, lod_step=1, colors=None):
+        self.vertices = vertices
+        self.uvs = uvs
+        self.triangles = triangles
+        self.colors = colors
+        self.bounds = bounds
+        self.lod_step = lod_step
+
+    @property
+    def empty(self):
+        return len(self.triangles) == 0
+
+    @property
+    def quad_count(self):
+        return len(self.triangles) // 6
+
+
+def _neighbour_slice(axis, direction):
+    """
+    Slice of the padded array holding each inner cell's neighbour along axis/direction.
+    """
+    index = [slice(1, -1)] * 3
+    index[axis] = slice(2, None) if direction > 0 else slice(0, -2)
+    return tuple(index)
+
+
+def _greedy_rects(mask):
+    """
+    Merges equal, non-zero cells of a 2D face mask into maximal rectangles.
+    Yields (u, v, width, height, value).
+    """
+    mask = mask.copy()
+    nu, nv = mask.shape
+    # Visit cells row by row (v-major) so rectangles grow along u first
+    for v, u in zip(*np.nonzero(mask.T)):
+        value = mask[u, v]
+        if not value:
+            continue  # already swallowed by an earlier rectangle
+        w = 1
+        while u + w < nu and mask[u + w, v] == value:
+            w += 1
+        h = 1
+        while v + h < nv and (mask[u:u + w, v + h] == value).all():
+            h += 1
+        mask[u:u + w, v:v + h] = 0
+        yield u, v, w, h, value
+
+
+def _emit_quads(axis, direction, layer, rects, vertices, uvs, scale=(1, 1, 1), tiles=None, colors=None):
+    """
+    Appends the four corners of each rectangle on one face layer to the output lists.
+    `scale` stretches cell coordinates per axis (for coarse, low-detail volumes). With an
+    atlas `tiles` lookup (block id -> tile), UVs are offset into the block's tile slot.
+    With a `colors` list, rectangle values carry the face's packed light above bit 16.
+    """
+    a, b = [i for i in range(3) if i != axis]
+    plane = (layer + (1 if direction > 0 else 0)) * scale[axis]
+    reverse = _CROSS_SIGN[axis] == direction  # front faces wind counter-clockwise seen from outside
+
+    for u, v, w, h, value in rects:
+        block = value & 0xFFFF
+        if colors is not None:
+            light = value >> 16
+            colors.extend([((light >> 4) / 15, (light & 15) / 15, 0.0, 1.0)] * 4)
+        u0, u1 = u * scale[a], (u + w) * scale[a]
+        v0, v1 = v * scale[b], (v + h) * scale[b]
+        tu, tv = (tiles[block] * TILE_STRIDE) if tiles is not None else (0, 0)
+        corners = ((u0, v0), (u1, v0), (u1, v1), (u0, v1))
+        if reverse:
+            corners = corners[::-1]
+        for cu, cv in corners:
+            p = [0, 0, 0]
+            p[axis] = plane
+            p[a] = cu
+            p[b] = cv
+            vertices.append(p)
+            # Keep the texture upright on the x faces (u runs along y there)
+            uvs.append((tu + cv, tv + cu) if axis == 0 else (tu + cu, tv + cv))
+
+
+def build_chunk_mesh(padded, tiles=None, scale=(1, 1, 1), lod_step=1, light=None):
+    """
+    Builds a single culled, greedy-merged mesh for one chunk.
+
+    `padded` is a (sx+2, sy+2, sz+2) array of block ids: the chunk itself plus a one cell
+    ring of neighbour data, so faces touching a solid neighbour (even across a chunk
+    border) are dropped. Vertex positions are chunk-local with each block centred on
+    its integer coordinate, matching ursina's unit cube. `tiles` is an atlas tile lookup
+    (see TextureAtlas.tile_lut); without it UVs are plain repeating block units.
+
+    `light` is the matching padded array of packed light values (see lighting.py). Each
+    face takes the light of the air cell it looks into, and only faces with the same
+    block and light are merged, so lighting stays exact per block.
+    """
+    inner = padded[1:-1, 1:-1, 1:-1]
+    solid = inner != AIR
+
+    vertices = []
+    uvs = []
+    colors = [] if light is not None else None
+    for axis, direction in FACES:
+        index = _neighbour_slice(axis, direction)
+        visible = np.where(solid & (padded[index] == AIR), inner, 0)
+        if light is not None:
+            # Merge key: block id in the low 16 bits, the face's light above
+            visible = np.where(visible, visible.astype(np.uint32) | (light[index].astype(np.uint32) << 16), 0)
+        layers = np.moveaxis(visible, axis, 0)
+        for layer in np.nonzero(layers.reshape(len(layers), -1).any(axis=1))[0]:
+            rects = list(_greedy_rects(layers[layer]))
+            _emit_quads(axis, direction, layer, rects, vertices, uvs, scale, tiles, colors)
+
+    return _finish(vertices, uvs, lod_step, colors)
+
+
+def _finish(vertices, uvs, lod_step=1, colors=None):
+    """
+    Packs emitted quad corners into a ChunkMesh.
+    """
+    if not vertices:
+        return ChunkMesh(np.zeros(0, np.float32), np.zeros(0, np.float32), np.zeros(0, np.uint32),
+                         lod_step=lod_step, colors=None if colors is None else np.zeros(0, np.float32))
+
+    if colors is not None:
+        colors = np.asarray(colors, dtype=np.float32).ravel()
+    vertices = np.asarray(vertices, dtype=np.float32) - 0.5
+    uvs = np.asarray(uvs, dtype=np.float32)
+    quads = np.arange(0, len(vertices), 4, dtype=np.uint32)[:, None]
+    triangles = (quads + np.array([0, 1, 2, 2, 3, 0], dtype=np.uint32)).ravel()
+    bounds = (tuple(vertices.min(axis=0).tolist()), tuple(vertices.max(axis=0).tolist()))
+    return ChunkMesh(vertices.ravel(), uvs.ravel(), triangles, bounds, lod_step, colors)
+
+
+def column_heights(padded):
+    """
+    Per column (x, z) of the chunk inside `padded`: one above the highest solid block, 0 if
+    empty, plus the id of that top block.
+    """
+    inner = padded[1:-1, 1:-1, 1:-1]
+    solid = inner != AIR
+    height = solid.shape[1]
+    top = height - np.argmax(solid[:, ::-1, :], axis=1)
+    top[~solid.any(axis=1)] = 0
+    ids = np.take_along_axis(inner, np.maximum(top - 1, 0)[:, None, :], axis=1)[:, 0, :]
+    return top, ids
+
+
+def build_lod_mesh(padded, step=2, tiles=None):
+    """
+    Low-detail stand-in for a distant chunk: the surface heightmap downsampled to cells of
+    step x step columns, filled solid up to the cell's highest column and greedy-meshed
+    like a normal chunk. Edge cells get walls down to the chunk's lowest surface so no
+    gaps show against the neighbouring chunk, and no underside is drawn. Distant chunks
+    are lit as open sky, so they still darken at night like the ones around them.
+    """
+    heights, ids = column_heights(padded)
+    size = heights.shape[0]
+    cells = size // step
+    heights = heights[:cells * step, :cells * step].reshape(cells, step, cells, step).max(axis=(1, 3))
+    ids = ids[:cells * step:step, :cells * step:step]
+    skirt = max(int(heights.min()) - 1, 0)
+
+    height = padded.shape[1] - 2
+    coarse = np.zeros((cells + 2, height + 2, cells + 2), dtype=padded.dtype)
+    fill = np.arange(height)[None, :, None] < heights[:, None, :]
+    coarse[1:-1, 1:-1, 1:-1] = np.where(fill, ids[:, None, :], AIR)
+    coarse[:, 0, :] = ids.max()
+    coarse[[0, -1], 1:skirt + 1, :] = ids.max()
+    coarse[:, 1:skirt + 1, [0, -1]] = ids.max()
+    sky = np.full(coarse.shape, 15 << 4, dtype=np.uint8)
+    return build_chunk_mesh(coarse, tiles, scale=(step, 1, step), lod_step=step, light=sky)
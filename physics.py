@@ -0,0 +1,86 @@
+from math import ceil, floor
+
+from world import CHUNK_SIZE
+
+# Keeps a box that is exactly touching a face from counting as overlapping the cell behind it
+EPSILON = 1e-6
+
+
+def _first_cell(lo):
+    return floor(lo + 0.5 + EPSILON)
+
+
+def _last_cell(hi):
+    return ceil(hi - 0.5 - EPSILON)
+
+
+def blocks_movement(world, x, y, z):
+    """
+    True if the cell at (x, y, z) stops a moving box. Columns whose chunk isn't loaded yet
+    count as solid, so the player can't walk or fall into terrain that hasn't streamed in,
+    and so does everything below the world (y < 0), so a hole dug through the bottom
+    layer is a floor rather than a fall that never ends.
+    """
+    if y < 0 or (x // CHUNK_SIZE, z // CHUNK_SIZE) not in world:
+        return True
+    return world.is_solid(x, y, z)
+
+
+def _layer_blocked(world, axis, k, lo, hi):
+    """
+    Whether any cell in layer k along `axis` within the box's cross-section is solid.
+    """
+    a, b = [i for i in range(3) if i != axis]
+    for i in range(_first_cell(lo[a]), _last_cell(hi[a]) + 1):
+        for j in range(_first_cell(lo[b]), _last_cell(hi[b]) + 1):
+            cell = [0, 0, 0]
+            cell[axis], cell[a], cell[b] = k, i, j
+            if blocks_movement(world, *cell):
+                return True
+    return False
+
+
+def sweep_axis(world, lo, hi, axis, amount):
+    """
+    How far the box [lo, hi] can move along one axis, up to `amount`, before it touches a
+    solid block. Every cell layer the leading face passes through is checked, so fast
+    movement can't tunnel through thin walls.
+    """
+    if amount > 0:
+        for k in range(_last_cell(hi[axis]) + 1, _last_cell(hi[axis] + amount) + 1):
+            if _layer_blocked(world, axis, k, lo, hi):
+                return max(0.0, (k - 0.5) - hi[axis])
+    elif amount < 0:
+        for k in range(_first_cell(lo[axis]) - 1, _first_cell(lo[axis] + amount) - 1, -1):
+            if _layer_blocked(world, axis, k, lo, hi):
+                return min(0.0, (k + 0.5) - lo[axis])
+    return amount
+
+
+def move_box(world, position, half_width, height, delta):
+    """
+    Moves an upright box (bottom centre at `position`) by `delta` against the block grid,
+    resolving y first, then x, then z. Returns the new position and, per axis, whether
+    the movement was cut short by a block.
+
+    Only the cells the box touches along its path are looked at, so the cost does not
+    depend on how much of the world is loaded.
+    """
+    lo = [position[0] - half_width, position[1], position[2] - half_width]
+    hi = [position[0] + half_width, position[1] + height, position[2] + half_width]
+    blocked = [False, False, False]
+    for axis in (1, 0, 2):
+        moved = sweep_axis(world, lo, hi, axis, delta[axis])
+        blocked[axis] = moved != delta[axis]
+        lo[axis] += moved
+        hi[axis] += moved
+    return (lo[0] + half_width, lo[1], lo[2] + half_width), blocked
+
+
+def box_overlaps_cell(position, half_width, height, cell):
+    """
+    Whether an upright box at `position` intersects the block cell at integer `cell`.
+    """
+    lo = (position[0] - half_width, position[1], position[2] - half_width)
+    hi = (position[0] + half_width, position[1] + height, position[2] + half_width)
+    return all(_first_cell(lo[i]) <= cell[i] <= _last_cell(hi[i]) for i in range(3))
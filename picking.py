@@ -0,0 +1,71 @@
+from math import floor, inf, sqrt
+
+
+class VoxelHit:
+    """
+    Result of a voxel raycast: the solid block that was hit, the normal of the face the
+    ray entered through, and the distance travelled along the ray.
+    """
+    def __init__(self, position, normal, distance):
+        self.position = position
+        self.normal = normal
+        self.distance = distance
+
+    @property
+    def adjacent(self):
+        """
+        The empty cell in front of the hit face, where a placed block goes.
+        """
+        return tuple(p + n for p, n in zip(self.position, self.normal))
+
+    def __repr__(self):
+        return f"VoxelHit(position={self.position}, normal={self.normal}, distance={self.distance:.3f})"
+
+
+def raycast_voxels(world, origin, direction, distance=5):
+    """
+    Walks the ray cell by cell through the block grid (Amanatides-Woo DDA) and returns
+    a VoxelHit for the first solid block within `distance`, or None.
+
+    Blocks are centred on integer coordinates, so the cell of block p spans p +/- 0.5.
+    Cost depends only on the ray length, never on how many blocks are loaded.
+    """
+    dx, dy, dz = direction[0], direction[1], direction[2]
+    length = sqrt(dx * dx + dy * dy + dz * dz)
+    if length == 0:
+        return None
+    d = (dx / length, dy / length, dz / length)
+    # Shift by half a block so cell boundaries fall on integers
+    o = (origin[0] + 0.5, origin[1] + 0.5, origin[2] + 0.5)
+
+    cell = [floor(o[0]), floor(o[1]), floor(o[2])]
+    step = [0, 0, 0]
+    t_max = [inf, inf, inf]
+    t_delta = [inf, inf, inf]
+    for axis in range(3):
+        if d[axis] > 0:
+            step[axis] = 1
+            t_max[axis] = (cell[axis] + 1 - o[axis]) / d[axis]
+            t_delta[axis] = 1 / d[axis]
+        elif d[axis] < 0:
+            step[axis] = -1
+            t_max[axis] = (cell[axis] - o[axis]) / d[axis]
+            t_delta[axis] = -1 / d[axis]
+
+    normal = (0, 0, 0)
+    t = 0.0
+    while t <= distance:
+        if world.is_solid(cell[0], cell[1], cell[2]):
+            return VoxelHit(tuple(cell), normal, t)
+        # Advance across whichever cell boundary the ray reaches first
+        if t_max[0] < t_max[1]:
+            axis = 0 if t_max[0] < t_max[2] else 2
+        else:
+            axis = 1 if t_max[1] < t_max[2] else 2
+        t = t_max[axis]
+        cell[axis] += step[axis]
+        t_max[axis] += t_delta[axis]
+        normal = [0, 0, 0]
+        normal[axis] = -step[axis]
+        normal = tuple(normal)
+    return None
@@ -0,0 +1,138 @@
+from chunk_cache import ChunkCache
+from lighting import join_chunk
+from mesher import build_chunk_mesh, build_lod_mesh
+from profiler import Profiler
+from streaming import ChunkStreamer
+
+
+class ChunkPipeline:
+    """
+    Everything between a chunk's blocks and its mesh, shared by the client and
+    HeadlessSession so benchmarks measure the code the game runs.
+
+    Chunks stream in through a ChunkStreamer and are meshed at full detail near the
+    player and from a downsampled heightmap past `lod_distance` (reusing meshes from
+    `chunk_cache` when one is given). Light is joined across the borders of each chunk
+    that arrives, and chunks edited or relit since their mesh was built are remeshed once
+    per remesh_dirty() call. Finished meshes go to `on_mesh(cx, cz, mesh)`, unloads to
+    `on_unload(cx, cz)`; turning meshes into something drawable is up to the owner.
+    """
+    def __init__(self, world, load, tiles=None, load_radius=6, unload_margin=1, max_chunks=256,
+                 lod_distance=3, lod_step=2, workers=2, frame_budget=0.004, bulk_remesh=16,
+                 chunk_cache=None, profiler=None, persist=None, on_mesh=None, on_unload=None,
+                 on_disconnect=None):
+        self.world = world
+        self.tiles = tiles  # block id -> atlas tile lookup table for the mesher
+        self.lod_distance = lod_distance
+        self.lod_step = lod_step
+        self.bulk_remesh = bulk_remesh  # more dirty chunks than this are rebuilt on the workers
+        self.chunk_cache = chunk_cache
+        self.profiler = profiler or Profiler()
+        self.on_mesh = on_mesh  # (cx, cz, ChunkMesh)
+        self.on_unload = on_unload  # (cx, cz)
+        self.lods = {}  # (cx, cz) -> lod_step of the current mesh
+        self.dirty = set()  # (cx, cz) of resident chunks changed since their mesh was built
+        self._lod_center = None
+        self.streamer = ChunkStreamer(
+            world, load, self._stream_mesh,
+            load_radius=load_radius,
+            unload_margin=unload_margin,
+            max_chunks=max_chunks,
+            workers=workers,
+            frame_budget=frame_budget,
+            persist=persist,
+            on_load=self._loaded,
+            on_unload=self._unloaded,
+            on_disconnect=on_disconnect
+        )
+
+    def lod_step_for(self, cx, cz):
+        center = self.streamer.center
+        if center and max(abs(cx - center[0]), abs(cz - center[1])) > self.lod_distance:
+            return self.lod_step
+        return 1
+
+    def mesh_chunk(self, padded, cx, cz, light=None, step=None):
+        """
+        The chunk's mesh at `step` blocks per cell, by default the detail its distance calls for.
+        """
+        if step is None:
+            step = self.lod_step_for(cx, cz)
+        with self.profiler.scope('mesh_chunk'):
+            if step > 1:
+                return build_lod_mesh(padded, step, self.tiles)
+            return build_chunk_mesh(padded, self.tiles, light=light)
+
+    def _stream_mesh(self, padded, cx, cz, light=None):
+        # Worker side. The detail is picked once, as the player may move while this runs and
+        # the cache key must describe the mesh that is built
+        step = self.lod_step_for(cx, cz)
+        if self.chunk_cache is None:
+            return self.mesh_chunk(padded, cx, cz, light, step)
+        # Reuse a cached mesh when the chunk and its surroundings are unchanged
+        key = ChunkCache.mesh_key(padded, light if step == 1 else None, step, self.tiles)
+        mesh = self.chunk_cache.load_mesh(key)
+        if mesh is None:
+            mesh = self.mesh_chunk(padded, cx, cz, light, step)
+            self.chunk_cache.save_mesh(key, mesh)
+        return mesh
+
+    def _attach(self, cx, cz, mesh):
+        self.lods[(cx, cz)] = mesh.lod_step
+        if self.on_mesh:
+            self.on_mesh(cx, cz, mesh)
+
+    def _loaded(self, cx, cz, mesh):
+        self._attach(cx, cz, mesh)
+        # The chunk was lit on its own; let light flow across its borders
+        with self.profiler.scope('relight'):
+            self.mark_dirty(join_chunk(self.world, cx, cz))
+
+    def _unloaded(self, cx, cz):
+        self.lods.pop((cx, cz), None)
+        self.dirty.discard((cx, cz))
+        if self.on_unload:
+            self.on_unload(cx, cz)
+
+    def rebuild(self, cx, cz):
+        """
+        Remeshes a resident chunk on the calling thread.
+        """
+        self._attach(cx, cz, self.mesh_chunk(self.world.padded_chunk(cx, cz), cx, cz,
+                                              self.world.padded_light(cx, cz)))
+
+    def mark_dirty(self, coords):
+        """
+        Queues chunks for remeshing, e.g. the ones an edit or relight returned.
+        """
+        for coord in coords:
+            self.dirty.add(coord)
+            self.streamer.invalidate(*coord)
+
+    def remesh_dirty(self, background=None):
+        """
+        Rebuilds the dirty chunks, so a burst of edits to one chunk costs a single rebuild.
+        Big batches (over `bulk_remesh`, or any with `background`) go to the workers and
+        the old meshes stay up until the new ones arrive.
+        """
+        if background is None:
+            background = len(self.dirty) > self.bulk_remesh
+        while self.dirty:
+            coord = self.dirty.pop()
+            if coord not in self.world:
+                continue
+            if background:
+                self.streamer.remesh(*coord)
+            else:
+                self.rebuild(*coord)
+
+    def update_lods(self):
+        """
+        Swaps meshes between full and low detail once the player has moved to a new chunk.
+        """
+        if self.streamer.center == self._lod_center:
+            return
+        self._lod_center = self.streamer.center
+        for coord, step in list(self.lods.items()):
+            if self.lod_step_for(*coord) != step:
+                self.streamer.remesh(*coord)
@@ -0,0 +1,163 @@
+import json
+import os
+import threading
+from collections import deque
+from time import perf_counter
+
+import numpy as np
+
+
+class _NullScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+# Handed out by every scope() call while profiling is off, so a disabled scope costs one
+# method call and an empty with block
+_NULL_SCOPE = _NullScope()
+
+
+class _Scope:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._record(self.name, self.start, perf_counter())
+        return False
+
+
+class Profiler:
+    """
+    Named timing scopes with rolling per-frame statistics and an optional trace capture.
+
+        with profiler.scope('update_chunks'):
+            ...
+
+    Call begin_frame() once per frame. Each scope's time is summed per frame and the last
+    `window` frames are kept for percentiles. Scopes may be entered from worker threads.
+    Their time counts towards the frame in which they finished.
+
+    Time in a frame outside the top level `frame_scopes` (the engine drawing the scene,
+    mostly) is reported under `remainder`.
+    """
+    def __init__(self, enabled=False, window=600, frame_scopes=('update',), remainder='render', max_events=1_000_000):
+        self.enabled = enabled
+        self.window = window
+        self.frame_scopes = frame_scopes
+        self.remainder = remainder
+        self.max_events = max_events
+        self.frame_times = deque(maxlen=window)
+        self.scope_times = {}  # name -> deque of per-frame totals in seconds
+        self.tracing = False
+        self._totals = {}
+        self._frame_start = None
+        self._events = []
+        self._thread_names = {}
+        self._origin = perf_counter()
+        self._lock = threading.Lock()
+
+    def scope(self, name):
+        if not self.enabled:
+            return _NULL_SCOPE
+        return _Scope(self, name)
+
+    def _record(self, name, start, end):
+        with self._lock:
+            self._totals[name] = self._totals.get(name, 0.0) + (end - start)
+            if self.tracing and len(self._events) < self.max_events:
+                thread = threading.current_thread()
+                self._thread_names.setdefault(thread.ident, thread.name)
+                self._events.append((name, start, end - start, thread.ident))
+
+    def begin_frame(self):
+        """
+        Closes the previous frame's statistics and starts timing a new one.
+        """
+        if not self.enabled:
+            self._frame_start = None
+            return
+        now = perf_counter()
+        with self._lock:
+            totals, self._totals = self._totals, {}
+        if self._frame_start is not None:
+            frame = now - self._frame_start
+            self.frame_times.append(frame)
+            totals[self.remainder] = max(0.0, frame - sum(totals.get(name, 0.0) for name in self.frame_scopes))
+            for name in self.scope_times.keys() | totals.keys():
+                times = self.scope_times.setdefault(name, deque(maxlen=self.window))
+                times.append(totals.get(name, 0.0))
+        self._frame_start = now
+
+    def reset(self):
+        self.frame_times.clear()
+        self.scope_times.clear()
+        self._frame_start = None
+        with self._lock:
+            self._totals = {}
+
+    def percentiles(self, name=None, q=(50, 95, 99)):
+        """
+        Percentiles in milliseconds of the frame time, or of one scope's per-frame time.
+        """
+        times = self.frame_times if name is None else self.scope_times.get(name, ())
+        if not times:
+            return tuple(0.0 for _ in q)
+        return tuple(float(v) * 1000 for v in np.percentile(np.fromiter(times, dtype=np.float64), q))
+
+    def summary(self):
+        """
+        Frame time percentiles and the per-scope breakdown, slowest p95 first, as text lines.
+        """
+        p50, p95, p99 = self.percentiles()
+        fps = 1000 / p50 if p50 else 0.0
+        lines = [f'frame  p50 {p50:5.1f}  p95 {p95:5.1f}  p99 {p99:5.1f} ms  ({fps:.0f} fps)']
+        rows = [(name, self.percentiles(name)) for name in self.scope_times]
+        for name, (s50, s95, s99) in sorted(rows, key=lambda row: -row[1][1]):
+            lines.append(f'{name:<16} p50 {s50:5.2f}  p95 {s95:5.2f}  p99 {s99:5.2f} ms')
+        return lines
+
+    def start_trace(self):
+        with self._lock:
+            self._events = []
+            self._thread_names = {}
+            self.tracing = True
+
+    def stop_trace(self, path):
+        """
+        Stops capturing and writes the events to `path` in Chrome's trace event format,
+        for chrome://tracing or Perfetto. Returns the number of events written.
+        """
+        with self._lock:
+            self.tracing = False
+            events, self._events = self._events, []
+            thread_names, self._thread_names = self._thread_names, {}
+
+        pid = os.getpid()
+        trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                 for tid, name in thread_names.items()]
+        for name, start, duration, tid in events:
+            trace.append({
+                'name': name,
+                'ph': 'X',
+                'ts': (start - self._origin) * 1e6,
+                'dur': duration * 1e6,
+                'pid': pid,
+                'tid': tid,
+            })
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+        return len(events)
+
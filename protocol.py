@@ -0,0 +1,182 @@
+import struct
+
+from world import CHUNK_SIZE, CHUNK_HEIGHT
+
+# === Framing ===
+# Every message is a uint32 length, then a one byte message type and its body; the
+# length counts the type byte and the body. All integers are little endian.
+PROTOCOL_VERSION = 1
+DEFAULT_PORT = 25565
+MAX_FRAME = 1 << 20
+
+_LENGTH = struct.Struct('<I')
+_TYPE = struct.Struct('<B')
+
+# === Message types ===
+# client -> server
+HELLO = 1      # protocol version
+POSITION = 2   # chunk the player is in and the radius it wants streamed
+REQUEST = 3    # one chunk needed right away
+RELEASE = 4    # chunk dropped by the client; stop sending its edits
+EDIT = 5       # set one block
+# server -> client
+WELCOME = 64   # protocol version, player id, chunk dimensions
+CHUNK = 65     # chunk coord + region-encoded (zlib) palette and blocks
+DELTAS = 66    # one tick's block edits, grouped per chunk
+
+_HELLO = struct.Struct('<H')
+_POSITION = struct.Struct('<iiB')
+_COORD = struct.Struct('<ii')
+_EDIT = struct.Struct('<iiiH')
+_WELCOME = struct.Struct('<HIHH')
+_DELTA_COUNT = struct.Struct('<H')
+_DELTA_CHUNK = struct.Struct('<iiH')
+_DELTA_ENTRY = struct.Struct('<HH')  # packed chunk-local cell, block id
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def _unpack(layout, body):
+    # Fixed-size bodies must match exactly; anything else is a broken or hostile peer
+    if len(body) != layout.size:
+        raise ProtocolError(f"Expected a {layout.size} byte body, got {len(body)}")
+    return layout.unpack(body)
+
+
+def frame(kind, body=b''):
+    return _LENGTH.pack(len(body) + 1) + _TYPE.pack(kind) + body
+
+
+async def read_frame(reader):
+    """
+    Reads one message; returns (type, body). Raises asyncio.IncompleteReadError at EOF.
+    """
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    if not 1 <= length <= MAX_FRAME:
+        raise ProtocolError(f"Bad frame length {length}")
+    data = await reader.readexactly(length)
+    return data[0], data[1:]
+
+
+def hello():
+    return frame(HELLO, _HELLO.pack(PROTOCOL_VERSION))
+
+
+def parse_hello(body):
+    return _unpack(_HELLO, body)[0]
+
+
+def welcome(player_id):
+    return frame(WELCOME, _WELCOME.pack(PROTOCOL_VERSION, player_id, CHUNK_SIZE, CHUNK_HEIGHT))
+
+
+def parse_welcome(body):
+    """
+    (protocol version, player id, chunk size, chunk height)
+    """
+    return _unpack(_WELCOME, body)
+
+
+def position(cx, cz, radius):
+    return frame(POSITION, _POSITION.pack(cx, cz, radius))
+
+
+def parse_position(body):
+    return _unpack(_POSITION, body)
+
+
+def coord_message(kind, cx, cz):
+    return frame(kind, _COORD.pack(cx, cz))
+
+
+def parse_coord(body):
+    return _unpack(_COORD, body)
+
+
+def edit(x, y, z, block):
+    return frame(EDIT, _EDIT.pack(x, y, z, block))
+
+
+def parse_edit(body):
+    """
+    (x, y, z, block); raises ProtocolError for a y outside the world.
+    """
+    x, y, z, block = _unpack(_EDIT, body)
+    if not 0 <= y < CHUNK_HEIGHT:
+        raise ProtocolError(f"Edit at y={y} is outside the world")
+    return x, y, z, block
+
+
+def chunk_message(cx, cz, payload):
+    return frame(CHUNK, _COORD.pack(cx, cz) + payload)
+
+
+def parse_chunk(body):
+    """
+    (cx, cz, region-encoded payload)
+    """
+    cx, cz = _unpack(_COORD, body[:_COORD.size])
+    return cx, cz, body[_COORD.size:]
+
+
+def _pack_cell(x, y, z):
+    return ((x % CHUNK_SIZE) * CHUNK_HEIGHT + y) * CHUNK_SIZE + z % CHUNK_SIZE
+
+
+def deltas(edits):
+    """
+    DELTAS messages for `edits`, a dict (cx, cz) -> {(x, y, z): block} in world
+    coordinates, as a list of frames. Each edit costs 4 bytes plus 10 per chunk touched;
+    usually that is one frame, but larger batches are split to stay within MAX_FRAME.
+    """
+    limit = MAX_FRAME - 1 - _DELTA_COUNT.size  # body space after the type byte and count
+    frames = []
+    groups = []  # (cx, cz, packed entries) in the frame being filled
+    size = 0
+
+    def finish_frame():
+        nonlocal groups, size
+        parts = [_DELTA_COUNT.pack(len(groups))]
+        for cx, cz, entries in groups:
+            parts.append(_DELTA_CHUNK.pack(cx, cz, len(entries)))
+            parts.extend(entries)
+        frames.append(frame(DELTAS, b''.join(parts)))
+        groups, size = [], 0
+
+    for (cx, cz), cells in edits.items():
+        entries = [_DELTA_ENTRY.pack(_pack_cell(*cell), block) for cell, block in cells.items()]
+        while entries:
+            room = (limit - size - _DELTA_CHUNK.size) // _DELTA_ENTRY.size
+            if room <= 0 or len(groups) == 0xFFFF:
+                finish_frame()
+                continue
+            part, entries = entries[:room], entries[room:]
+            groups.append((cx, cz, part))
+            size += _DELTA_CHUNK.size + len(part) * _DELTA_ENTRY.size
+    if groups:
+        finish_frame()
+    return frames
+
+
+def parse_deltas(body):
+    """
+    Returns [(x, y, z, block)] in world coordinates.
+    """
+    edits = []
+    try:
+        (count,) = _DELTA_COUNT.unpack_from(body)
+        offset = _DELTA_COUNT.size
+        for _ in range(count):
+            cx, cz, cells = _DELTA_CHUNK.unpack_from(body, offset)
+            offset += _DELTA_CHUNK.size
+            for _ in range(cells):
+                cell, block = _DELTA_ENTRY.unpack_from(body, offset)
+                offset += _DELTA_ENTRY.size
+                xy, z = divmod(cell, CHUNK_SIZE)
+                x, y = divmod(xy, CHUNK_HEIGHT)
+                edits.append((cx * CHUNK_SIZE + x, y, cz * CHUNK_SIZE + z, block))
+    except struct.error as e:
+        raise ProtocolError(f"Truncated DELTAS message: {e}") from None
+    return edits
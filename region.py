@@ -0,0 +1,226 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from world import Chunk, CHUNK_SIZE, CHUNK_HEIGHT
+
+# === Format ===
+# A region file holds REGION_SIZE x REGION_SIZE chunks. It starts with a header and an
+# offset table of (first sector, byte length) per chunk, followed by zlib-compressed chunk
+# payloads aligned to SECTOR bytes. Chunks that were never edited have no entry at all:
+# they are regenerated from the seed instead.
+REGION_SIZE = 32
+SECTOR = 4096
+MAGIC = b'TCRG'
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct('<4sHH')  # magic, format version, region size
+_ENTRY = struct.Struct('<II')  # first sector, payload length in bytes
+_TABLE_OFFSET = _HEADER.size
+_TABLE_BYTES = REGION_SIZE * REGION_SIZE * _ENTRY.size
+_DATA_START = -(-(_TABLE_OFFSET + _TABLE_BYTES) // SECTOR)  # in sectors
+
+_PALETTE_LENGTH = struct.Struct('<H')
+
+
+def encode_chunk(palette, data):
+    """
+    Compressed payload for a chunk's palette (list of block ids) and index array.
+    """
+    raw = (_PALETTE_LENGTH.pack(len(palette))
+           + np.asarray(palette, dtype='<u2').tobytes()
+           + np.ascontiguousarray(data, dtype=np.uint8).tobytes())
+    return zlib.compress(raw, 6)
+
+
+def decode_chunk(cx, cz, payload):
+    raw = zlib.decompress(payload)
+    (count,) = _PALETTE_LENGTH.unpack_from(raw)
+    palette = np.frombuffer(raw, dtype='<u2', count=count, offset=_PALETTE_LENGTH.size).tolist()
+    data = np.frombuffer(raw, dtype=np.uint8, offset=_PALETTE_LENGTH.size + 2 * count)
+    return Chunk.from_palette(cx, cz, palette, data.reshape(CHUNK_SIZE, CHUNK_HEIGHT, CHUNK_SIZE))
+
+
+class RegionFile:
+    """
+    One region file on disk. Reads go through a read-only memory map of the file; writes
+    reuse a chunk's sectors when the new payload fits and append otherwise.
+    Not thread-safe on its own; RegionStore serialises access.
+    """
+    def __init__(self, path):
+        self.path = path
+        exists = os.path.exists(path)
+        self._file = open(path, 'r+b' if exists else 'w+b')
+        if not exists:
+            self._file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, REGION_SIZE))
+            self._file.write(bytes(_DATA_START * SECTOR - _HEADER.size))
+            self._file.flush()
+        self._file.seek(0)
+        magic, version, size = _HEADER.unpack(self._file.read(_HEADER.size))
+        if magic != MAGIC or version != FORMAT_VERSION or size != REGION_SIZE:
+            raise ValueError(f"{path} is not a TurboCraft region file (v{FORMAT_VERSION})")
+        self._table = np.frombuffer(self._file.read(_TABLE_BYTES), dtype='<u4').reshape(-1, 2).copy()
+        self._map = None
+
+    def _mapped(self):
+        if self._map is None:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def _unmap(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    @staticmethod
+    def _slot(lx, lz):
+        return lz * REGION_SIZE + lx
+
+    def read(self, lx, lz):
+        """
+        Compressed payload for the chunk at local (lx, lz), or None if it was never written.
+        """
+        sector, length = self._table[self._slot(lx, lz)]
+        if not length:
+            return None
+        start = int(sector) * SECTOR
+        return self._mapped()[start:start + int(length)]
+
+    def write(self, lx, lz, payload):
+        slot = self._slot(lx, lz)
+        sector, length = (int(v) for v in self._table[slot])
+        needed = -(-len(payload) // SECTOR)
+        if not length or needed > -(-length // SECTOR):
+            self._unmap()  # the file is about to grow
+            self._file.seek(0, os.SEEK_END)
+            sector = max(self._file.tell() // SECTOR, _DATA_START)
+        self._file.seek(sector * SECTOR)
+        self._file.write(payload)
+        self._file.write(bytes(needed * SECTOR - len(payload)))
+        self._table[slot] = (sector, len(payload))
+        self._file.seek(_TABLE_OFFSET + slot * _ENTRY.size)
+        self._file.write(_ENTRY.pack(sector, len(payload)))
+        self._file.flush()
+
+    def close(self):
+        self._unmap()
+        self._file.close()
+
+
+class RegionStore:
+    """
+    A world directory of region files plus a small level.json of world settings.
+
+    Only chunks that differ from the generator are stored. `save_async` snapshots dirty
+    chunks on the calling thread and compresses/writes them on a single background
+    writer, so saving costs the game loop one array copy per edited chunk.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.meta_path = os.path.join(directory, 'level.json')
+        self.meta = {}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                self.meta = json.load(f)
+        self._regions = {}  # (rx, rz) -> RegionFile
+        self._lock = threading.Lock()
+        self._unsaved = {}  # (cx, cz) -> snapshot queued for the writer
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='region-writer')
+        self._writes = []
+
+    def save_meta(self):
+        with open(self.meta_path, 'w') as f:
+            json.dump(self.meta, f, indent=2)
+
+    def _region(self, cx, cz):
+        key = (cx // REGION_SIZE, cz // REGION_SIZE)
+        region = self._regions.get(key)
+        if region is None:
+            path = os.path.join(self.directory, f'r.{key[0]}.{key[1]}.tcr')
+            region = self._regions[key] = RegionFile(path)
+        return region
+
+    def load(self, cx, cz):
+        """
+        The stored chunk at (cx, cz), or None if it has never been edited. Thread-safe.
+        """
+        with self._lock:
+            snapshot = self._unsaved.get((cx, cz))
+            if snapshot is not None:
+                palette, data = snapshot
+                return Chunk.from_palette(cx, cz, list(palette), data.copy())
+            payload = self._region(cx, cz).read(cx % REGION_SIZE, cz % REGION_SIZE)
+            if payload is None:
+                return None
+            chunk = decode_chunk(cx, cz, payload)
+        chunk.modified = True
+        return chunk
+
+    def _write(self, cx, cz, snapshot):
+        payload = encode_chunk(*snapshot)
+        with self._lock:
+            self._region(cx, cz).write(cx % REGION_SIZE, cz % REGION_SIZE, payload)
+            if self._unsaved.get((cx, cz)) is snapshot:
+                del self._unsaved[(cx, cz)]
+
+    def save_async(self, chunks):
+        """
+        Queues every dirty chunk in `chunks` for writing and marks them clean.
+        Returns the number of chunks queued.
+        """
+        count = 0
+        for cx, cz, snapshot in self._snapshots(chunks):
+            self._writes.append(self._writer.submit(self._write, cx, cz, snapshot))
+            count += 1
+        self._writes = [f for f in self._writes if not f.done()]
+        return count
+
+    def save(self, chunks):
+        """
+        Writes every dirty chunk in `chunks` on the calling thread, after any queued writes.
+        Unlike save_async this works at interpreter exit, when the writer takes no more work.
+        Returns the number of chunks written.
+        """
+        self.flush()
+        count = 0
+        for cx, cz, snapshot in self._snapshots(chunks):
+            self._write(cx, cz, snapshot)
+            count += 1
+        return count
+
+    def _snapshots(self, chunks):
+        """
+        Yields (cx, cz, snapshot) for each dirty chunk of `chunks`, marking it clean and
+        keeping the snapshot in _unsaved (so loads see it) until it is written.
+        """
+        for chunk in chunks:
+            if not chunk.dirty:
+                continue
+            snapshot = (list(chunk.palette), chunk.data.copy())
+            chunk.dirty = False
+            with self._lock:
+                self._unsaved[(chunk.cx, chunk.cz)] = snapshot
+            yield chunk.cx, chunk.cz, snapshot
+
+    def flush(self):
+        """
+        Waits until every queued write is on disk.
+        """
+        for future in self._writes:
+            future.result()
+        self._writes = []
+
+    def close(self):
+        self.flush()
+        self._writer.shutdown()
+        with self._lock:
+            for region in self._regions.values():
+                region.close()
+            self._regions.clear()
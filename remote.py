@@ -0,0 +1,179 @@
+import asyncio
+import threading
+from collections import deque
+
+import protocol
+from region import decode_chunk
+from world import CHUNK_SIZE, CHUNK_HEIGHT
+
+
+class RemoteWorld:
+    """
+    Client side of a server connection, for a game loop that isn't asyncio.
+
+    The socket runs on an asyncio loop in a background thread. Chunks the server streams
+    in are buffered until the chunk streamer's workers ask for them with fetch_chunk()
+    (which requests the chunk itself if it hasn't arrived). Block edits from the server
+    queue up for the main thread to apply via poll_edits(), since only it may touch the
+    World; edits to chunks still sitting in the buffer are applied there directly.
+    """
+    # Seconds a fetch waits for the chunk to be streamed before requesting it, and
+    # before asking again in case the server dropped the request
+    PUSH_WAIT = 0.25
+    RETRY = 2.0
+
+    def __init__(self, host, port=protocol.DEFAULT_PORT, timeout=10):
+        self.host = host
+        self.port = port
+        self.player_id = None
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self._chunks = {}  # (cx, cz) -> Chunk received but not fetched yet
+        self._requested = set()  # chunks a worker is waiting for
+        self._edits = deque()  # (x, y, z, block) for the main thread
+        self._center = None
+        self._radius = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._writer = None
+        self._connected = threading.Event()
+        self._error = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='remote-world', daemon=True)
+        self._thread.start()
+        self._task = asyncio.run_coroutine_threadsafe(self._run(), self._loop)
+        if not self._connected.wait(timeout):
+            self.close()
+            raise ConnectionError(f"No answer from {host}:{port}")
+        if self._error:
+            self.close()
+            raise ConnectionError(f"Could not join {host}:{port}: {self._error}")
+
+    async def _run(self):
+        try:
+            reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            self._writer.write(protocol.hello())
+            kind, body = await protocol.read_frame(reader)
+            if kind != protocol.WELCOME:
+                raise protocol.ProtocolError(f"Expected WELCOME, got message type {kind}")
+            version, self.player_id, size, height = protocol.parse_welcome(body)
+            if (version, size, height) != (protocol.PROTOCOL_VERSION, CHUNK_SIZE, CHUNK_HEIGHT):
+                raise protocol.ProtocolError("Server runs an incompatible version")
+        except (OSError, asyncio.IncompleteReadError, protocol.ProtocolError) as e:
+            self._error = e
+            self._connected.set()
+            return
+        self._connected.set()
+
+        try:
+            while True:
+                kind, body = await protocol.read_frame(reader)
+                self.bytes_received += len(body) + 5
+                if kind == protocol.CHUNK:
+                    self._receive_chunk(*protocol.parse_chunk(body))
+                elif kind == protocol.DELTAS:
+                    self._receive_edits(protocol.parse_deltas(body))
+        except (OSError, asyncio.IncompleteReadError, protocol.ProtocolError):
+            pass
+        finally:
+            with self._cond:
+                self._closed = True
+                self._cond.notify_all()
+
+    def _receive_chunk(self, cx, cz, payload):
+        chunk = decode_chunk(cx, cz, payload)
+        with self._cond:
+            if (cx, cz) not in self._requested and self._out_of_range((cx, cz)):
+                self._send(protocol.coord_message(protocol.RELEASE, cx, cz))
+                return  # the player has moved on
+            self._chunks[(cx, cz)] = chunk
+            self._cond.notify_all()
+
+    def _receive_edits(self, edits):
+        with self._cond:
+            for x, y, z, block in edits:
+                chunk = self._chunks.get((x // CHUNK_SIZE, z // CHUNK_SIZE))
+                if chunk is not None:
+                    chunk.set(x % CHUNK_SIZE, y, z % CHUNK_SIZE, block)
+                else:
+                    self._edits.append((x, y, z, block))
+
+    def _out_of_range(self, coord):
+        if self._center is None:
+            return False
+        return max(abs(coord[0] - self._center[0]), abs(coord[1] - self._center[1])) > self._radius + 2
+
+    def _send(self, data):
+        self.bytes_sent += len(data)
+        self._loop.call_soon_threadsafe(self._writer.write, data)
+
+    # === Game loop side ===
+    def fetch_chunk(self, cx, cz):
+        """
+        Blocks until the server has sent chunk (cx, cz) and returns it. Meant for the
+        chunk streamer's worker threads. Raises ConnectionError once disconnected.
+        """
+        coord = (cx, cz)
+        with self._cond:
+            self._requested.add(coord)
+            try:
+                # Usually the chunk is already streaming in; only ask if it's slow to arrive
+                wait = self.PUSH_WAIT
+                while coord not in self._chunks:
+                    if self._closed:
+                        raise ConnectionError("Disconnected from the server")
+                    if not self._cond.wait_for(lambda: coord in self._chunks or self._closed, wait):
+                        self._send(protocol.coord_message(protocol.REQUEST, cx, cz))
+                        wait = self.RETRY
+                return self._chunks.pop(coord)
+            finally:
+                self._requested.discard(coord)
+
+    def move_to(self, cx, cz, radius):
+        """
+        Tells the server which chunk the player is in and how far to stream around it,
+        and drops buffered chunks that are now out of range.
+        """
+        with self._cond:
+            self._center = (cx, cz)
+            self._radius = radius
+            for coord in [c for c in self._chunks if self._out_of_range(c)]:
+                del self._chunks[coord]
+                self._send(protocol.coord_message(protocol.RELEASE, *coord))
+        self._send(protocol.position(cx, cz, radius))
+
+    def release(self, cx, cz):
+        """
+        The client unloaded (cx, cz); the server can stop sending its edits.
+        """
+        self._send(protocol.coord_message(protocol.RELEASE, cx, cz))
+
+    def set_block(self, x, y, z, block):
+        self._send(protocol.edit(x, y, z, block))
+
+    def poll_edits(self):
+        """
+        Edits from the server since the last call, as (x, y, z, block).
+        """
+        edits = []
+        while self._edits:
+            edits.append(self._edits.popleft())
+        return edits
+
+    @property
+    def connected(self):
+        return self._connected.is_set() and not self._closed and self._error is None
+
+    async def _shutdown(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._task.cancel()
+
+    def close(self):
+        if self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
@@ -0,0 +1,103 @@
+import json
+import os
+from collections import deque
+
+import numpy as np
+
+
+class RenderDistanceController:
+    """
+    Raises or lowers the render distance (in chunks) to hold a target frame rate.
+
+    Fed one frame time and the chunk backlog per frame via update(). Once enough frames
+    have been seen since the last change, the distance drops by one when the slow frames
+    (the `percentile`th frame time) are over budget by `lower_above`, and grows by one
+    when they are under budget by `raise_below` with little left to load. Lowering reacts
+    after `lower_after` seconds, raising only after `raise_after`, and the window restarts
+    after every change, so a distance that is just about affordable doesn't flip back and
+    forth.
+
+    `fixed` pins the distance (e.g. for benchmarks); set it back to None to adapt again.
+    Frame times include any vsync wait, so with vsync on the controller can only see that
+    a frame was missed, not how much headroom there is.
+    """
+    def __init__(self, initial, min_distance=2, max_distance=12, target_fps=60, fixed=None,
+                 percentile=90, lower_above=1.15, raise_below=0.7, lower_after=1.0, raise_after=4.0,
+                 max_backlog=8, min_frames=30, window=240):
+        self.min_distance = min_distance
+        self.max_distance = max_distance
+        self.target_fps = target_fps
+        self.fixed = fixed
+        self.percentile = percentile
+        self.lower_above = lower_above
+        self.raise_below = raise_below
+        self.lower_after = lower_after
+        self.raise_after = raise_after
+        self.max_backlog = max_backlog
+        self.min_frames = min_frames
+        self.frame_times = deque(maxlen=window)
+        self.distance = fixed if fixed is not None else min(max(initial, min_distance), max_distance)
+        self._since_change = 0.0
+
+    @classmethod
+    def from_settings(cls, path, initial, **defaults):
+        """
+        A controller configured from a JSON file such as
+
+            {"render_distance": "auto", "min_render_distance": 3,
+             "max_render_distance": 10, "target_fps": 60}
+
+        where "render_distance" is a number of chunks to fix it at, or "auto". Missing
+        keys (or a missing file) keep `defaults`.
+        """
+        settings = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                settings = json.load(f)
+        options = dict(defaults)
+        for key, option in (('min_render_distance', 'min_distance'), ('max_render_distance', 'max_distance'),
+                            ('target_fps', 'target_fps')):
+            if key in settings:
+                options[option] = settings[key]
+        distance = settings.get('render_distance', 'auto')
+        if distance != 'auto':
+            options['fixed'] = int(distance)
+        return cls(initial, **options)
+
+    @property
+    def frame_budget(self):
+        return 1 / self.target_fps
+
+    def recent_frame_time(self):
+        """
+        The `percentile`th frame time since the last change in seconds, or None without frames.
+        """
+        if not self.frame_times:
+            return None
+        return float(np.percentile(np.fromiter(self.frame_times, dtype=np.float64), self.percentile))
+
+    def update(self, frame_time, backlog=0):
+        """
+        Records one frame and returns the render distance to use from now on. `backlog`
+        is the number of chunks still waiting to be loaded.
+        """
+        if self.fixed is not None:
+            self.distance = self.fixed
+            return self.distance
+        self.frame_times.append(frame_time)
+        self._since_change += frame_time
+        if self._since_change < self.lower_after or len(self.frame_times) < self.min_frames:
+            return self.distance
+
+        slow = self.recent_frame_time()
+        if slow > self.frame_budget * self.lower_above and self.distance > self.min_distance:
+            self._change(-1)
+        elif (self._since_change >= self.raise_after and slow < self.frame_budget * self.raise_below
+              and backlog <= self.max_backlog and self.distance < self.max_distance):
+            self._change(1)
+        return self.distance
+
+    def _change(self, step):
+        self.distance += step
+        self.frame_times.clear()
+        self._since_change = 0.0
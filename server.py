@@ -0,0 +1,317 @@
+"""
+Authoritative multiplayer server: owns the world, streams chunks to each client around
+its position and broadcasts block edits once per tick.
+
+    python server.py                          # port 25565, world in saves/server
+    python server.py --port 4000 --seed 7
+"""
+import argparse
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import protocol
+from region import RegionStore, encode_chunk
+from terrain import TerrainGenerator
+from world import World, AIR, BLOCK_TEXTURES
+
+GAME_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class ClientSession:
+    """
+    Server side state of one connection.
+    """
+    def __init__(self, player_id, writer):
+        self.player_id = player_id
+        self.writer = writer
+        self.center = None  # chunk the player is in, once known
+        self.radius = 0
+        self.held = set()  # chunks sent to the client and not released since
+        self.requested = deque()  # chunks asked for explicitly, served first
+        self.edits = deque()  # (x, y, z, block) received since the last tick
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def send(self, data):
+        self.writer.write(data)
+        self.bytes_sent += len(data)
+
+    @property
+    def backlog(self):
+        """
+        Bytes written but not yet taken by the socket.
+        """
+        return self.writer.transport.get_write_buffer_size()
+
+    def interested(self, coord, margin=0):
+        if self.center is None:
+            return False
+        return max(abs(coord[0] - self.center[0]), abs(coord[1] - self.center[1])) <= self.radius + margin
+
+
+class WorldServer:
+    """
+    Runs the authoritative world on one asyncio loop.
+
+    Clients report the chunk they are in and how far they see. Every tick the server
+    applies the edits received since the last tick, sends each client the changes to chunks
+    it holds (one DELTAS message unless that would exceed protocol.MAX_FRAME), then streams
+    up to `chunks_per_tick` missing chunks to each client, explicit requests first, then
+    nearest first. Clients whose socket is backed up get no new chunks until it drains.
+    A client that sends a malformed message is disconnected; the others carry on.
+
+    Chunks are generated (or loaded from the world's region files) on worker threads,
+    and dropped again, saving edited ones, once no client is interested in them.
+    """
+    def __init__(self, seed=1, world_dir=None, tick_rate=20, max_radius=8, chunks_per_tick=8,
+                 workers=2, max_backlog=256 * 1024):
+        self.world = World()
+        self.store = RegionStore(world_dir) if world_dir else None
+        if self.store:
+            seed = self.store.meta.setdefault('seed', seed)
+            self.store.save_meta()
+        self.terrain = TerrainGenerator(seed=seed)
+        self.tick_rate = tick_rate
+        self.max_radius = max_radius
+        self.chunks_per_tick = chunks_per_tick
+        self.max_backlog = max_backlog
+        self.sessions = {}  # player id -> ClientSession
+        self.tick_times = deque(maxlen=1200)  # seconds of work per tick
+        self._next_id = 1
+        self._loading = set()
+        self._payloads = {}  # (cx, cz) -> (chunk version, encoded payload)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='server-worker')
+        self._server = None
+        self._ticker = None
+        self._handlers = set()
+
+    async def start(self, host='127.0.0.1', port=protocol.DEFAULT_PORT):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self._ticker = asyncio.create_task(self._tick_loop())
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._ticker:
+            self._ticker.cancel()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for session in list(self.sessions.values()):
+            session.writer.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self.store:
+            self.store.save(self.world.chunks.values())
+            self.store.close()
+
+    # === Connections ===
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            await self._session(reader, writer)
+        finally:
+            self._handlers.discard(task)
+
+    async def _session(self, reader, writer):
+        try:
+            kind, body = await protocol.read_frame(reader)
+            if kind != protocol.HELLO or protocol.parse_hello(body) != protocol.PROTOCOL_VERSION:
+                raise protocol.ProtocolError("Expected HELLO with a matching protocol version")
+        except (asyncio.IncompleteReadError, protocol.ProtocolError, ConnectionError):
+            writer.close()
+            return
+
+        session = ClientSession(self._next_id, writer)
+        self._next_id += 1
+        self.sessions[session.player_id] = session
+        session.send(protocol.welcome(session.player_id))
+        try:
+            while True:
+                kind, body = await protocol.read_frame(reader)
+                session.bytes_received += len(body) + 5
+                self._receive(session, kind, body)
+        except (asyncio.IncompleteReadError, protocol.ProtocolError, ConnectionError):
+            pass
+        finally:
+            del self.sessions[session.player_id]
+            writer.close()
+
+    def _receive(self, session, kind, body):
+        if kind == protocol.POSITION:
+            cx, cz, radius = protocol.parse_position(body)
+            session.center = (cx, cz)
+            session.radius = min(radius, self.max_radius)
+        elif kind == protocol.REQUEST:
+            coord = protocol.parse_coord(body)
+            # Anything the client could be streaming around its position, whatever radius it asked for
+            near = session.center is not None and \
+                max(abs(coord[0] - session.center[0]), abs(coord[1] - session.center[1])) <= self.max_radius + 2
+            if near and coord not in session.requested:
+                session.requested.append(coord)
+        elif kind == protocol.RELEASE:
+            session.held.discard(protocol.parse_coord(body))
+        elif kind == protocol.EDIT:
+            x, y, z, block = protocol.parse_edit(body)
+            if block != AIR and block not in BLOCK_TEXTURES:
+                raise protocol.ProtocolError(f"Unknown block id {block}")
+            session.edits.append((x, y, z, block))
+        else:
+            raise protocol.ProtocolError(f"Unknown message type {kind}")
+
+    # === Ticking ===
+    async def _tick_loop(self):
+        interval = 1 / self.tick_rate
+        while True:
+            start = time.perf_counter()
+            self.tick()
+            elapsed = time.perf_counter() - start
+            self.tick_times.append(elapsed)
+            await asyncio.sleep(max(0.0, interval - elapsed))
+
+    def tick(self):
+        self._apply_edits()
+        for session in self.sessions.values():
+            self._stream(session)
+        self._unload_unused()
+
+    def _apply_edits(self):
+        """
+        Applies this tick's edits and sends every client the DELTAS messages covering the
+        chunks it holds. Rejected edits are answered with the block that is really there.
+        """
+        changed = {}  # (cx, cz) -> {(x, y, z): block}
+        corrections = {}  # player id -> same layout, for rejected edits
+        for session in self.sessions.values():
+            while session.edits:
+                x, y, z, block = session.edits.popleft()
+                coord = self.world.chunk_coords(x, z)
+                if coord not in session.held:
+                    continue
+                if self.world.set_block(x, y, z, block):
+                    changed.setdefault(coord, {})[(x, y, z)] = block
+                else:
+                    corrections.setdefault(session.player_id, {}).setdefault(coord, {})[(x, y, z)] = \
+                        self.world.get_block(x, y, z)
+
+        for session in self.sessions.values():
+            edits = {coord: cells for coord, cells in changed.items() if coord in session.held}
+            for coord, cells in corrections.get(session.player_id, {}).items():
+                edits.setdefault(coord, {}).update(cells)
+            if edits:
+                for message in protocol.deltas(edits):
+                    session.send(message)
+
+    def _payload(self, coord):
+        chunk = self.world.get_chunk(*coord)
+        cached = self._payloads.get(coord)
+        if cached is None or cached[0] != chunk.version:
+            cached = self._payloads[coord] = (chunk.version, encode_chunk(chunk.palette, chunk.data))
+        return cached[1]
+
+    def _wanted(self, session):
+        """
+        Chunks the client should get next as (coord, explicitly requested): its requests,
+        then its interest area nearest first.
+        """
+        for coord in session.requested:
+            yield coord, True
+        if session.center is None:
+            return
+        cx, cz = session.center
+        r = session.radius
+        ring = sorted(((x - cx) ** 2 + (z - cz) ** 2, (x, z))
+                      for x in range(cx - r, cx + r + 1) for z in range(cz - r, cz + r + 1))
+        for _, coord in ring:
+            yield coord, False
+
+    def _stream(self, session):
+        sent = 0
+        for coord, requested in list(self._wanted(session)):
+            if sent >= self.chunks_per_tick or session.backlog > self.max_backlog:
+                break
+            # A request for a chunk the client already holds means it lost it: send again
+            if coord in session.held and not requested:
+                continue
+            if coord not in self.world:
+                self._load(coord)
+                continue
+            if requested:
+                session.requested.remove(coord)
+            session.send(protocol.chunk_message(*coord, self._payload(coord)))
+            session.held.add(coord)
+            sent += 1
+
+    def _load(self, coord):
+        if coord in self._loading:
+            return
+        self._loading.add(coord)
+        future = asyncio.get_running_loop().run_in_executor(self._executor, self._generate, *coord)
+        future.add_done_callback(lambda f, coord=coord: self._loaded(coord, f))
+
+    def _generate(self, cx, cz):
+        chunk = self.store.load(cx, cz) if self.store else None
+        return chunk or self.terrain.generate(cx, cz)
+
+    def _loaded(self, coord, future):
+        self._loading.discard(coord)
+        if future.cancelled() or future.exception() is not None:
+            return
+        if coord not in self.world:
+            self.world.add_chunk(future.result())
+
+    def _unload_unused(self):
+        for coord in list(self.world.chunks):
+            if any(coord in s.held or s.interested(coord, margin=1) for s in self.sessions.values()):
+                continue
+            chunk = self.world.remove_chunk(*coord)
+            self._payloads.pop(coord, None)
+            if chunk.modified and self.store:
+                self.store.save_async([chunk])
+
+    def tick_percentiles(self, q=(50, 95, 99)):
+        """
+        Tick work time percentiles in milliseconds.
+        """
+        if not self.tick_times:
+            return tuple(0.0 for _ in q)
+        return tuple(float(v) * 1000 for v in np.percentile(np.fromiter(self.tick_times, dtype=np.float64), q))
+
+
+async def serve(args):
+    server = WorldServer(seed=args.seed, world_dir=args.world, tick_rate=args.tick_rate,
+                         max_radius=args.max_radius)
+    port = await server.start(args.host, args.port)
+    print(f"Serving on {args.host}:{port}")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            p50, p95, p99 = server.tick_percentiles()
+            print(f"{len(server.sessions)} clients, {len(server.world.chunks)} chunks, "
+                  f"tick p50 {p50:.2f} p95 {p95:.2f} p99 {p99:.2f} ms")
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=protocol.DEFAULT_PORT)
+    parser.add_argument('--seed', type=int, default=1, help='seed for a new world')
+    parser.add_argument('--world', default=os.path.join(GAME_DIR, 'saves', 'server'))
+    parser.add_argument('--tick-rate', type=int, default=20)
+    parser.add_argument('--max-radius', type=int, default=8, help='largest view radius served, in chunks')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""
+Side-by-side game versions backed by a content-addressed store: every file of every
+installed version is kept once under store/<sha256[:2]>/<sha256[2:]> and hardlinked into
+each version's directory, so versions that share a file share its disk space, and
+installing or switching to a version whose files are already stored copies nothing.
+
+    <base>/store/ab/cdef...        one object per distinct file
+    <base>/versions/1.2/...        an install; its files are links to objects
+    <base>/versions/1.2/manifest.json
+
+Objects no installed version's manifest refers to are removed by collect_garbage().
+
+    python store.py list ~/TurboCraft
+    python store.py remove ~/TurboCraft 1.1
+    python store.py gc ~/TurboCraft
+"""
+import argparse
+import os
+import shutil
+import sys
+
+from manifest import Manifest, local_path, verify
+
+STORE_SUBDIR = 'store'
+VERSIONS_SUBDIR = 'versions'
+INSTALL_MANIFEST = 'manifest.json'
+
+
+def version_key(version):
+    # "1.10" after "1.9"; non-numeric parts sort after numbers
+    return [(0, int(part), '') if part.isdigit() else (1, 0, part) for part in version.split('.')]
+
+
+def _link_or_copy(source, dest):
+    """
+    Hardlinks `source` at `dest`, replacing it atomically; copies where hardlinks aren't
+    supported (e.g. FAT drives), which works but no longer saves space.
+    """
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = f'{dest}.linking'
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(source, tmp)
+    except OSError:
+        shutil.copy2(source, tmp)
+    os.replace(tmp, dest)
+
+
+class ObjectStore:
+    """
+    Files by SHA-256. Objects are only ever added by linking or renaming a verified file,
+    and replaced files are renamed over rather than written in place, so an object's
+    bytes never change while installs link to it.
+    """
+    def __init__(self, root):
+        self.root = root
+
+    def object_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    def has(self, digest, cache=None):
+        """
+        Whether the object exists; with a HashCache, also that its contents still match.
+        """
+        path = self.object_path(digest)
+        if cache is not None:
+            return cache.sha256(path) == digest
+        return os.path.isfile(path)
+
+    def add(self, path, digest):
+        """
+        Stores the file at `path`, whose SHA-256 is `digest`. If the object already exists,
+        `path` is replaced by a link to it instead, so both copies share one.
+        """
+        obj = self.object_path(digest)
+        if os.path.isfile(obj):
+            if not os.path.samefile(path, obj):
+                _link_or_copy(obj, path)
+            return obj
+        _link_or_copy(path, obj)
+        return obj
+
+    def link(self, digest, dest):
+        _link_or_copy(self.object_path(digest), dest)
+
+    def digests(self):
+        for prefix in os.listdir(self.root) if os.path.isdir(self.root) else ():
+            directory = os.path.join(self.root, prefix)
+            if len(prefix) == 2 and os.path.isdir(directory):
+                for rest in os.listdir(directory):
+                    if not rest.endswith('.linking'):
+                        yield prefix + rest
+
+    def size(self):
+        return sum(os.path.getsize(self.object_path(digest)) for digest in self.digests())
+
+    def gc(self, keep):
+        """
+        Removes every object whose digest isn't in `keep`; returns (objects, bytes) freed.
+        """
+        removed = freed = 0
+        for digest in list(self.digests()):
+            if digest in keep:
+                continue
+            path = self.object_path(digest)
+            freed += os.path.getsize(path)
+            os.remove(path)
+            removed += 1
+        return removed, freed
+
+
+class Installs:
+    """
+    The installed versions under `base`, each a directory of links into the shared store
+    plus the manifest it was installed from.
+    """
+    def __init__(self, base):
+        self.base = base
+        self.store = ObjectStore(os.path.join(base, STORE_SUBDIR))
+
+    def path(self, version):
+        if not version or version in ('.', '..') or os.path.basename(version) != version:
+            raise ValueError(f"Bad version name: {version!r}")
+        return os.path.join(self.base, VERSIONS_SUBDIR, version)
+
+    def versions(self):
+        """
+        The installed versions, newest first.
+        """
+        directory = os.path.join(self.base, VERSIONS_SUBDIR)
+        if not os.path.isdir(directory):
+            return []
+        found = [name for name in os.listdir(directory) if os.path.isfile(os.path.join(directory, name, INSTALL_MANIFEST))]
+        return sorted(found, key=version_key, reverse=True)
+
+    def manifest(self, version):
+        return Manifest.load(os.path.join(self.path(version), INSTALL_MANIFEST))
+
+    def prepare(self, manifest, cache):
+        """
+        Brings the install of `manifest` up to date as far as the store allows: files that
+        are missing or don't match are linked from their object, and for those the store
+        can't provide, an older version that one of the entry's patches applies to is linked
+        instead, to be patched in place. Returns the entries that still need fetching.
+        """
+        root = self.path(manifest.version)
+        stale = []
+        for entry in verify(manifest, root, cache):
+            path = local_path(root, entry.path)
+            if entry.sha256 and self.store.has(entry.sha256, cache):
+                self.store.link(entry.sha256, path)
+                cache.remember(path, entry.sha256)
+                continue
+            if not os.path.isfile(path):
+                source = next((patch['from'] for patch in entry.patches if self.store.has(patch['from'], cache)), None)
+                if source:
+                    self.store.link(source, path)
+            stale.append(entry)
+        return stale
+
+    def commit(self, manifest, cache):
+        """
+        Records a complete, verified install of `manifest`: its files move into the store
+        (or become links to identical objects already there) and its manifest is saved.
+        """
+        root = self.path(manifest.version)
+        for entry in manifest.entries:
+            if entry.sha256:
+                path = local_path(root, entry.path)
+                obj = self.store.add(path, entry.sha256)
+                cache.remember(path, entry.sha256)
+                cache.remember(obj, entry.sha256)
+        manifest.save(os.path.join(root, INSTALL_MANIFEST))
+
+    def remove(self, version):
+        shutil.rmtree(self.path(version))
+
+    def collect_garbage(self):
+        """
+        Removes the objects no installed version refers to; returns (objects, bytes) freed.
+        """
+        keep = set()
+        for version in self.versions():
+            keep.update(entry.sha256 for entry in self.manifest(version).entries if entry.sha256)
+        return self.store.gc(keep)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    listing = commands.add_parser('list', help='installed versions and store size')
+    listing.add_argument('base')
+    remove = commands.add_parser('remove', help='uninstall a version and free its unshared files')
+    remove.add_argument('base')
+    remove.add_argument('version')
+    gc = commands.add_parser('gc', help='delete objects no installed version uses')
+    gc.add_argument('base')
+    args = parser.parse_args()
+
+    installs = Installs(args.base)
+    if args.command == 'list':
+        for version in installs.versions():
+            manifest = installs.manifest(version)
+            total = sum(entry.size or 0 for entry in manifest.entries)
+            print(f"{version}: {len(manifest.entries)} files, {total / 1e6:.1f} MB")
+        print(f"store: {installs.store.size() / 1e6:.1f} MB")
+        return
+    if args.command == 'remove':
+        if args.version not in installs.versions():
+            sys.exit(f"{args.version} is not installed")
+        installs.remove(args.version)
+    removed, freed = installs.collect_garbage()
+    print(f"removed {removed} objects, {freed / 1e6:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,345 @@
+import logging
+import time
+from math import sqrt
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from lighting import chunk_light
+
+log = logging.getLogger(__name__)
+
+
+class ChunkStreamer:
+    """
+    Keeps the set of resident chunks around the player bounded.
+
+    Chunks within `load_radius` (Chebyshev distance, in chunks) of the player are loaded.
+    A chunk is only unloaded once it is more than `load_radius + unload_margin` away, so
+    walking back and forth over a chunk border doesn't reload the same chunks every frame.
+    On top of that an LRU cap keeps at most `max_chunks` resident, evicting the chunks
+    least recently in range first.
+
+    Chunks the player has modified are never dropped: they are handed to `persist` on
+    unload (which saves them, so `generate` can load them back), or without one are
+    retained off-world and handed back instead of being regenerated.
+
+    Generation, the chunk's own lighting and meshing run on a pool of worker threads.
+    Workers only produce numpy buffers (the chunk array, its light and its mesh); the main
+    thread calls `integrate()` once per frame to attach finished chunks, stopping when its
+    time budget is spent.
+
+    The load set is only recomputed when the player enters a new chunk. Missing chunks are
+    queued nearest first, biased towards the direction of travel, and while moving the
+    chunks just past the load radius ahead of the player are prefetched. Only a few builds
+    are handed to the pool at a time, so a new position re-prioritises the queue at once.
+
+    A build that raises is logged and queued again, up to `max_attempts` times; after that
+    the chunk is left out (see `failed`) rather than taking the game loop down with it.
+    A ConnectionError from `generate` (a remote world that went away) instead stops all
+    loading: the queue is dropped, `disconnected` is set and `on_disconnect` is called.
+    """
+    def __init__(self, world, generate, mesh, load_radius, unload_margin=1, max_chunks=None,
+                 workers=2, frame_budget=0.004, heading_bias=1.0, prefetch_speed=2.0,
+                 persist=None, on_load=None, on_unload=None, on_disconnect=None, max_attempts=3):
+        self.world = world
+        self.generate = generate  # (cx, cz) -> Chunk
+        self.mesh = mesh  # (padded block array, cx, cz, padded light array) -> ChunkMesh
+        self.load_radius = load_radius
+        self.unload_margin = unload_margin
+        self.max_chunks = max_chunks
+        self.frame_budget = frame_budget  # seconds per integrate() call
+        self.heading_bias = heading_bias  # chunks of distance traded for being straight ahead
+        self.prefetch_speed = prefetch_speed  # blocks/s above which chunks ahead are prefetched
+        self.max_in_flight = workers * 2
+        self.persist = persist  # (Chunk) for modified chunks being unloaded
+        self.on_load = on_load  # (cx, cz, ChunkMesh)
+        self.on_unload = on_unload  # (cx, cz)
+        self.on_disconnect = on_disconnect  # (ConnectionError)
+        self.disconnected = False
+        self.max_attempts = max_attempts
+        self.failed = set()  # coords given up on after max_attempts failed builds
+        self._failures = {}  # (cx, cz) -> failed builds so far
+        self.retained = {}  # (cx, cz) -> modified Chunk that is not resident
+        self._lru = OrderedDict()  # resident chunk coords, least recently in range first
+        self._pending = {}  # (cx, cz) -> (Future of (Chunk, ChunkMesh), chunk version or None)
+        self._ready = deque()  # finished coords, appended from worker threads
+        self._queue = deque()  # missing coords not yet handed to the pool, best first
+        self._center = None
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chunk-worker')
+
+    def _build(self, coord, chunk, padded, light):
+        """
+        Worker side: generate (unless reusing an existing chunk), light and mesh one chunk.
+        `padded` and `light` already hold the neighbour ring, copied on the main thread.
+        """
+        if chunk is None:
+            chunk = self.generate(*coord)
+            padded[1:-1, 1:-1, 1:-1] = chunk.blocks
+            light[1:-1, 1:-1, 1:-1] = chunk_light(chunk)
+        return chunk, self.mesh(padded, *coord, light)
+
+    def _submit(self, coord, chunk, padded):
+        version = chunk.version if chunk is not None else None
+        light = self.world.padded_light(*coord)
+        if chunk is not None:
+            light[1:-1, 1:-1, 1:-1] = chunk_light(chunk)
+        future = self._executor.submit(self._build, coord, chunk, padded, light)
+        self._pending[coord] = (future, version)
+        future.add_done_callback(lambda f, coord=coord: self._ready.append(coord))
+
+    def _request(self, coord):
+        chunk = self.retained.get(coord)
+        padded = self.world.padded_chunk(*coord)
+        if chunk is not None:
+            padded[1:-1, 1:-1, 1:-1] = chunk.blocks
+        self._submit(coord, chunk, padded)
+
+    def remesh(self, cx, cz):
+        """
+        Rebuilds a resident chunk's mesh in the background, e.g. to change its level of detail.
+        The result is dropped if the chunk is edited before it arrives.
+        """
+        coord = (cx, cz)
+        chunk = self.world.get_chunk(cx, cz)
+        if chunk is None or coord in self._pending:
+            return
+        self._submit(coord, chunk, self.world.padded_chunk(cx, cz))
+
+    def invalidate(self, cx, cz):
+        """
+        Drops any build in flight for (cx, cz) whose input is now out of date, e.g. after an
+        edit next to it. A chunk that was still loading is requested again, ahead of the
+        queue. A resident chunk's remesh is simply dropped; the caller rebuilds its mesh.
+        """
+        coord = (cx, cz)
+        if coord not in self._pending:
+            return
+        self._cancel(coord)
+        if coord not in self.world:
+            self._queue.appendleft(coord)
+
+    def _attach(self, coord):
+        future, version = self._pending.get(coord, (None, None))
+        if future is None or not future.done():
+            return False  # stale notification from a build that was cancelled and re-requested
+        del self._pending[coord]
+        try:
+            chunk, mesh = future.result()
+        except ConnectionError as e:
+            self.disconnect(e)
+            return False
+        except Exception as e:
+            self._build_failed(coord, e)
+            return False
+        self._failures.pop(coord, None)
+        if version is not None and chunk.version != version:
+            return False  # edited meanwhile; the edit already rebuilt a newer mesh
+        self.retained.pop(coord, None)
+        self.world.add_chunk(chunk)
+        self._lru[coord] = True
+        if self.on_load:
+            self.on_load(coord[0], coord[1], mesh)
+        return True
+
+    def _build_failed(self, coord, error):
+        failures = self._failures[coord] = self._failures.get(coord, 0) + 1
+        log.error("Building chunk %s failed (attempt %d of %d)", coord, failures, self.max_attempts,
+                  exc_info=error)
+        if failures >= self.max_attempts:
+            del self._failures[coord]
+            self.failed.add(coord)
+        elif coord not in self.world:
+            self._queue.append(coord)
+
+    def disconnect(self, error):
+        """
+        Stops all loading for good because the chunk source is gone; resident chunks stay.
+        Called on a ConnectionError from `generate`, or by the owner when it notices first.
+        """
+        if self.disconnected:
+            return
+        log.warning("Chunk source disconnected: %s", error)
+        self.disconnected = True
+        self._queue.clear()
+        for coord in list(self._pending):
+            self._cancel(coord)
+        if self.on_disconnect:
+            self.on_disconnect(error)
+
+    def _cancel(self, coord):
+        # A retained chunk stays in `retained` until attached, so nothing is lost here
+        self._pending.pop(coord)[0].cancel()
+
+    def unload(self, coord):
+        if coord in self._pending:
+            self._cancel(coord)
+        chunk = self.world.remove_chunk(*coord)
+        self._lru.pop(coord, None)
+        if chunk is None:
+            return
+        if chunk.modified:
+            if self.persist:
+                self.persist(chunk)
+            else:
+                self.retained[coord] = chunk
+        if self.on_unload:
+            self.on_unload(*coord)
+
+    def _wanted(self, cx, cz, velocity):
+        """
+        Coords that should be resident around chunk (cx, cz), best first.
+        """
+        r = self.load_radius
+        vx, vz = velocity
+        speed = sqrt(vx * vx + vz * vz)
+        hx, hz = (vx / speed, vz / speed) if speed else (0, 0)
+        reach = r + 1 if speed >= self.prefetch_speed and self.unload_margin > 0 else r
+
+        scored = []
+        for x in range(cx - reach, cx + reach + 1):
+            for z in range(cz - reach, cz + reach + 1):
+                dx, dz = x - cx, z - cz
+                distance = sqrt(dx * dx + dz * dz)
+                ahead = (dx * hx + dz * hz) / distance if distance else 0
+                if max(abs(dx), abs(dz)) > r and ahead < 0.7:
+                    continue  # only prefetch the ring ahead of the player
+                scored.append((distance - self.heading_bias * ahead, (x, z)))
+        scored.sort()
+        return [coord for _, coord in scored]
+
+    def update(self, cx, cz, velocity=(0, 0), force=False):
+        """
+        Re-plans loading around chunk (cx, cz) when the player has changed chunk:
+        queues missing chunks in priority order and evicts those out of range.
+        `velocity` is the player's horizontal (x, z) velocity in blocks per second.
+        """
+        if (cx, cz) == self._center and not force:
+            return
+        self._center = (cx, cz)
+
+        r = self.load_radius
+        self._queue.clear()
+        for coord in self._wanted(cx, cz, velocity):
+            if coord in self._lru:
+                self._lru.move_to_end(coord)
+            elif coord in self._pending or coord in self.failed:
+                continue
+            elif coord not in self.world:
+                self._queue.append(coord)
+            else:
+                self._lru[coord] = True  # added to the world by someone else
+
+        keep = r + self.unload_margin
+        # Chunks given up on get another chance once the player has left and come back
+        self.failed = {coord for coord in self.failed if max(abs(coord[0] - cx), abs(coord[1] - cz)) <= keep}
+        for coord in list(self._pending):
+            if max(abs(coord[0] - cx), abs(coord[1] - cz)) > keep:
+                self._cancel(coord)
+        for coord in list(self._lru):
+            if max(abs(coord[0] - cx), abs(coord[1] - cz)) > keep:
+                self.unload(coord)
+
+        if self.max_chunks is not None:
+            for coord in list(self._lru):
+                if len(self._lru) <= self.max_chunks:
+                    break
+                if max(abs(coord[0] - cx), abs(coord[1] - cz)) > r:
+                    self.unload(coord)
+
+    def set_load_radius(self, load_radius):
+        """
+        Changes the load radius, re-planning around the current center at once.
+        """
+        if load_radius == self.load_radius:
+            return
+        self.load_radius = load_radius
+        if self._center is not None:
+            self.update(*self._center, force=True)
+
+    def _pump(self):
+        """
+        Hands queued chunks to the pool, keeping only a few builds in flight.
+        """
+        while self._queue and len(self._pending) < self.max_in_flight and not self.disconnected:
+            coord = self._queue.popleft()
+            if coord not in self._pending and coord not in self.world:
+                self._request(coord)
+
+    def integrate(self, budget=None):
+        """
+        Attaches finished chunks until `budget` seconds (default: frame_budget) are used.
+        At least one chunk is attached per call so loading always makes progress.
+        Returns the number of chunks attached.
+        """
+        budget = self.frame_budget if budget is None else budget
+        self._pump()
+        deadline = time.perf_counter() + budget
+        attached = 0
+        while self._ready:
+            if not self._attach(self._ready.popleft()):
+                continue
+            attached += 1
+            if time.perf_counter() >= deadline:
+                break
+        self._pump()
+        return attached
+
+    def prefetch(self):
+        """
+        Starts building queued chunks without attaching any, e.g. while a menu is shown.
+        Finished builds wait for integrate(), so at most a pool's worth is built ahead.
+        """
+        self._pump()
+
+    def flush(self, coords=None):
+        """
+        Blocks until every requested chunk is built and attached. With `coords`, only
+        waits for those chunks, submitting them straight to the pool; the rest keep
+        loading through integrate(). Chunks whose builds keep failing are given up on
+        (see `failed`) rather than waited for.
+        """
+        if coords is None:
+            while (self._pending or self._queue) and not self.disconnected:
+                self._pump()
+                for future, _ in list(self._pending.values()):
+                    future.exception()  # waits for completion
+                self.integrate(budget=float('inf'))
+            return
+
+        coords = [tuple(coord) for coord in coords]
+        while True:
+            missing = [coord for coord in coords if coord not in self.world and coord not in self.failed]
+            if not missing or self.disconnected:
+                return
+            for coord in missing:
+                if coord in self._queue:
+                    self._queue.remove(coord)
+                if coord not in self._pending:
+                    self._request(coord)
+            wait([self._pending[coord][0] for coord in missing], return_when=FIRST_COMPLETED)
+            self.integrate(budget=float('inf'))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def is_loading(self, cx, cz):
+        """
+        Whether (cx, cz) is queued or being built, i.e. will become resident soon.
+        """
+        coord = (cx, cz)
+        return coord in self._pending or coord in self._queue
+
+    @property
+    def center(self):
+        """
+        The chunk the load set was last planned around, or None.
+        """
+        return self._center
+
+    @property
+    def loaded_count(self):
+        return len(self._lru)
+
+    @property
+    def pending_count(self):
+        return len(self._pending) + len(self._queue)
@@ -3,26 +3,42 @@ from tkinter import messagebox, scrolledtext, ttk, font
 import sys
 import os
 import time
-import urllib.request
 import threading # For running download in a separate thread
 import subprocess # Added for launching the game file
+import importlib.util
+from downloads import DownloadEngine, DownloadError
+from archives import ZipStreamExtractor, extract_missing
+from delta import PatchError, apply_patch_file
+from manifest import RELEASE_BASE_URL, RELEASE_FILES, HashCache, Manifest, ManifestEntry, file_sha256, local_path, verify
+from store import Installs
 
 # --- Configuration ---
 GAME_NAME = "TurboCraft"
-GAME_VERSION = "1.1"
+GAME_VERSION = "1.2" # Newest entry of version.txt, as in manifest.json
+LATEST_VERSION = "Latest" # Version menu entry that installs or updates to the current release
 DEVELOPER = "TurboDev"
 LAUNCHER_TITLE = f"{GAME_NAME} Launcher - {DEVELOPER}"
-GAME_DOWNLOAD_URL = "https://github.com/sigmaplayz/file/raw/main/client.py"
-BG_IMAGE_DOWNLOAD_URL = "https://github.com/sigmaplayz/file/raw/main/bg.jpg" # Download URL for background image
+# A release is the repository at RELEASE_BASE_URL plus the manifest.json that
+# `python manifest.py release` writes for it, which maps install paths to the files there
+MANIFEST_URL = RELEASE_BASE_URL + "manifest.json" # Sizes and SHA-256 of every game file (see manifest.py)
 
 # Define the base directory for TurboCraft within the user's home directory
 # This will resolve to C:\Users\username\TurboCraft on Windows,
 # and /home/username/TurboCraft on Linux, or /Users/username/TurboCraft on macOS.
 TURBOCRAFT_BASE_DIR = os.path.join(os.path.expanduser('~'), "TurboCraft")
+# Each version is installed to TURBOCRAFT_BASE_DIR/versions/<version>, its files hardlinked
+# from a shared store (see store.py); saves and settings stay in TURBOCRAFT_BASE_DIR
 ASSETS_SUBDIR = "assets" # New constant for the assets subdirectory
+PATCHES_SUBDIR = ".patches" # Binary patches while they are being applied
 
 GAME_FILE_NAME = "client.py" # Expected name of the downloaded game file
-BG_IMAGE_FILE_NAME = "bg.jpg" # Expected name of the downloaded background image
+# Third-party packages the game needs in the Python that runs it: import name -> pip name
+GAME_REQUIREMENTS = {"ursina": "ursina", "numpy": "numpy", "PIL": "pillow"}
+# "mount": the game reads asset zips in place (one file, nothing to unpack; see archives.py)
+# "extract": zips are unpacked next to themselves while they download
+ASSET_ARCHIVE_MODE = "mount"
+MANIFEST_FILE_NAME = "manifest.json" # Last manifest fetched, used when offline
+HASH_CACHE_FILE_NAME = ".hashcache.json" # Checksums of local files by size and mtime
 
 # --- Custom Button Class for better aesthetics ---
 class CustomButton(tk.Canvas):
@@ -100,9 +116,10 @@ class TurboCraftLauncher(tk.Tk):
         self.grid_rowconfigure(2, weight=0) # Footer/buttons
         self.grid_columnconfigure(0, weight=1)
 
-        self.game_versions = ["1.1"] # Available versions
+        self.installs = Installs(TURBOCRAFT_BASE_DIR)
+        self.game_versions = [LATEST_VERSION] + self.installs.versions() # Installed versions, newest first
         self.selected_version = tk.StringVar(self)
-        self.selected_version.set(GAME_VERSION) # Default to 1.1
+        self.selected_version.set(LATEST_VERSION)
 
         self.create_widgets()
 
@@ -143,7 +160,7 @@ class TurboCraftLauncher(tk.Tk):
         )
         version_label.grid(row=0, column=1, sticky="e", padx=(0, 5))
 
-        version_menu = tk.OptionMenu(header_frame, self.selected_version, *self.game_versions)
+        self.version_menu = version_menu = tk.OptionMenu(header_frame, self.selected_version, *self.game_versions)
         version_menu.config(
             font=("Inter", 10),
             bg="#3a3a40",
@@ -319,78 +336,111 @@ class TurboCraftLauncher(tk.Tk):
         Contains the core logic for downloading, verifying, and launching the game.
         Runs in a separate thread.
         """
-        # Define the full paths for the game files
-        game_file_path = os.path.join(TURBOCRAFT_BASE_DIR, GAME_FILE_NAME)
-        
-        # Define the full path for the assets directory and the background image
-        assets_dir_path = os.path.join(TURBOCRAFT_BASE_DIR, ASSETS_SUBDIR)
-        bg_image_file_path = os.path.join(assets_dir_path, BG_IMAGE_FILE_NAME)
-
         try:
-            # Step 1: Simulate initial checks
-            self.update_progress("Checking for updates...", 5)
-            time.sleep(0.2)
-
             # Ensure the TurboCraft base directory exists
             os.makedirs(TURBOCRAFT_BASE_DIR, exist_ok=True)
-            # Ensure the assets subdirectory exists
-            os.makedirs(assets_dir_path, exist_ok=True)
 
-            # Step 2: Download or verify client.py
-            if os.path.exists(game_file_path):
-                self.update_progress("Client file found locally!", 15)
-                time.sleep(0.2)
+            # Step 1: Get the manifest of the current release, or of the installed version picked
+            selected = self.selected_version.get()
+            if selected == LATEST_VERSION:
+                self.update_progress("Checking for updates...", 5)
+                manifest = self._load_manifest()
+            else:
+                manifest = self.installs.manifest(selected)
+            install_dir = self.installs.path(manifest.version)
+            game_file_path = os.path.join(install_dir, GAME_FILE_NAME)
+            os.makedirs(os.path.join(install_dir, ASSETS_SUBDIR), exist_ok=True)
+
+            # Step 2: Verify local files against it; unchanged files are answered from the hash
+            # cache, and files another version already has are linked from the store
+            self.update_progress("Verifying game files integrity...", 10)
+            cache = HashCache(os.path.join(TURBOCRAFT_BASE_DIR, HASH_CACHE_FILE_NAME))
+            stale = self.installs.prepare(manifest, cache)
+
+            # Step 3: Fetch only the files that are missing or don't match, all at once. Files
+            # whose installed version has a patch to the new one only need the patch.
+            if not stale:
+                self.update_progress("All files up to date!", 85)
             else:
-                self.update_progress("Client file not found. Downloading...", 15)
+                self.update_progress(f"Downloading {len(stale)} file(s)...", 15)
+                local = {entry.path: local_path(install_dir, entry.path) for entry in stale}
+                patches = {}  # entry path -> (patch, where it is downloaded to)
+                for entry in stale:
+                    patch = entry.patch_from(cache.sha256(local[entry.path])) if entry.patches else None
+                    if patch:
+                        patches[entry.path] = (patch, local_path(os.path.join(TURBOCRAFT_BASE_DIR, PATCHES_SUBDIR), entry.path) + ".patch")
+                downloads = [(patches[entry.path][0]["url"], patches[entry.path][1]) if entry.path in patches
+                             else (entry.url, local[entry.path]) for entry in stale]
+                # Bundles to unpack are extracted as their bytes arrive rather than afterwards
+                consumers = {}
+                if ASSET_ARCHIVE_MODE == "extract":
+                    consumers = {local[entry.path]: ZipStreamExtractor(os.path.dirname(local[entry.path]))
+                                 for entry in stale if entry.extract and entry.path not in patches}
+                engine = DownloadEngine()
                 try:
-                    urllib.request.urlretrieve(GAME_DOWNLOAD_URL, game_file_path, reporthook=lambda count, block_size, total_size: self._download_progress_hook(count, block_size, total_size, start_percent=15, end_percent=45))
-                    self.update_progress("Client download complete!", 45)
-                    time.sleep(0.2)
-                    if not os.path.exists(game_file_path):
-                        messagebox.showerror("Download Error", f"Failed to save {GAME_FILE_NAME} at {game_file_path}. Please try again.")
-                        self.reset_launcher_state()
-                        return
-                except Exception as e:
-                    messagebox.showerror("Download Error", f"Failed to download client.py: {e}\nPlease check your internet connection and try again.")
+                    engine.fetch(downloads, consumers=consumers,
+                                 progress=lambda done, total, files_done, files: self._download_progress(
+                                     done, total, files_done, files, start_percent=15, end_percent=80))
+                    # A patch that doesn't check out falls back to downloading the whole file
+                    failed = [entry for entry in stale if entry.path in patches
+                              and not self._apply_patch(local[entry.path], *patches[entry.path])]
+                    if failed:
+                        engine.fetch([(entry.url, local[entry.path]) for entry in failed],
+                                     progress=lambda done, total, files_done, files: self._download_progress(
+                                         done, total, files_done, files, start_percent=80, end_percent=85))
+                except DownloadError as e:
+                    messagebox.showerror("Download Error", f"{e}\nPlease check your internet connection and try again. "
+                                                           "Finished files are kept and partial ones resume next time.")
                     self.reset_launcher_state()
                     return
-
-            # Step 3: Download or verify bg.jpg in the assets directory
-            if os.path.exists(bg_image_file_path):
-                self.update_progress("Background image found locally!", 55)
-                time.sleep(0.2)
-            else:
-                self.update_progress("Background image not found. Downloading...", 55)
-                try:
-                    urllib.request.urlretrieve(BG_IMAGE_DOWNLOAD_URL, bg_image_file_path, reporthook=lambda count, block_size, total_size: self._download_progress_hook(count, block_size, total_size, start_percent=55, end_percent=85))
-                    self.update_progress("Background image download complete!", 85)
-                    time.sleep(0.2)
-                    if not os.path.exists(bg_image_file_path):
-                        messagebox.showerror("Download Error", f"Failed to save {BG_IMAGE_FILE_NAME} at {bg_image_file_path}. Please try again.")
-                        self.reset_launcher_state()
-                        return
-                except Exception as e:
-                    messagebox.showerror("Download Error", f"Failed to download bg.jpg: {e}\nPlease check your internet connection and try again.")
+                finally:
+                    engine.close()
+
+                # Downloads are checked like everything else before they're trusted
+                corrupt = verify(Manifest(manifest.version, stale), install_dir, cache)
+                for entry in corrupt:
+                    path = local[entry.path]
+                    os.remove(path)
+                    cache.forget(path)
+                if corrupt:
+                    cache.save()
+                    messagebox.showerror("Download Error", "Downloaded files failed the checksum: "
+                                         f"{', '.join(entry.path for entry in corrupt)}\nPlease try again.")
                     self.reset_launcher_state()
                     return
-
-            # Step 4: Verify game file integrity (basic check)
-            self.update_progress("Verifying game files integrity...", 90)
-            # In a real scenario, you might add a checksum verification here for both files
-            time.sleep(0.5)
-
-            # Step 5: Launch the game file
+                self.update_progress("Download complete!", 85)
+            # Unpack bundles that weren't streamed (patched, or kept from earlier) if any file is missing
+            if ASSET_ARCHIVE_MODE == "extract":
+                for entry in manifest.entries:
+                    if entry.extract:
+                        path = local_path(install_dir, entry.path)
+                        extract_missing(path, os.path.dirname(path))
+
+            # Share the install's files through the store and drop what no version uses any more
+            self.installs.commit(manifest, cache)
+            self.installs.collect_garbage()
+            cache.save()
+            self.after(0, self._refresh_versions)
+
+            # Step 4: Launch the game file, once we know it can start at all
+            missing = [package for module, package in GAME_REQUIREMENTS.items() if importlib.util.find_spec(module) is None]
+            if missing:
+                messagebox.showerror("Missing Packages", f"{GAME_NAME} needs these Python packages: {', '.join(missing)}\n"
+                                     f"Install them with:\n{sys.executable} -m pip install {' '.join(missing)}")
+                self.reset_launcher_state()
+                return
             self.update_progress("Starting TurboCraft...", 95)
             try:
                 # Execute the downloaded Python script using the current Python interpreter
-                self.game_process = subprocess.Popen([sys.executable, game_file_path])
+                self.game_process = subprocess.Popen([sys.executable, game_file_path], cwd=install_dir,
+                                                     env=dict(os.environ, TURBOCRAFT_DATA_DIR=TURBOCRAFT_BASE_DIR))
                 self.game_start_time = time.time() # Record start time
                 self._start_game_timer() # Start the timer updates
 
                 self.update_progress("Launch successful!", 100)
                 time.sleep(1) # Give a moment for the game to start
 
-                print(f"--- Launched {GAME_NAME} v{self.selected_version.get()} ---")
+                print(f"--- Launched {GAME_NAME} v{manifest.version} ---")
 
             except FileNotFoundError:
                 messagebox.showerror("Launch Error", f"Python interpreter or game file '{GAME_FILE_NAME}' not found. Ensure Python is in your PATH and the file exists.")
@@ -404,6 +454,35 @@ class TurboCraftLauncher(tk.Tk):
             # Or if an error occurs before launch.
             pass # No direct call here, controlled by _start_game_timer or error handling above
 
+    def _load_manifest(self):
+        """
+        The current release manifest; the one fetched last time when offline, or the built-in
+        file list (which only checks that the files exist) if there is neither.
+        """
+        manifest_path = os.path.join(TURBOCRAFT_BASE_DIR, MANIFEST_FILE_NAME)
+        engine = DownloadEngine(retries=1, timeout=10)
+        try:
+            engine.fetch([(MANIFEST_URL, manifest_path)])
+        except DownloadError as e:
+            print(f"Could not fetch the manifest, using the local copy: {e}")
+        finally:
+            engine.close()
+        try:
+            return Manifest.load(manifest_path)
+        except (OSError, ValueError, KeyError):
+            return Manifest(GAME_VERSION, [ManifestEntry(path, RELEASE_BASE_URL + source, extract=path.endswith(".zip"))
+                                           for path, source in RELEASE_FILES.items()])
+
+    def _refresh_versions(self):
+        """
+        Lists the currently installed versions in the version menu. Must be called from main thread.
+        """
+        self.game_versions = [LATEST_VERSION] + self.installs.versions()
+        menu = self.version_menu["menu"]
+        menu.delete(0, "end")
+        for version in self.game_versions:
+            menu.add_command(label=version, command=tk._setit(self.selected_version, version))
+
     def _start_game_timer(self):
         """
         Updates the game session timer and checks if the game process is still running.
@@ -423,19 +502,37 @@ class TurboCraftLauncher(tk.Tk):
             self.game_timer_label.config(text="Game not running.")
             self.reset_launcher_state() # Reset launcher state if game exited
 
-    def _download_progress_hook(self, count, block_size, total_size, start_percent, end_percent):
+    def _apply_patch(self, path, patch, patch_path):
         """
-        Callback function for urlretrieve to update download progress for a specific segment.
+        Patches the installed file at `path` in place with a downloaded patch. Returns False
+        (leaving the file as it was) if the patch is damaged or doesn't produce the new version.
         """
-        if total_size > 0:
-            percent_of_segment = int(count * block_size * 100 / total_size)
+        try:
+            if file_sha256(patch_path) != patch["sha256"]:
+                return False
+            apply_patch_file(path, patch_path, path)
+            return True
+        except (OSError, PatchError):
+            return False
+        finally:
+            try:
+                os.remove(patch_path)
+            except OSError:
+                pass
+
+    def _download_progress(self, done, total, files_done, files, start_percent, end_percent):
+        """
+        Callback from the download engine's threads with the bytes of all files together.
+        """
+        if total > 0:
+            percent_of_segment = int(done * 100 / total)
         else:
-            percent_of_segment = 0 # Handle cases where total_size is 0 (e.g., small files)
+            percent_of_segment = 0 # Handle cases where no size is known yet
 
         # Map the segment's progress (0-100) to the overall progress bar range
         overall_progress = start_percent + (percent_of_segment * (end_percent - start_percent) / 100)
-        
-        self.update_progress(f"Downloading: {int(percent_of_segment)}%", overall_progress)
+
+        self.update_progress(f"Downloading: {percent_of_segment}% ({files_done}/{files} files)", overall_progress)
 
     def update_progress(self, text, value):
         """
@@ -0,0 +1,143 @@
+import numpy as np
+
+from world import Chunk, CHUNK_SIZE, CHUNK_HEIGHT, BLOCK
+
+# Bump whenever generate() would produce different blocks for the same seed
+GENERATOR_VERSION = 1
+
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+
+def _hash2(ix, iz, seed):
+    """
+    Integer lattice hash of (ix, iz, seed) -> floats in [0, 1). Works on whole arrays.
+    """
+    # Reduce everything mod 2**32 before multiplying so no step overflows 64 bits
+    h = (((ix.astype(np.uint64) & _MASK32) * np.uint64(0x27D4EB2D)) & _MASK32) \
+        + (((iz.astype(np.uint64) & _MASK32) * np.uint64(0x165667B1)) & _MASK32) \
+        + ((seed & 0xFFFFFFFF) * 0x9E3779B9 & 0xFFFFFFFF)
+    h &= _MASK32
+    h ^= h >> np.uint64(15)
+    h = (h * np.uint64(0x2C1B3C6D)) & _MASK32
+    h ^= h >> np.uint64(12)
+    h = (h * np.uint64(0x297A2D39)) & _MASK32
+    h ^= h >> np.uint64(15)
+    return h.astype(np.float64) / 4294967296.0
+
+
+def value_noise(x, z, seed):
+    """
+    Smoothly interpolated lattice noise in [0, 1) sampled at float arrays x, z.
+    """
+    x0 = np.floor(x)
+    z0 = np.floor(z)
+    fx = x - x0
+    fz = z - z0
+    ix = x0.astype(np.int64)
+    iz = z0.astype(np.int64)
+    ux = fx * fx * (3 - 2 * fx)
+    uz = fz * fz * (3 - 2 * fz)
+    n00 = _hash2(ix, iz, seed)
+    n10 = _hash2(ix + 1, iz, seed)
+    n01 = _hash2(ix, iz + 1, seed)
+    n11 = _hash2(ix + 1, iz + 1, seed)
+    top = n00 + (n10 - n00) * ux
+    bottom = n01 + (n11 - n01) * ux
+    return top + (bottom - top) * uz
+
+
+class TerrainGenerator:
+    """
+    Seeded heightmap terrain. Every value depends only on (seed, world x, world z), so a
+    chunk comes out identical whenever and wherever it is generated.
+    """
+    def __init__(self, seed=0, base_height=4, amplitude=32, scale=48.0, octaves=4,
+                 persistence=0.5, lacunarity=2.0):
+        self.seed = seed
+        self.base_height = base_height
+        self.amplitude = amplitude
+        self.scale = scale
+        self.octaves = octaves
+        self.persistence = persistence
+        self.lacunarity = lacunarity
+        # Normalises the fractal sum back into [0, 1)
+        self._norm = sum(persistence ** o for o in range(octaves))
+
+    def heights(self, x, z):
+        """
+        Terrain height (number of solid blocks in the column) at world coordinate arrays.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        z = np.asarray(z, dtype=np.float64)
+        total = np.zeros(np.broadcast(x, z).shape)
+        frequency = 1.0 / self.scale
+        weight = 1.0
+        for octave in range(self.octaves):
+            total += weight * value_noise(x * frequency, z * frequency, self.seed + octave * 7919)
+            frequency *= self.lacunarity
+            weight *= self.persistence
+        heights = self.base_height + (total / self._norm) * self.amplitude
+        return np.clip(heights.astype(np.int64), 1, CHUNK_HEIGHT - 1)
+
+    def heightmap(self, cx, cz):
+        """
+        (CHUNK_SIZE, CHUNK_SIZE) column heights for one chunk, indexed [x, z].
+        """
+        x = cx * CHUNK_SIZE + np.arange(CHUNK_SIZE)
+        z = cz * CHUNK_SIZE + np.arange(CHUNK_SIZE)
+        return self.heights(x[:, None], z[None, :])
+
+    def heightmaps(self, coords):
+        """
+        Heightmaps for many chunks in one batch of noise evaluations: (len(coords), S, S).
+        """
+        coords = np.asarray(coords, dtype=np.int64).reshape(-1, 2)
+        offsets = np.arange(CHUNK_SIZE)
+        x = coords[:, 0, None, None] * CHUNK_SIZE + offsets[None, :, None]
+        z = coords[:, 1, None, None] * CHUNK_SIZE + offsets[None, None, :]
+        return self.heights(x, z)
+
+    def height_at(self, x, z):
+        return int(self.heights(x, z))
+
+    def _fill(self, cx, cz, heightmap):
+        chunk = Chunk(cx, cz)
+        solid = np.arange(CHUNK_HEIGHT)[None, :, None] < heightmap[:, None, :]
+        chunk.data[...] = solid * chunk.palette_index(BLOCK)
+        return chunk
+
+    def generate(self, cx, cz):
+        """
+        Builds the chunk at (cx, cz), filling every column up to its height in one pass.
+        """
+        return self._fill(cx, cz, self.heightmap(cx, cz))
+
+    def generate_many(self, coords):
+        """
+        Builds several chunks, sharing one batched heightmap evaluation.
+        """
+        return [self._fill(cx, cz, heightmap) for (cx, cz), heightmap in zip(coords, self.heightmaps(coords))]
+
+    __call__ = generate
+
+
+if __name__ == '__main__':
+    import time
+
+    generator = TerrainGenerator(seed=1)
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < 2:
+        generator.generate(count % 64, count // 64)
+        count += 1
+    elapsed = time.perf_counter() - start
+    print(f"generate:      {count / elapsed:.0f} chunks/s ({CHUNK_SIZE}x{CHUNK_HEIGHT}x{CHUNK_SIZE}, {generator.octaves} octaves)")
+
+    batch = [(x, z) for x in range(16) for z in range(16)]
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < 2:
+        generator.generate_many([(x + count, z) for x, z in batch])
+        count += len(batch)
+    elapsed = time.perf_counter() - start
+    print(f"generate_many: {count / elapsed:.0f} chunks/s (batches of {len(batch)})")
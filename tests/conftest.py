@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# The game's modules sit at the top of the repository rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from world import World, Chunk  # noqa: E402
+
+
+@pytest.fixture
+def world():
+    """
+    An empty world of 3x3 loaded chunks around the origin, spanning x and z -8..15.
+    """
+    world = World()
+    for cx in (-1, 0, 1):
+        for cz in (-1, 0, 1):
+            world.add_chunk(Chunk(cx, cz))
+    return world
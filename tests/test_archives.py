@@ -0,0 +1,128 @@
+import io
+import os
+import zipfile
+
+import numpy as np
+import pytest
+
+from archives import ArchiveError, ZipArchive, ZipStreamExtractor, extract_missing
+
+MEMBERS = {
+    'readme.txt': b'hello\n' * 100,
+    'textures/stone.png': np.random.default_rng(1).integers(0, 256, 50_000, dtype=np.uint8).tobytes(),
+    'textures/empty.png': b'',
+    'sounds/step.ogg': bytes(range(256)) * 300,
+}
+
+
+class _Unseekable(io.RawIOBase):
+    # Makes zipfile write data descriptors, as streaming zip writers do
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+
+def make_zip(members=MEMBERS, compression=zipfile.ZIP_DEFLATED, streamed=False, zip64=False):
+    target = _Unseekable() if streamed else io.BytesIO()
+    with zipfile.ZipFile(target, 'w', compression) as archive:
+        archive.writestr('textures/', b'')
+        for name, data in members.items():
+            with archive.open(name, 'w', force_zip64=zip64) as f:
+                f.write(data)
+    return (target.buffer if streamed else target).getvalue()
+
+
+def feed_all(extractor, data, block):
+    for start in range(0, len(data), block):
+        extractor.feed(data[start:start + block])
+    extractor.close()
+
+
+def assert_extracted(directory, members=MEMBERS):
+    for name, data in members.items():
+        with open(os.path.join(directory, *name.split('/')), 'rb') as f:
+            assert f.read() == data
+    leftovers = [name for _, _, files in os.walk(directory) for name in files if name.endswith('.unzipping')]
+    assert not leftovers
+
+
+@pytest.mark.parametrize('compression', [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+@pytest.mark.parametrize('block', [1, 7, 4096, 1 << 20])
+def test_extracts_while_fed(tmp_path, compression, block):
+    extractor = ZipStreamExtractor(str(tmp_path))
+    feed_all(extractor, make_zip(compression=compression), block)
+    assert_extracted(tmp_path)
+    assert len(extractor.extracted) == len(MEMBERS)
+
+
+def test_data_descriptors(tmp_path):
+    feed_all(ZipStreamExtractor(str(tmp_path)), make_zip(streamed=True), 1000)
+    assert_extracted(tmp_path)
+
+
+def test_zip64_headers(tmp_path):
+    feed_all(ZipStreamExtractor(str(tmp_path)), make_zip(zip64=True), 1000)
+    assert_extracted(tmp_path)
+
+
+def test_reset_starts_over(tmp_path):
+    data = make_zip()
+    extractor = ZipStreamExtractor(str(tmp_path))
+    extractor.feed(data[:30_000])
+    extractor.reset()
+    feed_all(extractor, data, 5000)
+    assert_extracted(tmp_path)
+
+
+def test_truncated_archive_fails_on_close(tmp_path):
+    data = make_zip()
+    extractor = ZipStreamExtractor(str(tmp_path))
+    extractor.feed(data[:len(data) // 2])
+    with pytest.raises(ArchiveError):
+        extractor.close()
+
+
+def test_corrupt_member_is_not_written(tmp_path):
+    members = {'a.bin': b'\0' * 1000}
+    data = bytearray(make_zip(members, compression=zipfile.ZIP_STORED))
+    start = data.index(b'\0' * 1000)
+    data[start + 500] = 1
+    extractor = ZipStreamExtractor(str(tmp_path))
+    with pytest.raises(ArchiveError, match='CRC'):
+        feed_all(extractor, bytes(data), 100)
+    assert not os.path.exists(tmp_path / 'a.bin')
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.unzipping')]
+
+
+def test_member_outside_the_directory_is_refused(tmp_path):
+    data = make_zip({'../evil.txt': b'nope'})
+    with pytest.raises(ArchiveError, match='escapes'):
+        feed_all(ZipStreamExtractor(str(tmp_path / 'out')), data, 1000)
+    assert not os.path.exists(tmp_path / 'evil.txt')
+
+
+def test_extract_missing_only_writes_missing_files(tmp_path):
+    archive = tmp_path / 'bundle.zip'
+    archive.write_bytes(make_zip())
+    out = tmp_path / 'out'
+    assert len(extract_missing(str(archive), str(out))) == len(MEMBERS)
+    os.remove(out / 'readme.txt')
+    assert extract_missing(str(archive), str(out)) == [str(out / 'readme.txt')]
+    assert_extracted(out)
+
+
+def test_reads_members_in_place(tmp_path):
+    archive = tmp_path / 'bundle.zip'
+    archive.write_bytes(make_zip())
+    bundle = ZipArchive(str(archive))
+    try:
+        for name, data in MEMBERS.items():
+            assert name in bundle
+            assert bundle.read(name) == data
+    finally:
+        bundle.close()
@@ -0,0 +1,101 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from delta import PatchError, apply_patch, apply_patch_file, build_release_patches, make_patch, _mutate
+from manifest import Manifest, file_sha256
+
+
+def random_bytes(size, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, size, dtype=np.uint8).tobytes()
+
+
+@pytest.mark.parametrize('fraction', [0.0, 0.01, 0.2, 1.0])
+def test_roundtrip(fraction):
+    rng = np.random.default_rng(1)
+    old = random_bytes(200_000)
+    new = _mutate(old, rng, fraction) if fraction else old
+    assert apply_patch(old, make_patch(old, new)) == new
+
+
+@pytest.mark.parametrize('old, new', [
+    (b'', b''),
+    (b'', b'brand new'),
+    (b'gone', b''),
+    (b'short', b'shorter than a block'),
+    (b'ab' * 5000, b'ab' * 4000 + b'xy' + b'ab' * 1000),  # repetitive data
+])
+def test_roundtrip_edge_cases(old, new):
+    assert apply_patch(old, make_patch(old, new, block=64)) == new
+
+
+def test_small_edits_give_small_patches():
+    old = random_bytes(1_000_000)
+    new = old[:500_000] + b'inserted' + old[500_100:]
+    patch = make_patch(old, new)
+    assert len(patch) < 10_000
+    assert apply_patch(old, patch) == new
+
+
+def test_patch_for_another_file_is_rejected():
+    old = random_bytes(10_000)
+    patch = make_patch(old, old[::-1])
+    with pytest.raises(PatchError, match='different version'):
+        apply_patch(random_bytes(10_000, seed=2), patch)
+
+
+@pytest.mark.parametrize('damage', [
+    lambda p: p[:20],  # truncated header
+    lambda p: b'NOTADIFF' + p[8:],
+    lambda p: p[:-10],  # truncated body
+    lambda p: p[:-1] + bytes([p[-1] ^ 0xFF]),
+])
+def test_damaged_patch_is_rejected(damage):
+    old = random_bytes(10_000)
+    new = _mutate(old, np.random.default_rng(3), 0.1)
+    with pytest.raises(PatchError):
+        apply_patch(old, damage(make_patch(old, new)))
+
+
+def test_apply_patch_file_leaves_the_old_file_on_failure(tmp_path):
+    old = random_bytes(10_000)
+    path = tmp_path / 'file'
+    path.write_bytes(old)
+    patch_path = tmp_path / 'file.patch'
+    patch_path.write_bytes(make_patch(old, old[::-1])[:-4])
+    with pytest.raises(PatchError):
+        apply_patch_file(str(path), str(patch_path), str(path))
+    assert path.read_bytes() == old
+
+    patch_path.write_bytes(make_patch(old, old[::-1]))
+    apply_patch_file(str(path), str(patch_path), str(path))
+    assert path.read_bytes() == old[::-1]
+    assert sorted(os.listdir(tmp_path)) == ['file', 'file.patch']  # no temp file left behind
+
+
+def test_release_patches_are_listed_and_kept_out_of_the_release(tmp_path):
+    old_dir, new_dir = tmp_path / 'v1', tmp_path / 'v2'
+    (old_dir / 'assets').mkdir(parents=True)
+    (new_dir / 'assets').mkdir(parents=True)
+    old = random_bytes(100_000)
+    (old_dir / 'assets' / 'pack.bin').write_bytes(old)
+    (new_dir / 'assets' / 'pack.bin').write_bytes(_mutate(old, np.random.default_rng(4), 0.01))
+    (old_dir / 'same.txt').write_bytes(b'unchanged')
+    (new_dir / 'same.txt').write_bytes(b'unchanged')
+    manifest_path = tmp_path / 'manifest.json'
+    Manifest.build(str(new_dir), 'https://example.com/v2/', 'v2').save(str(manifest_path))
+
+    written = build_release_patches(str(old_dir), str(new_dir), str(manifest_path), 'https://example.com/v2-patches/')
+    assert len(written) == 1
+    assert os.path.dirname(os.path.dirname(written[0])) == str(tmp_path / 'v2-patches')
+    assert sorted(os.listdir(new_dir)) == ['assets', 'same.txt']
+
+    entry = next(e for e in Manifest.load(str(manifest_path)).entries if e.path == 'assets/pack.bin')
+    patch = entry.patch_from(file_sha256(str(old_dir / 'assets' / 'pack.bin')))
+    assert patch['url'].startswith('https://example.com/v2-patches/assets/pack.bin.')
+    with open(written[0], 'rb') as f:
+        assert apply_patch(old, f.read()) == (new_dir / 'assets' / 'pack.bin').read_bytes()
+    unchanged = next(f for f in json.loads(manifest_path.read_text())['files'] if f['path'] == 'same.txt')
+    assert 'patches' not in unchanged
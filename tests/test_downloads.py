@@ -0,0 +1,213 @@
+import hashlib
+import http.server
+import os
+import threading
+import time
+
+import pytest
+
+from downloads import DownloadEngine, DownloadError, HTTPStatusError, PART_SUFFIX, META_SUFFIX
+
+
+class StandIn(http.server.ThreadingHTTPServer):
+    """
+    A release server on localhost: serves `files` with strong ETags and byte ranges, and
+    can cut a response short to simulate a dropped connection.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.files = {}  # name -> bytes
+        self.drop_after = {}  # name -> bytes sent before the next response to it is cut off
+        self.delay = 0.0  # seconds each response waits before its body
+        self.requests = []  # (name, Range header or None, status)
+        self.connections = 0
+        self.active = self.max_active = 0
+        self.lock = threading.Lock()
+
+    def url(self, name):
+        return f'http://127.0.0.1:{self.server_address[1]}/{name}'
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _empty(self, status, **headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name.replace('_', '-'), value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        server = self.server
+        name = self.path.lstrip('/')
+        requested = self.headers.get('Range')
+        data = server.files.get(name)
+        if data is None:
+            server.requests.append((name, requested, 404))
+            self._empty(404)
+            return
+        etag = '"%s"' % hashlib.sha1(data).hexdigest()
+        start = 0
+        if requested and self.headers.get('If-Range') in (None, etag):
+            start = int(requested.split('=')[1].split('-')[0])
+            if start >= len(data):
+                server.requests.append((name, requested, 416))
+                self._empty(416, Content_Range=f'bytes */{len(data)}')
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(data) - 1}/{len(data)}')
+            server.requests.append((name, requested, 206))
+        else:
+            self.send_response(200)
+            server.requests.append((name, requested, 200))
+        body = data[start:]
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            time.sleep(server.delay)
+            drop = server.drop_after.pop(name, None)
+            if drop is not None:
+                self.wfile.write(body[:drop])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+
+@pytest.fixture
+def server():
+    server = StandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def engine():
+    engine = DownloadEngine(workers=4, timeout=5, retries=2)
+    yield engine
+    engine.close()
+
+
+def payload(size, seed=0):
+    return bytes((i * 31 + seed) % 251 for i in range(size))
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_fetches_files_concurrently(server, engine, tmp_path):
+    server.delay = 0.2
+    for i in range(4):
+        server.files[f'f{i}'] = payload(1000, i)
+    start = time.perf_counter()
+    paths = engine.fetch([(server.url(f'f{i}'), str(tmp_path / f'f{i}')) for i in range(4)])
+    elapsed = time.perf_counter() - start
+    assert server.max_active == 4
+    assert elapsed < 4 * server.delay
+    for i, path in enumerate(paths):
+        assert read(path) == server.files[f'f{i}']
+        assert not os.path.exists(path + PART_SUFFIX)
+        assert not os.path.exists(path + META_SUFFIX)
+
+
+def test_reuses_pooled_connections(server, tmp_path):
+    for i in range(10):
+        server.files[f'f{i}'] = payload(5000, i)
+    engine = DownloadEngine(workers=1, timeout=5)
+    try:
+        engine.fetch([(server.url(f'f{i}'), str(tmp_path / f'f{i}')) for i in range(5)])
+        engine.fetch([(server.url(f'f{i}'), str(tmp_path / f'f{i}')) for i in range(5, 10)])
+    finally:
+        engine.close()
+    assert engine.pool.opened == 1
+    assert server.connections == 1
+
+
+def test_resumes_after_a_dropped_connection(server, engine, tmp_path):
+    data = server.files['big'] = payload(300_000)
+    server.drop_after['big'] = 100_000
+    path = str(tmp_path / 'big')
+    engine.fetch([(server.url('big'), path)])
+    assert read(path) == data
+    assert [(r, status) for _, r, status in server.requests] == [(None, 200), ('bytes=100000-', 206)]
+
+
+def test_restarts_when_the_file_changed_since_the_partial_download(server, tmp_path):
+    server.files['big'] = payload(300_000)
+    server.drop_after['big'] = 100_000
+    path = str(tmp_path / 'big')
+    engine = DownloadEngine(timeout=5, retries=0)
+    with pytest.raises(DownloadError):
+        engine.fetch([(server.url('big'), path)])
+    assert os.path.getsize(path + PART_SUFFIX) == 100_000
+
+    # A new release replaces the file; If-Range makes the server send all of it again
+    new = server.files['big'] = payload(250_000, seed=7)
+    engine.fetch([(server.url('big'), path)])
+    engine.close()
+    assert read(path) == new
+    assert server.requests[-1] == ('big', 'bytes=100000-', 200)
+
+
+def test_partial_file_that_is_already_complete(server, engine, tmp_path):
+    data = server.files['f'] = payload(50_000)
+    server.drop_after['f'] = 20_000
+    path = str(tmp_path / 'f')
+    with pytest.raises(DownloadError):
+        DownloadEngine(timeout=5, retries=0).fetch([(server.url('f'), path)])
+    with open(path + PART_SUFFIX, 'ab') as f:
+        f.write(data[20_000:])
+
+    engine.fetch([(server.url('f'), path)])
+    assert read(path) == data
+    assert server.requests[-1] == ('f', 'bytes=50000-', 416)
+
+
+def test_partial_file_longer_than_the_file_starts_over(server, engine, tmp_path):
+    data = server.files['f'] = payload(50_000)
+    server.drop_after['f'] = 20_000
+    path = str(tmp_path / 'f')
+    with pytest.raises(DownloadError):
+        DownloadEngine(timeout=5, retries=0).fetch([(server.url('f'), path)])
+    with open(path + PART_SUFFIX, 'ab') as f:
+        f.write(b'x' * 40_000)
+
+    engine.fetch([(server.url('f'), path)])
+    assert read(path) == data
+    assert [status for _, _, status in server.requests[-2:]] == [416, 200]
+
+
+def test_missing_file_fails_without_retrying(server, engine, tmp_path):
+    server.files['there'] = payload(1000)
+    path = str(tmp_path / 'gone')
+    with pytest.raises(DownloadError) as raised:
+        engine.fetch([(server.url('gone'), path), (server.url('there'), str(tmp_path / 'there'))])
+    error = raised.value.failures[path]
+    assert isinstance(error, HTTPStatusError) and error.status == 404
+    assert [name for name, _, _ in server.requests].count('gone') == 1
+    assert read(str(tmp_path / 'there')) == server.files['there']
+    assert not os.path.exists(path)
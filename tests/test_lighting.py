@@ -0,0 +1,98 @@
+import random
+
+import numpy as np
+import pytest
+
+import world as world_module
+from lighting import chunk_light, join_chunk, relight_block, relight_chunks
+from terrain import TerrainGenerator
+from world import World, AIR, BLOCK, CHUNK_HEIGHT, CHUNK_SIZE
+
+LAMP = 2
+COORDS = [(cx, cz) for cx in range(-1, 2) for cz in range(-1, 2)]
+
+
+@pytest.fixture(autouse=True)
+def lamp(monkeypatch):
+    monkeypatch.setitem(world_module.BLOCK_EMISSION, LAMP, 12)
+
+
+def lit_world(chunks):
+    """
+    A world holding copies of `chunks`, lit from scratch: each chunk on its own, then
+    joined with its neighbours, as chunks are when they stream in.
+    """
+    world = World()
+    for chunk in chunks:
+        copy = world_module.Chunk(chunk.cx, chunk.cz)
+        copy[:, :, :] = chunk.blocks
+        world.add_chunk(copy)
+    for coord in COORDS:
+        chunk_light(world.get_chunk(*coord))
+    for coord in COORDS:
+        join_chunk(world, *coord)
+    return world
+
+
+def assert_same_light(world, reference):
+    for coord in COORDS:
+        np.testing.assert_array_equal(world.get_chunk(*coord).light, reference.get_chunk(*coord).light,
+                                      err_msg=f"chunk {coord}")
+
+
+@pytest.fixture
+def terrain_world():
+    terrain = TerrainGenerator(seed=5)
+    return lit_world([terrain.generate(*coord) for coord in COORDS])
+
+
+def random_cell(rng):
+    return (rng.randrange(-CHUNK_SIZE, 2 * CHUNK_SIZE), rng.randrange(0, CHUNK_HEIGHT),
+            rng.randrange(-CHUNK_SIZE, 2 * CHUNK_SIZE))
+
+
+def test_open_sky_reaches_the_surface(terrain_world):
+    light = terrain_world.get_chunk(0, 0).light
+    assert light[:, -1, :].min() >> 4 == 15
+    assert light[0, 0, 0] >> 4 == 0  # bedrock level under the terrain
+
+
+def test_single_edits_match_a_full_relight(terrain_world):
+    rng = random.Random(11)
+    for _ in range(60):
+        x, y, z = random_cell(rng)
+        block = rng.choice((AIR, AIR, BLOCK, LAMP))
+        if terrain_world.set_block(x, y, z, block):
+            relight_block(terrain_world, x, y, z)
+    assert_same_light(terrain_world, lit_world(terrain_world.chunks.values()))
+
+
+def test_digging_a_shaft_lets_the_sky_in(terrain_world):
+    x = z = 3
+    top = terrain_world.top_block(x, z)
+    for y in range(top, 4, -1):
+        terrain_world.set_block(x, y, z, AIR)
+        relight_block(terrain_world, x, y, z)
+    assert terrain_world.get_chunk(0, 0).light[x, 5, z] >> 4 == 15
+    assert_same_light(terrain_world, lit_world(terrain_world.chunks.values()))
+
+
+def test_relight_block_reports_chunks_to_remesh(terrain_world):
+    # A lamp on a chunk border lights, and so changes the meshes of, both chunks
+    x, z = CHUNK_SIZE - 1, 3
+    y = terrain_world.top_block(x, z) + 1
+    terrain_world.set_block(x, y, z, LAMP)
+    touched = relight_block(terrain_world, x, y, z)
+    assert {(0, 0), (1, 0)} <= touched
+
+
+def test_bulk_relight_matches_a_full_relight(terrain_world):
+    rng = random.Random(4)
+    edited = set()
+    for _ in range(300):
+        x, y, z = random_cell(rng)
+        if terrain_world.set_block(x, y, z, rng.choice((AIR, BLOCK, LAMP))):
+            edited.add(terrain_world.chunk_coords(x, z))
+    touched = relight_chunks(terrain_world, edited)
+    assert edited <= touched
+    assert_same_light(terrain_world, lit_world(terrain_world.chunks.values()))
@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+import manifest
+from manifest import GAME_DIR, RELEASE_FILES, HashCache, Manifest, check_path, local_path, release_version
+
+
+@pytest.mark.parametrize('path', ['client.py', 'assets/bg.jpg', 'a/b/c.txt'])
+def test_plain_relative_paths_are_accepted(path):
+    check_path(path)
+
+
+@pytest.mark.parametrize('path', ['../client.py', 'assets/../../x', '..', '/etc/passwd', 'assets\\bg.jpg',
+                                  'C:/x', 'C:x', '//server/share/x', './client.py', 'assets//bg.jpg', 'assets/', ''])
+def test_escaping_or_malformed_paths_are_rejected(path):
+    with pytest.raises(ValueError):
+        check_path(path)
+
+
+def test_local_path_joins_under_the_root(tmp_path):
+    assert local_path(str(tmp_path), 'assets/bg.jpg') == os.path.join(str(tmp_path), 'assets', 'bg.jpg')
+    with pytest.raises(ValueError):
+        local_path(str(tmp_path), '../outside')
+
+
+def test_local_path_rejects_a_symlink_out_of_the_root(tmp_path):
+    root, outside = tmp_path / 'root', tmp_path / 'outside'
+    root.mkdir()
+    outside.mkdir()
+    os.symlink(outside, root / 'assets')
+    with pytest.raises(ValueError):
+        local_path(str(root), 'assets/bg.jpg')
+
+
+@pytest.fixture
+def hash_calls(monkeypatch):
+    calls = []
+    real = manifest.file_sha256
+
+    def counting(path):
+        calls.append(path)
+        return real(path)
+    monkeypatch.setattr(manifest, 'file_sha256', counting)
+    return calls
+
+
+def test_hash_cache_skips_unchanged_files(tmp_path, hash_calls):
+    path = tmp_path / 'f'
+    path.write_bytes(b'data')
+    cache = HashCache(str(tmp_path / 'cache.json'))
+    digest = cache.sha256(str(path))
+    cache.save()
+
+    reopened = HashCache(str(tmp_path / 'cache.json'))
+    assert reopened.sha256(str(path)) == digest
+    assert len(hash_calls) == 1
+    assert reopened.hashed == 0
+
+
+def test_hash_cache_rehashes_touched_files(tmp_path, hash_calls):
+    path = tmp_path / 'f'
+    path.write_bytes(b'data')
+    cache = HashCache(str(tmp_path / 'cache.json'))
+    cache.sha256(str(path))
+    stat = os.stat(path)
+    path.write_bytes(b'DATA')  # same size
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cache.sha256(str(path)) == manifest.file_sha256(str(path))
+    assert len(hash_calls) == 3
+    assert cache.hashed == 2
+
+
+def test_committed_manifest_matches_the_release():
+    # Rebuild with `python manifest.py release` after changing a released file
+    committed = Manifest.load(os.path.join(GAME_DIR, 'manifest.json'))
+    assert committed.to_json() == Manifest.release().to_json()
+
+
+def test_release_urls_point_at_the_repository_files():
+    for entry in Manifest.release().entries:
+        source = RELEASE_FILES[entry.path]
+        assert os.path.isfile(os.path.join(GAME_DIR, source))
+        assert entry.url.endswith('/' + source)
+
+
+def test_launcher_version_is_the_release_version():
+    import swipe
+    assert swipe.GAME_VERSION == release_version() == Manifest.release().version
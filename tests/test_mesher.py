@@ -0,0 +1,89 @@
+import numpy as np
+
+from mesher import build_chunk_mesh, build_lod_mesh
+from pipeline import ChunkPipeline
+from world import AIR, BLOCK, Chunk, World
+
+
+def padded_with(*cells, size=3):
+    """
+    A (size+2)^3 padded block array with block ids at chunk-local `cells`; a cell index of
+    -1 or `size` lands in the neighbour ring.
+    """
+    padded = np.full((size + 2,) * 3, AIR, dtype=np.uint16)
+    for (x, y, z), block in cells:
+        padded[x + 1, y + 1, z + 1] = block
+    return padded
+
+
+def test_empty_chunk_has_no_faces():
+    mesh = build_chunk_mesh(padded_with())
+    assert mesh.empty
+    assert mesh.quad_count == 0
+
+
+def test_lone_block_has_six_faces():
+    mesh = build_chunk_mesh(padded_with(((1, 1, 1), 1)))
+    assert mesh.quad_count == 6
+    assert len(mesh.vertices) == 6 * 4 * 3  # flat x, y, z per corner
+    assert mesh.bounds == ((0.5, 0.5, 0.5), (1.5, 1.5, 1.5))
+
+
+def test_faces_between_solid_blocks_are_culled_and_merged():
+    # Two blocks of the same kind: the shared faces go, the rest merge into one box
+    mesh = build_chunk_mesh(padded_with(((1, 1, 1), 1), ((2, 1, 1), 1)))
+    assert mesh.quad_count == 6
+    assert mesh.bounds == ((0.5, 0.5, 0.5), (2.5, 1.5, 1.5))
+
+
+def test_different_blocks_are_not_merged():
+    mesh = build_chunk_mesh(padded_with(((1, 1, 1), 1), ((2, 1, 1), 2)))
+    assert mesh.quad_count == 10
+
+
+def test_neighbour_chunk_culls_border_faces():
+    # The block at x=0 touches a solid block in the neighbouring chunk at x=-1
+    mesh = build_chunk_mesh(padded_with(((0, 1, 1), 1), ((-1, 1, 1), 1)))
+    assert mesh.quad_count == 5
+    assert np.reshape(mesh.vertices, (-1, 3))[:, 0].min() == -0.5
+
+
+def test_faces_into_different_light_are_not_merged():
+    padded = padded_with(((0, 0, 0), 1), ((1, 0, 0), 1))
+    light = np.zeros(padded.shape, dtype=np.uint8)
+    light[1, 2, 1] = 15 << 4  # open sky above the first block only
+    mesh = build_chunk_mesh(padded, light=light)
+    assert mesh.quad_count == 7  # the top face splits in two
+    assert len(mesh.colors) // 4 == len(mesh.vertices) // 3
+
+
+def test_lod_mesh_covers_the_column_tops():
+    padded = padded_with(*(((x, 0, z), 1) for x in range(4) for z in range(4)), size=4)
+    mesh = build_lod_mesh(padded, step=2)
+    assert mesh.lod_step == 2
+    assert not mesh.empty
+    lo, hi = mesh.bounds
+    assert lo[0] <= -0.5 and hi[0] >= 3.5
+
+
+def test_every_pipeline_mesh_has_colors():
+    # Meshes without colors read as white, i.e. full block light: LOD chunks would glow at night
+    world = World()
+    world.add_chunk(Chunk(0, 0))
+    for x in range(4):
+        world.set_block(x, 0, 0, BLOCK)
+    pipeline = ChunkPipeline(world, load=Chunk)
+    try:
+        padded, light = world.padded_chunk(0, 0), world.padded_light(0, 0)
+        for step in (None, 1, 2, 4):
+            mesh = pipeline.mesh_chunk(padded, 0, 0, light, step)
+            assert mesh.colors is not None
+            assert len(mesh.colors) // 4 == len(mesh.vertices) // 3
+        lod = pipeline.mesh_chunk(padded, 0, 0, light, step=2)
+        assert lod.lod_step == 2 and not lod.empty
+        assert np.all(np.reshape(lod.colors, (-1, 4)) == (1, 0, 0, 1))  # open sky, no block light
+        empty = np.zeros_like(padded)
+        assert pipeline.mesh_chunk(empty, 0, 0, light).colors is not None
+        assert pipeline.mesh_chunk(empty, 0, 0, light, step=2).colors is not None
+    finally:
+        pipeline.streamer.shutdown()
@@ -0,0 +1,72 @@
+import pytest
+
+from physics import box_overlaps_cell, move_box
+from world import BLOCK
+
+HALF_WIDTH = 0.3
+HEIGHT = 1.8
+
+
+@pytest.fixture
+def world(world):
+    # The shared world with a floor at y=0 across all of it
+    for x in range(-8, 16):
+        for z in range(-8, 16):
+            world.set_block(x, 0, z, BLOCK)
+    return world
+
+
+def test_falling_lands_on_the_floor(world):
+    position, blocked = move_box(world, (2, 5, 2), HALF_WIDTH, HEIGHT, (0, -10, 0))
+    assert position == pytest.approx((2, 0.5, 2))
+    assert blocked == [False, True, False]
+
+
+def test_fast_fall_does_not_tunnel_through_a_thin_floor(world):
+    world.set_block(2, 20, 2, BLOCK)
+    position, blocked = move_box(world, (2, 30, 2), HALF_WIDTH, HEIGHT, (0, -100, 0))
+    assert position == pytest.approx((2, 20.5, 2))
+    assert blocked[1]
+
+
+def test_wall_stops_horizontal_movement(world):
+    world.set_block(5, 1, 2, BLOCK)
+    position, blocked = move_box(world, (2, 0.5, 2), HALF_WIDTH, HEIGHT, (10, 0, 0))
+    assert position == pytest.approx((5 - 0.5 - HALF_WIDTH, 0.5, 2))
+    assert blocked == [True, False, False]
+
+
+def test_slides_along_a_wall(world):
+    for z in range(-2, 8):
+        world.set_block(4, 1, z, BLOCK)
+    position, blocked = move_box(world, (2, 0.5, 2), HALF_WIDTH, HEIGHT, (5, 0, 3))
+    assert position == pytest.approx((4 - 0.5 - HALF_WIDTH, 0.5, 5))
+    assert blocked == [True, False, False]
+
+
+def test_box_touching_a_face_is_not_blocked_by_it(world):
+    # Resting exactly on the floor, walking must not snag on the floor cells
+    position, blocked = move_box(world, (2, 0.5, 2), HALF_WIDTH, HEIGHT, (3, 0, 0))
+    assert position == pytest.approx((5, 0.5, 2))
+    assert blocked == [False, False, False]
+
+
+def test_unloaded_chunks_are_solid(world):
+    # Chunks span x -8..15; x=16 is in an unloaded chunk
+    position, blocked = move_box(world, (14, 0.5, 2), HALF_WIDTH, HEIGHT, (5, 0, 0))
+    assert position[0] == pytest.approx(15.5 - HALF_WIDTH)
+    assert blocked[0]
+
+
+def test_below_the_world_is_solid(world):
+    world.set_block(2, 0, 2, 0)
+    position, blocked = move_box(world, (2, 0.5, 2), HALF_WIDTH, HEIGHT, (0, -50, 0))
+    assert position[1] == pytest.approx(-0.5)
+    assert blocked[1]
+
+
+def test_box_overlaps_cell():
+    assert box_overlaps_cell((2, 0.5, 2), HALF_WIDTH, HEIGHT, (2, 1, 2))
+    assert box_overlaps_cell((2, 0.5, 2), HALF_WIDTH, HEIGHT, (2, 2, 2))
+    assert not box_overlaps_cell((2, 0.5, 2), HALF_WIDTH, HEIGHT, (2, 0, 2))  # only touching
+    assert not box_overlaps_cell((2, 0.5, 2), HALF_WIDTH, HEIGHT, (3, 1, 2))
@@ -0,0 +1,64 @@
+import random
+from math import floor, sqrt
+
+import pytest
+
+from picking import raycast_voxels
+from world import AIR, BLOCK
+
+
+def march(world, origin, direction, distance, step=1e-3):
+    """
+    Reference answer: the first solid cell found by stepping along the ray in tiny increments.
+    """
+    length = sqrt(sum(d * d for d in direction))
+    d = [c / length for c in direction]
+    t = 0.0
+    while t <= distance:
+        cell = tuple(floor(o + c * t + 0.5) for o, c in zip(origin, d))
+        if world.get_block(*cell) != AIR:
+            return cell
+        t += step
+    return None
+
+
+def test_hits_the_face_it_enters(world):
+    world.set_block(3, 5, 0, BLOCK)
+    hit = raycast_voxels(world, (0, 5, 0), (1, 0, 0), distance=10)
+    assert hit.position == (3, 5, 0)
+    assert hit.normal == (-1, 0, 0)
+    assert hit.adjacent == (2, 5, 0)
+    assert hit.distance == pytest.approx(2.5)
+
+
+def test_looking_down_hits_the_top_face(world):
+    world.set_block(-4, 2, -4, BLOCK)
+    hit = raycast_voxels(world, (-4, 6.2, -4), (0, -1, 0), distance=10)
+    assert hit.position == (-4, 2, -4)
+    assert hit.normal == (0, 1, 0)
+    assert hit.adjacent == (-4, 3, -4)
+
+
+def test_misses_beyond_reach(world):
+    world.set_block(6, 5, 0, BLOCK)
+    assert raycast_voxels(world, (0, 5, 0), (1, 0, 0), distance=5) is None
+    assert raycast_voxels(world, (0, 5, 0), (1, 0, 0), distance=6) is not None
+
+
+def test_zero_direction_hits_nothing(world):
+    world.set_block(0, 5, 0, BLOCK)
+    assert raycast_voxels(world, (0, 5, 0), (0, 0, 0)) is None
+
+
+def test_matches_a_brute_force_march(world):
+    rng = random.Random(3)
+    for _ in range(300):
+        world.set_block(rng.randrange(-8, 16), rng.randrange(0, 12), rng.randrange(-8, 16), BLOCK)
+    for _ in range(200):
+        origin = (rng.uniform(-2, 10), rng.uniform(2, 10), rng.uniform(-2, 10))
+        if world.get_block(*(floor(c + 0.5) for c in origin)) != AIR:
+            continue
+        direction = (rng.uniform(-1, 1), rng.uniform(-1, 1), rng.uniform(-1, 1))
+        hit = raycast_voxels(world, origin, direction, distance=8)
+        expected = march(world, origin, direction, 8)
+        assert (hit.position if hit else None) == expected
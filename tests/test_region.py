@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+from region import RegionStore
+from world import BLOCK, Chunk
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_save_round_trips_dirty_chunks(tmp_path):
+    store = RegionStore(str(tmp_path))
+    chunk = Chunk(3, -2)
+    chunk.set(1, 2, 3, BLOCK)
+    chunk.dirty = True
+    assert store.save([chunk, Chunk(0, 0)]) == 1
+    assert not chunk.dirty
+    store.close()
+    assert RegionStore(str(tmp_path)).load(3, -2).get(1, 2, 3) == BLOCK
+
+
+def test_save_works_at_interpreter_exit(tmp_path):
+    # The game flushes its world from an atexit hook, after thread pools stop taking work
+    script = textwrap.dedent(f'''
+        import atexit, sys
+        from region import RegionStore
+        from world import BLOCK, Chunk
+        store = RegionStore({str(tmp_path)!r})
+        chunk = Chunk(0, 0)
+        chunk.set(1, 2, 3, BLOCK)
+        chunk.dirty = True
+        atexit.register(lambda: (store.save([chunk]), store.close()))
+        sys.exit()
+    ''')
+    subprocess.run([sys.executable, '-c', script], cwd=REPO, check=True)
+    assert RegionStore(str(tmp_path)).load(0, 0).get(1, 2, 3) == BLOCK
@@ -0,0 +1,117 @@
+import hashlib
+import os
+
+import pytest
+
+from manifest import HashCache, Manifest, ManifestEntry
+from store import Installs, version_key
+
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def manifest(version, files, patches=None):
+    patches = patches or {}
+    return Manifest(version, [ManifestEntry(path, f'https://example.com/{version}/{path}', len(data), digest(data),
+                                            patches.get(path))
+                              for path, data in files.items()])
+
+
+def install(installs, cache, release, files):
+    """
+    Installs `release` the way the launcher does: prepare, "download" what's stale, commit.
+    Returns the paths that had to be fetched.
+    """
+    stale = installs.prepare(release, cache)
+    root = installs.path(release.version)
+    for entry in stale:
+        path = os.path.join(root, *entry.path.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(files[entry.path])
+    installs.commit(release, cache)
+    return sorted(entry.path for entry in stale)
+
+
+def inode(path):
+    return os.stat(path).st_ino
+
+
+V1 = {'client.py': b'print("v1")', 'world.py': b'WORLD = 1', 'assets/bg.jpg': b'\xff\xd8' * 1000}
+V2 = dict(V1, **{'client.py': b'print("v2")'})
+
+
+@pytest.fixture
+def installs(tmp_path):
+    return Installs(str(tmp_path))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return HashCache(str(tmp_path / 'hashes.json'))
+
+
+def test_first_install_fetches_everything_and_fills_the_store(installs, cache):
+    release = manifest('1.0', V1)
+    assert install(installs, cache, release, V1) == sorted(V1)
+    assert installs.versions() == ['1.0']
+    for path, data in V1.items():
+        local = os.path.join(installs.path('1.0'), *path.split('/'))
+        assert inode(local) == inode(installs.store.object_path(digest(data)))
+    assert installs.prepare(release, cache) == []
+
+
+def test_second_version_links_shared_files(installs, cache):
+    install(installs, cache, manifest('1.0', V1), V1)
+    assert install(installs, cache, manifest('1.1', V2), V2) == ['client.py']
+    for path in ('world.py', 'assets/bg.jpg'):
+        parts = path.split('/')
+        assert inode(os.path.join(installs.path('1.0'), *parts)) == inode(os.path.join(installs.path('1.1'), *parts))
+    assert len(list(installs.store.digests())) == len(V1) + 1
+
+
+def test_damaged_local_file_is_relinked_from_the_store(installs, cache):
+    release = manifest('1.0', V1)
+    install(installs, cache, release, V1)
+    local = os.path.join(installs.path('1.0'), 'world.py')
+    os.remove(local)
+    with open(local, 'wb') as f:
+        f.write(b'WORLD = 2')
+    assert installs.prepare(release, cache) == []
+    with open(local, 'rb') as f:
+        assert f.read() == V1['world.py']
+
+
+def test_patchable_file_is_seeded_from_the_old_version(installs, cache):
+    install(installs, cache, manifest('1.0', V1), V1)
+    patch = {'from': digest(V1['client.py']), 'url': 'https://example.com/client.patch', 'size': 10, 'sha256': '0' * 64}
+    stale = installs.prepare(manifest('1.1', V2, patches={'client.py': [patch]}), cache)
+    assert [entry.path for entry in stale] == ['client.py']
+    # The old file is in place, ready for the patch to be applied to it
+    with open(os.path.join(installs.path('1.1'), 'client.py'), 'rb') as f:
+        assert f.read() == V1['client.py']
+
+
+def test_removing_a_version_frees_only_its_own_files(installs, cache):
+    install(installs, cache, manifest('1.0', V1), V1)
+    install(installs, cache, manifest('1.1', V2), V2)
+    installs.remove('1.0')
+    removed, freed = installs.collect_garbage()
+    assert (removed, freed) == (1, len(V1['client.py']))
+    assert installs.versions() == ['1.1']
+    assert sorted(installs.store.digests()) == sorted(digest(data) for data in V2.values())
+    assert installs.collect_garbage() == (0, 0)
+
+
+def test_versions_sort_newest_first(installs, cache):
+    for version in ('1.9', '1.10', '1.2'):
+        install(installs, cache, manifest(version, V1), V1)
+    assert installs.versions() == ['1.10', '1.9', '1.2']
+    assert version_key('1.10') > version_key('1.9')
+
+
+@pytest.mark.parametrize('name', ['', '.', '..', '../1.0', 'a/b'])
+def test_bad_version_names_are_refused(installs, name):
+    with pytest.raises(ValueError):
+        installs.path(name)
@@ -0,0 +1,273 @@
+from math import floor
+
+import numpy as np
+
+# === Constants ===
+CHUNK_SIZE = 8
+CHUNK_HEIGHT = 64
+
+# Packed light value of a cell open to the sky (see lighting.py)
+OPEN_SKY_LIGHT = 15 << 4
+
+# === Block IDs ===
+AIR = 0
+BLOCK = 1
+
+# Block id -> texture name (a .png in the assets folder)
+BLOCK_TEXTURES = {
+    BLOCK: 'block_1',
+}
+
+# Block id -> block light level it gives off (1-15); blocks not listed are dark
+BLOCK_EMISSION = {}
+
+
+class Chunk:
+    """
+    One CHUNK_SIZE x CHUNK_HEIGHT x CHUNK_SIZE column of blocks.
+
+    Blocks are stored as a uint8 array of indices into a small per-chunk palette of
+    global block ids, indexed [x, y, z] in chunk-local coordinates. Indexing the chunk
+    itself (`chunk[:, 0, :] = BLOCK`) reads and writes global ids, including numpy slices.
+    """
+    def __init__(self, cx, cz):
+        self.cx = cx
+        self.cz = cz
+        self.palette = [AIR]
+        self._palette_lookup = {AIR: 0}
+        self.data = np.zeros((CHUNK_SIZE, CHUNK_HEIGHT, CHUNK_SIZE), dtype=np.uint8)
+        self.modified = False  # edited since generation, so it can't simply be regenerated
+        self.dirty = False  # edited since it was last saved
+        self.version = 0  # bumped on every edit, so stale background meshes can be spotted
+        self.light = None  # uint8 per cell, sky light << 4 | block light; see lighting.py
+
+    @classmethod
+    def from_palette(cls, cx, cz, palette, data):
+        """
+        Rebuilds a chunk from a stored palette and index array.
+        """
+        chunk = cls(cx, cz)
+        chunk.palette = list(palette)
+        chunk._palette_lookup = {block: i for i, block in enumerate(chunk.palette)}
+        chunk.data = np.array(data, dtype=np.uint8).reshape(CHUNK_SIZE, CHUNK_HEIGHT, CHUNK_SIZE)
+        return chunk
+
+    def palette_index(self, block):
+        """
+        Returns the palette slot for a global block id, adding it if needed.
+        """
+        index = self._palette_lookup.get(block)
+        if index is None:
+            index = len(self.palette)
+            if index > np.iinfo(self.data.dtype).max:
+                raise ValueError(f"Chunk {self.cx, self.cz} palette is full")
+            self.palette.append(block)
+            self._palette_lookup[block] = index
+        return index
+
+    def palette_array(self):
+        return np.asarray(self.palette, dtype=np.uint16)
+
+    def __getitem__(self, index):
+        return self.palette_array()[self.data[index]]
+
+    def __setitem__(self, index, blocks):
+        blocks = np.asarray(blocks)
+        if blocks.ndim == 0:
+            self.data[index] = self.palette_index(int(blocks))
+            return
+        values, inverse = np.unique(blocks, return_inverse=True)
+        lut = np.asarray([self.palette_index(int(v)) for v in values], dtype=self.data.dtype)
+        self.data[index] = lut[inverse].reshape(blocks.shape)
+
+    def get(self, x, y, z):
+        return self.palette[self.data[x, y, z]]
+
+    def set(self, x, y, z, block):
+        self.data[x, y, z] = self.palette_index(block)
+
+    @property
+    def blocks(self):
+        """
+        The whole chunk as an array of global block ids.
+        """
+        return self[:, :, :]
+
+    @property
+    def nbytes(self):
+        light = self.light.nbytes if self.light is not None else 0
+        return self.data.nbytes + light + len(self.palette) * 8
+
+
+class World:
+    """
+    All loaded chunks, addressed by chunk coordinate, with block access by world coordinate.
+    Has no rendering dependencies, so it can be driven headless.
+    """
+    def __init__(self):
+        self.chunks = {}
+
+    @staticmethod
+    def chunk_coords(x, z):
+        return floor(x / CHUNK_SIZE), floor(z / CHUNK_SIZE)
+
+    def __contains__(self, chunk_coord):
+        return chunk_coord in self.chunks
+
+    def get_chunk(self, cx, cz):
+        return self.chunks.get((cx, cz))
+
+    def create_chunk(self, cx, cz):
+        chunk = Chunk(cx, cz)
+        self.chunks[(cx, cz)] = chunk
+        return chunk
+
+    def add_chunk(self, chunk):
+        self.chunks[(chunk.cx, chunk.cz)] = chunk
+
+    def remove_chunk(self, cx, cz):
+        return self.chunks.pop((cx, cz), None)
+
+    def get_block(self, x, y, z):
+        """
+        Block id at a world coordinate; AIR outside the loaded world.
+        """
+        if not 0 <= y < CHUNK_HEIGHT:
+            return AIR
+        chunk = self.chunks.get((x // CHUNK_SIZE, z // CHUNK_SIZE))
+        if chunk is None:
+            return AIR
+        return chunk.get(x % CHUNK_SIZE, y, z % CHUNK_SIZE)
+
+    def set_block(self, x, y, z, block):
+        """
+        Sets a block at a world coordinate. Returns False if the position is not loaded.
+        """
+        if not 0 <= y < CHUNK_HEIGHT:
+            return False
+        chunk = self.chunks.get((x // CHUNK_SIZE, z // CHUNK_SIZE))
+        if chunk is None:
+            return False
+        chunk.set(x % CHUNK_SIZE, y, z % CHUNK_SIZE, block)
+        chunk.modified = True
+        chunk.dirty = True
+        chunk.version += 1
+        return True
+
+    def chunks_showing(self, x, z):
+        """
+        Coords of the loaded chunks whose mesh depends on the block column at world (x, z):
+        its own chunk, plus the neighbour across each chunk border the column lies on.
+        """
+        cx, cz = x // CHUNK_SIZE, z // CHUNK_SIZE
+        lx, lz = x % CHUNK_SIZE, z % CHUNK_SIZE
+        coords = [(cx, cz)]
+        if lx == 0:
+            coords.append((cx - 1, cz))
+        elif lx == CHUNK_SIZE - 1:
+            coords.append((cx + 1, cz))
+        if lz == 0:
+            coords.append((cx, cz - 1))
+        elif lz == CHUNK_SIZE - 1:
+            coords.append((cx, cz + 1))
+        return [coord for coord in coords if coord in self.chunks]
+
+    def top_block(self, x, z):
+        """
+        Height of the highest solid block in column (x, z), or -1 if it is empty or not loaded.
+        """
+        chunk = self.chunks.get((x // CHUNK_SIZE, z // CHUNK_SIZE))
+        if chunk is None:
+            return -1
+        solid = np.nonzero(chunk[x % CHUNK_SIZE, :, z % CHUNK_SIZE] != AIR)[0]
+        return int(solid[-1]) if len(solid) else -1
+
+    def is_solid(self, x, y, z):
+        return self.get_block(x, y, z) != AIR
+
+    def get_region(self, x0, y0, z0, x1, y1, z1):
+        """
+        Copies the box [x0, x1) x [y0, y1) x [z0, z1) out as an array of block ids.
+        Cells outside the loaded world read as AIR.
+        """
+        region = np.full((x1 - x0, y1 - y0, z1 - z0), AIR, dtype=np.uint16)
+        ys, ye = max(y0, 0), min(y1, CHUNK_HEIGHT)
+        if ys >= ye:
+            return region
+        for cx in range(x0 // CHUNK_SIZE, (x1 - 1) // CHUNK_SIZE + 1):
+            for cz in range(z0 // CHUNK_SIZE, (z1 - 1) // CHUNK_SIZE + 1):
+                chunk = self.chunks.get((cx, cz))
+                if chunk is None:
+                    continue
+                bx, bz = cx * CHUNK_SIZE, cz * CHUNK_SIZE
+                xs, xe = max(x0, bx), min(x1, bx + CHUNK_SIZE)
+                zs, ze = max(z0, bz), min(z1, bz + CHUNK_SIZE)
+                region[xs - x0:xe - x0, ys - y0:ye - y0, zs - z0:ze - z0] = \
+                    chunk[xs - bx:xe - bx, ys:ye, zs - bz:ze - bz]
+        return region
+
+    def set_region(self, x0, y0, z0, blocks, mask=None):
+        """
+        Writes an array of block ids into the box starting at (x0, y0, z0), one slice per
+        chunk. Cells where `mask` is False, outside the world's height or in chunks that
+        aren't loaded are left alone. Returns the coords of the chunks that changed.
+        """
+        blocks = np.asarray(blocks)
+        x1, y1, z1 = x0 + blocks.shape[0], y0 + blocks.shape[1], z0 + blocks.shape[2]
+        ys, ye = max(y0, 0), min(y1, CHUNK_HEIGHT)
+        changed = set()
+        if ys >= ye:
+            return changed
+        for cx in range(x0 // CHUNK_SIZE, (x1 - 1) // CHUNK_SIZE + 1):
+            for cz in range(z0 // CHUNK_SIZE, (z1 - 1) // CHUNK_SIZE + 1):
+                chunk = self.chunks.get((cx, cz))
+                if chunk is None:
+                    continue
+                bx, bz = cx * CHUNK_SIZE, cz * CHUNK_SIZE
+                xs, xe = max(x0, bx), min(x1, bx + CHUNK_SIZE)
+                zs, ze = max(z0, bz), min(z1, bz + CHUNK_SIZE)
+                local = (slice(xs - bx, xe - bx), slice(ys, ye), slice(zs - bz, ze - bz))
+                region = (slice(xs - x0, xe - x0), slice(ys - y0, ye - y0), slice(zs - z0, ze - z0))
+                current = chunk[local]
+                new = blocks[region]
+                if mask is not None:
+                    new = np.where(mask[region], new, current)
+                if np.array_equal(current, new):
+                    continue
+                chunk[local] = new
+                chunk.modified = True
+                chunk.dirty = True
+                chunk.version += 1
+                changed.add((cx, cz))
+        return changed
+
+    def padded_chunk(self, cx, cz):
+        """
+        A chunk's blocks plus a one block ring of neighbour data, as the mesher expects.
+        """
+        x0, z0 = cx * CHUNK_SIZE, cz * CHUNK_SIZE
+        return self.get_region(x0 - 1, -1, z0 - 1, x0 + CHUNK_SIZE + 1, CHUNK_HEIGHT + 1, z0 + CHUNK_SIZE + 1)
+
+    def padded_light(self, cx, cz):
+        """
+        The light values matching padded_chunk(cx, cz). Cells above the world or in columns
+        without light read as open sky, cells below the world as dark.
+        """
+        x0, z0 = cx * CHUNK_SIZE, cz * CHUNK_SIZE
+        light = np.full((CHUNK_SIZE + 2, CHUNK_HEIGHT + 2, CHUNK_SIZE + 2), OPEN_SKY_LIGHT, dtype=np.uint8)
+        light[:, 0, :] = 0
+        for ncx in (cx - 1, cx, cx + 1):
+            for ncz in (cz - 1, cz, cz + 1):
+                chunk = self.chunks.get((ncx, ncz))
+                if chunk is None or chunk.light is None:
+                    continue
+                bx, bz = ncx * CHUNK_SIZE, ncz * CHUNK_SIZE
+                xs, xe = max(x0 - 1, bx), min(x0 + CHUNK_SIZE + 1, bx + CHUNK_SIZE)
+                zs, ze = max(z0 - 1, bz), min(z0 + CHUNK_SIZE + 1, bz + CHUNK_SIZE)
+                light[xs - x0 + 1:xe - x0 + 1, 1:-1, zs - z0 + 1:ze - z0 + 1] = \
+                    chunk.light[xs - bx:xe - bx, :, zs - bz:ze - bz]
+        return light
+
+    @property
+    def nbytes(self):
+        return sum(chunk.nbytes for chunk in self.chunks.values())